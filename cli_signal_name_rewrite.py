@@ -6,58 +6,53 @@ import typing
 
 import yaml
 
+from fsc.flipper_format.names import NameMatcher, normalize_name
+from fsc.flipper_format.rewrite import rewrite_files, rules_digest
+from fsc.flipper_format.walk import compile_globs, to_posix, walk_patterns
+
 """ Set this to True to preview what the program does to the IRDB
 """
 _dry_run = False
 
+""" Number of processes rewriting the files (0 = all cores)
+"""
+_workers = 0
+
+""" Bump this if the rewrite itself changes, this invalidates the cache of files in their target state
+"""
+_rewrite_version = 1
+
 
-def _open_single_file(file_name: str, pa_cb, dry_run: bool = False):
+def _rewrite_content(content: str, pa_cb) -> str:
+    """ Returns the rewritten content, or the unchanged content if no value was changed
+    """
     write_lines = []
     content_changed = False
-    with open(file_name, 'r') as osf_fd:
-        for line in osf_fd.readlines():
-            line = line.strip('\n')
-            # ignore comments
-            if line.startswith('#'):
+    lines = content.split('\n')
+    if lines[-1] == '':
+        lines.pop()
+    for line in lines:
+        # ignore comments
+        if line.startswith('#'):
+            write_lines.append(line)
+            continue
+        if ':' in line:
+            colon = line.index(':')
+            osf_key = line[:colon].strip()
+            osf_val = line[colon + 1:].strip()
+
+            # if replace is None, don't write line
+            if (osf_replace := pa_cb(osf_key, osf_val)) and osf_replace != osf_val:
+                content_changed = True
+                write_lines.append(f'{osf_key}: {osf_replace}')
+            else:
                 write_lines.append(line)
-                continue
-            if ':' in line:
-                colon = line.index(':')
-                osf_key = line[:colon].strip()
-                osf_val = line[colon + 1:].strip()
-
-                # if replace is None, don't write line
-                if (osf_replace := pa_cb(osf_key, osf_val)) and osf_replace != osf_val:
-                    content_changed = True
-                    write_lines.append(f'{osf_key}: {osf_replace}')
-                else:
-                    write_lines.append(line)
-    if content_changed:
-        # make sure the file ends with a new-line
-        if write_lines[-1] != '':
-            write_lines.append('')
-        if dry_run:
-            return
-        with open(file_name, 'w') as osf_fd:
-            osf_fd.write('\n'.join(write_lines))
-
-
-def _find_key_from_map(
-        value: str,
-        replacement_map: dict[str, list[str | re.Pattern]],
-        normalize: bool = False
-) -> typing.Optional[str]:
-    if normalize:
-        value = value.strip().lower().replace(' ', '').replace('_', '')
-    for replacement_map_key, replacement_map_vals in replacement_map.items():
-        for replacement_map_val in replacement_map_vals:
-            if isinstance(replacement_map_val, str):
-                if replacement_map_val == value:
-                    return replacement_map_key
-            if isinstance(replacement_map_val, re.Pattern):
-                if replacement_map_val.match(value):
-                    return replacement_map_key
-    return None
+    if not content_changed:
+        return content
+    # make sure the file ends with a new-line
+    if write_lines[-1] != '':
+        write_lines.append('')
+    return '\n'.join(write_lines)
 
 
 def _get_assert_type(
@@ -105,20 +100,83 @@ def _run_action_replace(
 
 
 def _run_action_rewrite(
-        rewrite_map: dict,
+        rewrite_matcher: NameMatcher,
         action_rewrite_val: str
 ) -> str:
-    if (new_callback_value := _find_key_from_map(
-            value=action_rewrite_val,
-            replacement_map=rewrite_map,
-            normalize=True
-    )) and new_callback_value != action_rewrite_val:
+    if (new_callback_value := rewrite_matcher.match(action_rewrite_val)) \
+            and new_callback_value != action_rewrite_val:
         if _dry_run:
             print("    [dry-run/rewrite] replaced", action_rewrite_val, "with", new_callback_value)
         action_rewrite_val = new_callback_value
     return action_rewrite_val
 
 
+def _make_callback(
+        replaces: dict,
+        rewrite_matcher: NameMatcher,
+        is_action_replace: bool,
+        is_action_rewrite: bool
+) -> typing.Callable[[str, str], str]:
+    def callback(callback_key: str, callback_val: str) -> str:
+        callback_key = callback_key.lower().strip()
+
+        # replace?
+        if is_action_replace:
+            callback_val = _run_action_replace(
+                replace_map=replaces,
+                action_replace_key=callback_key,
+                action_replace_val=callback_val
+            )
+
+        # rewrite
+        if is_action_rewrite and callback_key == "name":
+            callback_val = _run_action_rewrite(
+                rewrite_matcher=rewrite_matcher,
+                action_rewrite_val=callback_val
+            )
+
+        return callback_val
+    return callback
+
+
+def _fuse_callbacks(callbacks: list[typing.Callable[[str, str], str]]) -> typing.Callable[[str, str], str]:
+    """ Chains the callbacks of all rule sets of a file, so the file only has to be read and written once.
+    Every callback sees the value the previous one returned, just like rewriting the file once per rule set.
+    """
+    def fused(callback_key: str, callback_val: str) -> str:
+        for callback in callbacks:
+            if (new_val := callback(callback_key, callback_val)) and new_val != callback_val:
+                callback_val = new_val
+        return callback_val
+    return fused
+
+
+def _compile_paths(patterns: list[str]) -> tuple[set[str], typing.Optional[re.Pattern]]:
+    """ Splits glob patterns into a set of plain paths and one compiled matcher for the wildcard patterns
+    """
+    plain = {to_posix(z) for z in patterns if not glob.has_magic(z)}
+    return plain, compile_globs(z for z in patterns if glob.has_magic(z))
+
+
+def _path_matches(path: str, compiled: tuple[set[str], typing.Optional[re.Pattern]]) -> bool:
+    plain, matcher = compiled
+    return path in plain or (matcher is not None and matcher.match(path) is not None)
+
+
+def _assign_files(rule_sets: list[dict]) -> list[list[str]]:
+    """ Walks the tree below all include patterns once and returns the matching files of every rule set
+    """
+    includes = [_compile_paths(z["include"]) for z in rule_sets]
+    excludes = [_compile_paths(z["exclude"]) for z in rule_sets]
+    assigned: list[list[str]] = [[] for _ in rule_sets]
+    for path in walk_patterns(z for rule_set in rule_sets for z in rule_set["include"]):
+        posix_path = to_posix(path)
+        for i in range(len(rule_sets)):
+            if _path_matches(posix_path, includes[i]) and not _path_matches(posix_path, excludes[i]):
+                assigned[i].append(path)
+    return assigned
+
+
 def main():
     with open("flipper_signal_rewrites.yaml", "r") as fd:
         data = yaml.safe_load(fd)
@@ -130,9 +188,11 @@ def main():
     is_action_rewrite = "rewrite" in args[0].lower()
     is_action_replace = "replace" in args[0].lower()
 
-    # a list that contains all file paths which have been processed
+    # a set that contains all file paths which have been processed
     processed_files: set[str] = set()
 
+    # parse all rule sets first
+    rule_sets: list[dict] = []
     for rewrite_dict in data:
         if not isinstance(rewrite_dict, dict):
             raise ValueError("list item should be a dict.")
@@ -142,10 +202,7 @@ def main():
         if len(args) > 1 and name not in args[1:]:
             continue
 
-        paths_exclude: list[str] = _get_assert_type(rewrite_dict, "exclude", list, allow_empty=True)
-        paths_exclude_list = []
-        if paths_exclude:
-            paths_exclude_list = [file_name for z in paths_exclude for file_name in glob.glob(z, recursive=True)]
+        paths_exclude: list[str] = _get_assert_type(rewrite_dict, "exclude", list, allow_empty=True) or []
 
         # transform list to key-str/regex dict
         rewrite: dict = _get_assert_type(rewrite_dict, "rewrite", dict, allow_empty=True)
@@ -156,6 +213,8 @@ def main():
                     if not isinstance(val, str):
                         raise ValueError(f"invalid type: {type(val)} - should be of type string: {val}")
                     rewrite_replacement_map[k].append(_get_re_or_str(val, normalize=True))
+        # all rules are compiled once, names are normalized before matching
+        rewrite_matcher = NameMatcher(rewrite_replacement_map, normalize=normalize_name)
 
         # replace in value
         replace: list[dict] = _get_assert_type(rewrite_dict, "replace", list, allow_empty=True)
@@ -173,38 +232,57 @@ def main():
         ignore_previous: bool = _get_assert_type(rewrite_dict, "ignore-previous", bool, default=False)
         paths_include: list[str] = _get_assert_type(rewrite_dict, "include", list)
 
-        for path in (file_name for z in paths_include for file_name in glob.glob(z, recursive=True)):
-            if path in paths_exclude_list:
+        rule_sets.append({
+            "index": len(rule_sets),
+            "rules": rewrite_dict,
+            "name": name,
+            "include": paths_include,
+            "exclude": paths_exclude,
+            "ignore_previous": ignore_previous,
+            "callback": _make_callback(replaces, rewrite_matcher, is_action_replace, is_action_rewrite),
+        })
+
+    # plan: collect the actions (rule sets) of every file, the tree is only walked once
+    plan: dict[str, list[dict]] = {}
+    for rule_set, paths in zip(rule_sets, _assign_files(rule_sets)):
+        for path in paths:
+            # ignore files which have been processed by an earlier rule set
+            if not rule_set["ignore_previous"] and path in processed_files:
                 continue
-
-            print(f'[{name}] Processing "{path}" ...')
-
-            # ignore files which have been processed earlier
-            if not ignore_previous and path in processed_files:
-                continue
-            processed_files.update(path)
-
-            def callback(callback_key: str, callback_val: str) -> str:
-                callback_key = callback_key.lower().strip()
-
-                # replace?
-                if is_action_replace:
-                    callback_val = _run_action_replace(
-                        replace_map=replaces,
-                        action_replace_key=callback_key,
-                        action_replace_val=callback_val
-                    )
-
-                # rewrite
-                if is_action_rewrite and callback_key == "name":
-                    callback_val = _run_action_rewrite(
-                        rewrite_map=rewrite_replacement_map,
-                        action_rewrite_val=callback_val
-                    )
-
-                return callback_val
-
-            _open_single_file(path, callback, dry_run=_dry_run)
+            processed_files.add(path)
+            plan.setdefault(path, []).append(rule_set)
+
+    # execute: every file is read once and written at most once.
+    # files with the same rule sets are rewritten together in a process pool
+    groups: dict[tuple, list[str]] = {}
+    for path, actions in plan.items():
+        groups.setdefault(tuple(z["index"] for z in actions), []).append(path)
+    changed: set[str] = set()
+    skipped: set[str] = set()
+    for paths in groups.values():
+        actions = plan[paths[0]]
+        names = [z["name"] for z in actions]
+        fused = _fuse_callbacks([z["callback"] for z in actions])
+        for path in paths:
+            print(f'[{", ".join(names)}] Processing "{path}" ...')
+        for result in rewrite_files(
+                paths,
+                lambda content: _rewrite_content(content, fused),
+                # only changes of the rule sets of these files invalidate the cache
+                rules=rules_digest("cli_signal_name_rewrite", _rewrite_version, args[0], [z["rules"] for z in actions]),
+                workers=_workers,
+                dry_run=_dry_run
+        ):
+            if result.changed:
+                changed.add(result.path)
+            if result.skipped:
+                skipped.add(result.path)
+
+    print()
+    print(f"Summary: {len(changed)} of {len(plan)} files changed, {len(skipped)} already up to date"
+          f"{' (dry-run)' if _dry_run else ''}")
+    for path, actions in plan.items():
+        print(f'  {"*" if path in changed else " "} {path}: {", ".join(z["name"] for z in actions)}')
 
 
 if __name__ == '__main__':
@@ -2,19 +2,79 @@
 minimal implementation of FlipperFormat
 """
 
-from typing import Union, List
+import io
+
+from typing import Callable, Sequence, Union, List, NamedTuple
 
 class EOFException(Exception): pass
 class NotAPair(Exception): pass
 
+class ParseError(Exception):
+    """
+    a value of the file can't be parsed, str() is "file:line: message" (without the line if it is unknown)
+    """
+    def __init__(self, file_name: str, line_no: Union[int, None], message: str) -> None:
+        super().__init__(f"{file_name}:{line_no}: {message}" if line_no is not None else f"{file_name}: {message}")
+        self.file_name = file_name
+        self.line_no = line_no
+        self.message = message
+
+class Pair(NamedTuple):
+    key: str
+    value: str
+    line_no: int
+    comment: str
+
+def parse_hex_bytes(value: str) -> bytes:
+    """
+    "07 00 E0 FF" -> b"\\x07\\x00\\xe0\\xff", raises ValueError if a value is not a hex byte
+    """
+    res = []
+    for z in value.split():
+        b = int(z, base=16)
+        if not 0 <= b <= 0xFF:
+            raise ValueError(f"'{z}' is not a byte")
+        res.append(b)
+    return bytes(res)
+
+def tokenize(content: str, invalid: Callable[[int, str], None] = None) -> List[Pair]:
+    """
+    split the content of a FlipperFormat file into key:value records in a single pass.
+    comments and blank lines are skipped, but the last comment is attached to the following pairs.
+    if invalid is given, it is called with (line number, line) for every other line which is not a pair.
+    """
+    pairs = []
+    comment = ""
+    for line_no, line in enumerate(content.splitlines(), start=1):
+        if line.startswith("#"):
+            comment = line[1:].strip()
+            continue
+        col = line.find(":")
+        if col < 0:
+            if invalid is not None and line.strip():
+                invalid(line_no, line)
+            continue
+        pairs.append(Pair(line[:col].strip(), line[col+1:].strip(), line_no, comment))
+    return pairs
+
 class FlipperFormat:
     file_name: str
     last_comment: str
 
-    def __init__(self, file_name):
+    def __init__(self, file_name, buffered: bool = True, content: str = None, invalid: Callable[[int, str], None] = None):
+        """
+        if content is given, it is parsed instead of the file (file_name is only used as the source).
+        invalid is passed to tokenize (buffered files only), e.g. to lint the lines which are skipped.
+        """
         self.file_name = file_name
         self.last_comment = ""
-        self.fd = open(self.file_name, "r", encoding="UTF-8")
+        self.buffered = buffered
+        self.fd = io.StringIO(content) if content is not None else open(self.file_name, "r", encoding="UTF-8")
+        if self.buffered:
+            # read the whole file once and work on the tokenized pairs
+            self.pairs = tokenize(self.fd.read(), invalid)
+            self.pos = 0
+            self.fd.close()
 
     def __enter__(self):
         return self
@@ -31,11 +91,49 @@ class FlipperFormat:
         return self.file_name
 
     def rewind(self) -> None:
-        self.fd.seek(0)
-    
+        if self.buffered:
+            self.pos = 0
+        else:
+            self.fd.seek(0)
+
     def get_last_comment(self) -> str:
         return self.last_comment
-    
+
+    def tell(self) -> int:
+        return self.pos if self.buffered else self.fd.tell()
+
+    def seek(self, pos: int) -> None:
+        if self.buffered:
+            self.pos = pos
+        else:
+            self.fd.seek(pos)
+
+    def at_end(self) -> bool:
+        if self.buffered:
+            return self.pos >= len(self.pairs)
+        pos = self.fd.tell()
+        try:
+            self.read_next_pair()
+        except EOFException:
+            return True
+        finally:
+            self.fd.seek(pos)
+        return False
+
+    def peek_key(self) -> Union[str, None]:
+        """
+        returns the key of the next pair without consuming it (or None at the end of the file)
+        """
+        if self.buffered:
+            return self.pairs[self.pos].key if self.pos < len(self.pairs) else None
+        pos = self.fd.tell()
+        try:
+            return self.read_next_pair()[0]
+        except EOFException:
+            return None
+        finally:
+            self.fd.seek(pos)
+
     def _read_next_line_pair(self) -> List[str]:
         line = self.fd.readline()
         if not line: # EOL
@@ -51,6 +149,13 @@ class FlipperFormat:
         return [z.strip() for z in line.split(":", 1)]
 
     def read_next_pair(self) -> List[str]:
+        if self.buffered:
+            if self.pos >= len(self.pairs):
+                raise EOFException()
+            pair = self.pairs[self.pos]
+            self.pos += 1
+            self.last_comment = pair.comment
+            return [pair.key, pair.value]
         while True:
             try:
                 return self._read_next_line_pair()
@@ -58,9 +163,18 @@ class FlipperFormat:
                 continue
 
     def read_str(self, key: str) -> str:
+        if self.buffered:
+            pairs = self.pairs
+            for pos in range(self.pos, len(pairs)):
+                if pairs[pos].key == key:
+                    self.pos = pos + 1
+                    self.last_comment = pairs[pos].comment
+                    return pairs[pos].value
+            self.pos = len(pairs)
+            raise EOFException()
         while True:
             k, v = self.read_next_pair()
-            if k == key: 
+            if k == key:
                 return v
 
     def read_int(self, key: str) -> int:
@@ -72,10 +186,34 @@ class FlipperFormat:
     def read_hex_multi(self, key: str) -> List[int]:
         return [int(z, base=16) for z in self.read_str(key).split()]
 
+    def read_bytes(self, key: str) -> bytes:
+        """
+        reads space separated hex bytes, raises ParseError (with the line number) for other values
+        """
+        value = self.read_str(key)
+        try:
+            return parse_hex_bytes(value)
+        except ValueError:
+            raise ParseError(self.file_name, self.get_line_no(), f"{key} '{value}' is not a list of hex bytes")
+
+    def get_line_no(self) -> Union[int, None]:
+        """
+        line of the last read pair, unbuffered files don't keep track of lines
+        """
+        if self.buffered and self.pos > 0:
+            return self.pairs[min(self.pos, len(self.pairs)) - 1].line_no
+        return None
+
     def read_float(self, key: str) -> Union[float, None]:
         return float(self.read_str(key))
 
     def count_subsequent_keys(self, key: str) -> int:
+        if self.buffered:
+            pairs = self.pairs
+            end = self.pos
+            while end < len(pairs) and pairs[end].key == key:
+                end += 1
+            return end - self.pos
         count = 0
         pos = self.fd.tell()
         while True:
@@ -102,4 +240,73 @@ def marshal(a: dict) -> str:
         if type(v) != str:
             v = str(v)
         r += f"{k}: {v}"
-    return r
\ No newline at end of file
+    return r
+
+class FlipperFormatWriter:
+    """
+    writes FlipperFormat pairs and comments directly to a buffered file handle
+
+    with FlipperFormatWriter("out.ir") as ffw:
+        ffw.write_header("IR signals file", 1)
+        ffw.write_comment()
+        ffw.write_pair("name", "POWER")
+    """
+
+    def __init__(self, file_name, buffer_size: int = 1 << 16, final_newline: bool = True):
+        """
+        without final_newline the last line is not terminated (like "\n".join(lines))
+        """
+        self.file_name = file_name
+        self.fd = open(self.file_name, "w", encoding="UTF-8", buffering=buffer_size)
+        self.final_newline = final_newline
+        # the line break of the previous line is only written once the next line follows
+        self.eol = ""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        if self.final_newline:
+            self.fd.write(self.eol)
+        self.eol = ""
+        self.fd.close()
+
+    # ------------------------------------------------------------
+
+    def get_file_name(self):
+        return self.file_name
+
+    def _write_line(self, line: str) -> None:
+        self.fd.write(self.eol)
+        self.fd.write(line)
+        self.eol = "\n"
+
+    def write_header(self, filetype: str, version: int) -> None:
+        self.write_pair("Filetype", filetype)
+        self.write_pair("Version", version)
+
+    def write_comment(self, comment: str = "") -> None:
+        self._write_line(f"# {comment}" if comment else "#")
+
+    def write_pair(self, key: str, value) -> None:
+        if type(value) != str:
+            value = str(value)
+        self._write_line(f"{key}: {value}")
+
+    def write_values(self, key: str, values: Sequence, per_line: int = 0) -> None:
+        """
+        writes the values space separated. if per_line is set, the values are wrapped
+        into multiple subsequent key: lines with at most per_line values each.
+        """
+        if per_line <= 0 or len(values) <= per_line:
+            self.write_pair(key, ' '.join(str(z) for z in values))
+            return
+        for i in range(0, len(values), per_line):
+            self.write_pair(key, ' '.join(str(z) for z in values[i:i+per_line]))
+
+    def write_dict(self, a: dict) -> None:
+        for k, v in a.items():
+            self.write_pair(k, v)
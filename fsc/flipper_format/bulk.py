@@ -1,39 +1,191 @@
 import json
+import os
 
+from array import array
 from glob import glob
+from multiprocessing import Pool
+from typing import Iterator, List, Tuple, Union
 
-from fsc.flipper_format.base import FlipperFormat
-from fsc.flipper_format.infrared import read_ir
+from fsc.flipper_format.base import FlipperFormat, FlipperFormatWriter
+from fsc.flipper_format.cache import ParseCache
+from fsc.flipper_format.decoder import decode_all
+from fsc.flipper_format.lazy import LazyIRReader
+from fsc.flipper_format.infrared import IR_FILETYPE, IR_VERSION, ParsedSignal, RawSignal, read_ir, signal_from_obj, write_signal
 
-def parse_all_ir_unique(pattern):
+def _serialize(signal: Union[RawSignal, ParsedSignal]) -> tuple:
+    # compact tuple which is cheap to send between processes
+    if signal.is_raw:
+        return (signal.digest(), True, signal.name, signal.get_last_comment(),
+                signal.frequency, signal.duty_cycle, signal.data.tobytes())
+    return (signal.digest(), False, signal.name, signal.get_last_comment(),
+            signal.protocol, signal.address, signal.command)
+
+def _deserialize(src: str, t: tuple) -> Union[RawSignal, ParsedSignal]:
+    h, is_raw, name, comment, a, b, c = t
+    if is_raw:
+        data = array("i")
+        data.frombytes(c)
+        r = RawSignal(src, name, frequency=a, duty_cycle=b, data=data)
+    else:
+        r = ParsedSignal(src, name, protocol=a, address=b, command=c)
+    r.set_last_comment(comment)
+    # the digest was already computed by the worker
+    r._digest = h
+    return r
+
+def _parse_file(args: Tuple[str, bool]) -> List[tuple]:
+    file_name, decode_raw = args
+    with FlipperFormat(file_name) as fff:
+        signals = list(read_ir(fff))
+    if decode_raw:
+        # identical captures in the file are only decoded once
+        signals = decode_all(signals)
+    return [_serialize(z) for z in signals]
+
+def iter_all_ir(pattern, workers=1, decode_raw=False, use_cache=True) -> Iterator[Tuple[str, List[Union[RawSignal, ParsedSignal]]]]:
+    """
+    yields (file name, signals) for every file matching the pattern, ordered by path.
+    if workers is greater than 1 (or 0 for all cores), the files are parsed in a process pool.
+    the result is the same for any number of workers.
+    unless use_cache is disabled, only files which changed since the last run are parsed.
+    """
+    return iter_ir_files(sorted(glob(pattern, recursive=True)), workers, decode_raw, use_cache)
+
+def iter_ir_files(files, workers=1, decode_raw=False, use_cache=True) -> Iterator[Tuple[str, List[Union[RawSignal, ParsedSignal]]]]:
+    """
+    same as iter_all_ir, but for a list of files (in the given order)
+    """
+    variant = "decoded" if decode_raw else ""
+    tasks = [(z, decode_raw) for z in files]
+    for file_name, signals in _iter_parsed(files, _parse_file, tasks, variant, workers, use_cache):
+        yield file_name, [_deserialize(file_name, z) for z in signals]
+
+def _digest_file(file_name: str) -> List[Tuple[bytes, str]]:
+    # only the name: and type: lines are indexed, raw timings are hashed from the text and dropped
+    with LazyIRReader(file_name) as reader:
+        return [(z.digest(), z.name) for z in reader]
+
+def iter_all_ir_digests(pattern, workers=1, use_cache=True) -> Iterator[Tuple[str, List[Tuple[bytes, str]]]]:
+    """
+    yields (file name, [(digest, name)]) for every file matching the pattern, ordered by path.
+    much cheaper than iter_all_ir for tools which only compare digests, no signal is ever built.
+    """
+    return iter_ir_file_digests(sorted(glob(pattern, recursive=True)), workers, use_cache)
+
+def iter_ir_file_digests(files, workers=1, use_cache=True) -> Iterator[Tuple[str, List[Tuple[bytes, str]]]]:
+    """
+    same as iter_all_ir_digests, but for a list of files (in the given order)
+    """
+    for file_name, digests in _iter_parsed(files, _digest_file, list(files), "digests", workers, use_cache):
+        yield file_name, [tuple(z) for z in digests]
+
+def _iter_parsed(files, parse, tasks, variant, workers, use_cache) -> Iterator[Tuple[str, list]]:
+    # yields (file name, parse(task)) in the order of the files, from the cache or parsed in a process pool
+    files = list(files)
+    if workers == 0:
+        workers = os.cpu_count() or 1
+
+    cache = ParseCache() if use_cache else None
+    try:
+        # only the freshness is checked up front, the entries are loaded when their file is yielded
+        fresh = {z for z in files if cache.is_fresh(z, variant)} if cache is not None else set()
+        stale = [task for file_name, task in zip(files, tasks) if file_name not in fresh]
+
+        pool = Pool(workers) if workers > 1 and len(stale) > 1 else None
+        try:
+            # both map and imap keep the order of the input files
+            results = pool.imap(parse, stale, chunksize=16) if pool is not None else map(parse, stale)
+            for file_name, task in zip(files, tasks):
+                if file_name in fresh:
+                    res = cache.get(file_name, variant)
+                    if res is None:
+                        # the file changed since it was checked
+                        res = parse(task)
+                        cache.put(file_name, variant, res)
+                else:
+                    res = next(results)
+                    if cache is not None:
+                        cache.put(file_name, variant, res)
+                yield file_name, res
+        finally:
+            if pool is not None:
+                pool.terminate()
+    finally:
+        if cache is not None:
+            cache.close()
+
+def parse_all_ir_unique(pattern, decode_raw=False, workers=1, use_cache=True):
+    """
+    returns {signal: signal} with the first signal of every content.
+    the signals themselves are the keys, so signals are only merged if they are equal (__eq__),
+    not if their digests collide.
+    """
     all = {}
-    for file_name in glob(pattern, recursive=True):
-        with FlipperFormat(file_name) as fff:
-            signals = read_ir(fff)
-            for signal in signals:
-                h = hash(signal)
-                if h in all:
-                    continue
-                all[h] = signal
+    for _, signals in iter_all_ir(pattern, workers=workers, decode_raw=decode_raw, use_cache=use_cache):
+        for signal in signals:
+            if signal in all:
+                continue
+            all[signal] = signal
     return all
 
-def write_all_ir_json(file_name, signals):
+def _to_record(signal: Union[RawSignal, ParsedSignal], with_source=False, with_comment=False) -> dict:
+    obj = signal.to_obj()
+    if with_source:
+        obj["source"] = signal.get_source()
+    if with_comment and signal.get_last_comment():
+        obj["comment"] = signal.get_last_comment()
+    return obj
+
+def write_all_ir_json(file_name, signals, with_source=False, with_comment=False):
+    # the array is written one signal at a time instead of dumping one big list
     with open(file_name, "w") as f:
-        json.dump([z.to_obj() for z in signals], f)
-
-def write_all_ir_ir(file_name, signals, with_source=False):
-    with open(file_name, "w", encoding="UTF-8") as f:
-        if not with_source:
-            f.write("\n#\n".join([str(signal) for signal in signals]))
-        else:
-            for signal in signals:
-                f.write(f"# {signal.get_source()}\n")
-                f.write(str(signal))
-                f.write("\n")
+        f.write("[")
+        for i, signal in enumerate(signals):
+            if i > 0:
+                f.write(", ")
+            f.write(json.dumps(_to_record(signal, with_source, with_comment)))
+        f.write("]")
+
+def write_all_ir_ndjson(file_name, signals, with_source=False, with_comment=False):
+    with open(file_name, "w") as f:
+        for signal in signals:
+            f.write(json.dumps(_to_record(signal, with_source, with_comment)))
+            f.write("\n")
+
+def read_all_ir_ndjson(file_name) -> Iterator[Union[RawSignal, ParsedSignal]]:
+    """
+    reads signals written by write_all_ir_ndjson back, one line at a time
+    """
+    with open(file_name, "r") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            obj = json.loads(line)
+            r = signal_from_obj(obj, obj.get("source", file_name))
+            r.set_last_comment(obj.get("comment", ""))
+            yield r
+
+def write_all_ir_ir(file_name, signals, with_source=False, with_header=False, data_per_line=0):
+    """
+    without source the signals are separated by a "#" line, with source every signal starts with
+    a "# <source>" comment. the header and the wrapping of raw data (see write_signal) are opt-in.
+    """
+    # without source the last line is not terminated, just like "\n#\n".join(...) did
+    with FlipperFormatWriter(file_name, final_newline=with_source) as ffw:
+        if with_header:
+            ffw.write_header(IR_FILETYPE, IR_VERSION)
+        for i, signal in enumerate(signals):
+            if with_source:
+                ffw.write_comment(signal.get_source())
+            elif i > 0 or with_header:
+                ffw.write_comment()
+            write_signal(ffw, signal, data_per_line)
 
 def write_all_ir(file_name, signals):
     if file_name.endswith(".json"):
         return write_all_ir_json(file_name, signals)
+    elif file_name.endswith(".jsonl") or file_name.endswith(".ndjson"):
+        return write_all_ir_ndjson(file_name, signals)
     elif file_name.endswith(".ir"):
         return write_all_ir_ir(file_name, signals)
     else:
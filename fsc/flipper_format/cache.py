@@ -0,0 +1,138 @@
+"""
+persistent parse cache for .ir files.
+
+the parsed signals of every file are stored (in the compact form used by bulk) in a sqlite database,
+keyed by the path, modification time, size and parser version. only files which changed since
+the last run have to be parsed again.
+
+the entries are stored as json (bytes as base64), the cache file is never unpickled.
+"""
+
+import base64
+import json
+import os
+import sqlite3
+
+from hashlib import blake2b
+from typing import List, Tuple, Union
+
+# bump this if the format of the entries changes, this invalidates all cached entries
+PARSER_VERSION = 2
+
+# changes to these modules change what the parser (and the decoder) produce
+PARSER_SOURCES = ("base.py", "infrared.py", "lazy.py", "decoder.py", "ir_protocols.py", "bulk.py")
+
+def parser_version() -> int:
+    """
+    PARSER_VERSION combined with a digest of the parser sources, so entries of an older parser are never used
+    """
+    h = blake2b(str(PARSER_VERSION).encode("UTF-8"), digest_size=7)
+    for name in PARSER_SOURCES:
+        with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), name), "rb") as f:
+            h.update(f.read())
+    # 56 bits still fit into an sqlite INTEGER
+    return int.from_bytes(h.digest(), "little")
+
+def _encode(value):
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return {"b64": base64.b64encode(value).decode("ascii")}
+    raise TypeError(f"{type(value).__name__} can't be cached")
+
+def _decode(obj: dict):
+    if "b64" in obj:
+        return base64.b64decode(obj["b64"])
+    return obj
+
+def default_cache_file(name: str = "parse_cache.sqlite") -> str:
+    cache_dir = os.environ.get("FSC_CACHE_DIR") or \
+        os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "fsc")
+    return os.path.join(cache_dir, name)
+
+def file_key(file_name: str) -> Union[Tuple[str, int, int], None]:
+    """
+    returns (absolute path, mtime in ns, size), or None if the file does not exist
+    """
+    try:
+        st = os.stat(file_name)
+    except OSError:
+        return None
+    return os.path.abspath(file_name), st.st_mtime_ns, st.st_size
+
+class ParseCache:
+    """
+    with ParseCache() as cache:
+        signals = cache.get(file_name, variant)
+        if signals is None:
+            cache.put(file_name, variant, parse(file_name))
+    """
+
+    def __init__(self, file_name: str = None) -> None:
+        self.file_name = file_name or default_cache_file()
+        os.makedirs(os.path.dirname(os.path.abspath(self.file_name)), exist_ok=True)
+        self.db = sqlite3.connect(self.file_name, timeout=30)
+        self.db.execute("""CREATE TABLE IF NOT EXISTS files (
+            path TEXT NOT NULL,
+            variant TEXT NOT NULL,
+            mtime INTEGER NOT NULL,
+            size INTEGER NOT NULL,
+            version INTEGER NOT NULL,
+            signals BLOB NOT NULL,
+            PRIMARY KEY (path, variant)
+        )""")
+        self.pending = 0
+        self.version = parser_version()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self.db.commit()
+        self.db.close()
+
+    # ------------------------------------------------------------
+
+    def _row(self, file_name: str, variant: str, column: str) -> Union[tuple, None]:
+        key = file_key(file_name)
+        if key is None:
+            return None
+        row = self.db.execute(f"SELECT mtime, size, version, {column} FROM files WHERE path = ? AND variant = ?",
+                              (key[0], variant)).fetchone()
+        if row is None or tuple(row[:3]) != (key[1], key[2], self.version):
+            return None
+        return row
+
+    def is_fresh(self, file_name: str, variant: str = "") -> bool:
+        """
+        checks that the entry of the file is up to date without loading it
+        """
+        return self._row(file_name, variant, "NULL") is not None
+
+    def get(self, file_name: str, variant: str = "") -> Union[List[tuple], None]:
+        """
+        returns the cached (serialized) signals of the file, or None if the entry is missing, stale or broken
+        """
+        row = self._row(file_name, variant, "signals")
+        if row is None:
+            return None
+        try:
+            return [tuple(z) for z in json.loads(row[3], object_hook=_decode)]
+        except (ValueError, TypeError):
+            return None
+
+    def put(self, file_name: str, variant: str, signals: List[tuple]) -> None:
+        key = file_key(file_name)
+        if key is None:
+            return
+        self.db.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?)",
+                        (key[0], variant, key[1], key[2], self.version, json.dumps(signals, default=_encode)))
+        self.pending += 1
+        if self.pending >= 500:
+            self.db.commit()
+            self.pending = 0
+
+    def clear(self) -> None:
+        self.db.execute("DELETE FROM files")
+        self.db.commit()
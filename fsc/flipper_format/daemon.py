@@ -0,0 +1,107 @@
+"""
+tiny json-over-http server on localhost.
+
+the finder scripts use it to keep their database loaded between queries:
+
+    python duplicate_finder.py --serve          # loads the database once
+    python duplicate_finder.py --client a.ir    # answers in milliseconds
+
+everything a handler prints is sent back to the client and printed there.
+"""
+
+import contextlib
+import http.client
+import io
+import json
+import os
+import time
+
+from glob import glob
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from typing import Callable, Dict, List, Tuple
+
+from fsc.flipper_format.cache import file_key
+
+DEFAULT_ADDRESS = ("127.0.0.1", 8461)
+
+class TreeState:
+    """
+    remembers (mtime, size) of every file matching the pattern to find changed files
+    """
+
+    def __init__(self, pattern: str, interval: float = 1.0) -> None:
+        self.pattern = pattern
+        self.interval = interval # the tree is scanned at most once per interval
+        self.keys: Dict[str, Tuple[int, int]] = {}
+        self.last_scan = 0
+
+    def scan(self, force: bool = False) -> Tuple[List[str], List[str]]:
+        """
+        returns (changed or new files, removed files) since the last scan
+        """
+        if not force and time.monotonic() - self.last_scan < self.interval:
+            return [], []
+        self.last_scan = time.monotonic()
+        keys = {}
+        for file_name in glob(self.pattern, recursive=True):
+            key = file_key(file_name)
+            if key is not None:
+                keys[file_name] = key[1:]
+        changed = sorted(z for z, k in keys.items() if self.keys.get(z) != k)
+        removed = sorted(z for z in self.keys if z not in keys)
+        self.keys = keys
+        return changed, removed
+
+def resolve_path(cwd: str, path: str) -> str:
+    """
+    paths are sent as the client passed them, relative to the working directory of the client
+    """
+    if os.path.isabs(path) or os.path.abspath(cwd) == os.getcwd():
+        return path
+    return os.path.relpath(os.path.join(cwd, path))
+
+def serve(handle: Callable[[dict], dict], address: Tuple[str, int] = DEFAULT_ADDRESS) -> None:
+    """
+    serves requests until interrupted. requests are handled one at a time.
+    """
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            try:
+                req = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                out = io.StringIO()
+                with contextlib.redirect_stdout(out):
+                    res = handle(req) or {}
+                res["output"] = out.getvalue()
+                code = 200
+            except Exception as e:
+                res, code = {"error": f"{type(e).__name__}: {e}"}, 500
+            body = json.dumps(res).encode("UTF-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    with HTTPServer(address, Handler) as server:
+        print(f"[daemon] listening on http://{address[0]}:{address[1]}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+def request(req: dict, address: Tuple[str, int] = DEFAULT_ADDRESS, timeout: float = 600) -> dict:
+    """
+    sends a request to the daemon. the working directory of the client is always sent along.
+    """
+    conn = http.client.HTTPConnection(*address, timeout=timeout)
+    try:
+        conn.request("POST", "/", json.dumps({"cwd": os.getcwd(), **req}), {"Content-Type": "application/json"})
+        res = json.loads(conn.getresponse().read())
+    finally:
+        conn.close()
+    if "error" in res:
+        raise Exception(f"daemon: {res['error']}")
+    return res
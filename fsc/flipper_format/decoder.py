@@ -0,0 +1,185 @@
+"""
+decodes raw signals to parsed signals using the timing templates in ir_protocols.
+
+a raw signal is only decoded if *every* frame it contains decodes to the same
+protocol, address and command (or is a repeat frame of the protocol).
+"""
+
+from typing import Dict, Iterable, List, Tuple, Union
+
+from fsc.flipper_format.infrared import ParsedSignal, RawSignal
+from fsc.flipper_format.ir_protocols import PROTOCOLS, Manchester, PulseDistance
+
+TOLERANCE = 0.3
+
+# spaces longer than this separate two frames
+FRAME_GAP = 8000
+
+Decoded = Tuple[str, int, int] # (protocol, address, command)
+
+def _near(duration: int, target: int) -> bool:
+    return abs(duration - target) <= TOLERANCE * target
+
+def split_frames(data: Iterable[int]) -> List[List[int]]:
+    """
+    splits raw timings (mark, space, mark, ...) into frames which start with a mark
+    """
+    frames, frame = [], []
+    for i, duration in enumerate(data):
+        duration = abs(duration)
+        if i % 2 == 1 and duration >= FRAME_GAP:
+            if frame:
+                frames.append(frame)
+            frame = []
+            continue
+        frame.append(duration)
+    if frame:
+        frames.append(frame)
+    return frames
+
+def _decode_pulse_distance(frame: List[int], t: PulseDistance) -> Union[int, None]:
+    i = 0
+    if t.header_mark:
+        if len(frame) < 2 or not _near(frame[0], t.header_mark) or not _near(frame[1], t.header_space):
+            return None
+        i = 2
+    value = 0
+    for bit in range(t.bits):
+        if i >= len(frame):
+            return None
+        mark = frame[i]
+        # the space of the last bit is missing if there is no stop bit
+        space = frame[i + 1] if i + 1 < len(frame) else None
+        if space is None and (bit != t.bits - 1 or t.stop_mark):
+            return None
+        if _near(mark, t.one_mark) and (space is None or _near(space, t.one_space)):
+            value |= 1 << bit
+        elif not (_near(mark, t.zero_mark) and (space is None or _near(space, t.zero_space))):
+            return None
+        i += 2
+    if t.stop_mark:
+        if i >= len(frame) or not _near(frame[i], t.stop_mark):
+            return None
+        i += 1
+    # the frame has to be consumed completely
+    return value if i >= len(frame) else None
+
+def _half_bits(frame: List[int], unit: int, max_units: int) -> Union[List[int], None]:
+    # expands mark/space durations to a list of half bit levels (1 = mark)
+    levels = []
+    for i, duration in enumerate(frame):
+        units = round(duration / unit)
+        if units < 1 or units > max_units or abs(duration - units * unit) > TOLERANCE * unit * units:
+            return None
+        levels.extend([1 - i % 2] * units)
+    return levels
+
+def _bits_from_halves(halves: List[int], one: Tuple[int, int]) -> Union[int, None]:
+    value = 0
+    for i in range(0, len(halves), 2):
+        pair = (halves[i], halves[i + 1])
+        if pair[0] == pair[1]:
+            return None
+        value = value << 1 | (pair == one)
+    return value
+
+def _decode_rc5(frame: List[int], t: Manchester) -> Union[int, None]:
+    # the first half of the start bit is a space and therefore not part of the raw data
+    halves = _half_bits(frame, t.unit, 2)
+    if halves is None:
+        return None
+    halves = [0] + halves
+    if len(halves) % 2:
+        halves.append(0)
+    if len(halves) != t.bits * 2:
+        return None
+    return _bits_from_halves(halves, (0, 1))
+
+def _decode_rc6(frame: List[int], t: Manchester) -> Union[int, None]:
+    if len(frame) < 2 or not _near(frame[0], t.header_mark) or not _near(frame[1], t.header_space):
+        return None
+    halves = _half_bits(frame[2:], t.unit, 3)
+    if halves is None:
+        return None
+    # start bit (2 halves), 3 mode bits (6 halves), toggle bit (4 halves), data
+    size = 2 + 6 + 4 + t.bits * 2
+    if len(halves) == size - 1:
+        halves.append(0)
+    if len(halves) != size:
+        return None
+    if _bits_from_halves(halves[:8], (1, 0)) != 0b1000:
+        # start bit has to be 1 and only mode 0 is supported
+        return None
+    if halves[8:12] not in ([1, 1, 0, 0], [0, 0, 1, 1]):
+        return None
+    return _bits_from_halves(halves[12:], (1, 0))
+
+def _decode_bits(frame: List[int], timing: Union[PulseDistance, Manchester]) -> Union[int, None]:
+    if isinstance(timing, PulseDistance):
+        return _decode_pulse_distance(frame, timing)
+    # RC6 is the only manchester protocol with a leader
+    return _decode_rc6(frame, timing) if timing.header_mark else _decode_rc5(frame, timing)
+
+def _is_repeat(frame: List[int], timing: Union[PulseDistance, Manchester]) -> bool:
+    repeat = getattr(timing, "repeat", ())
+    return len(repeat) == len(frame) and all(_near(d, r) for d, r in zip(frame, repeat))
+
+def decode(signal: RawSignal) -> Union[Decoded, None]:
+    """
+    returns (protocol, address, command) if the raw signal is one of the known protocols
+    """
+    frames = split_frames(signal.data)
+    if not frames:
+        return None
+    bits_cache = {}
+    for protocol in PROTOCOLS.values():
+        timing = protocol.timing
+        decoded = None
+        for frame in frames:
+            if decoded is not None and _is_repeat(frame, timing):
+                continue
+            key = (id(timing), tuple(frame))
+            if key not in bits_cache:
+                bits_cache[key] = _decode_bits(frame, timing)
+            bits = bits_cache[key]
+            fields = protocol.unpack(bits) if bits is not None else None
+            if fields is None or (decoded is not None and fields != decoded):
+                decoded = None
+                break
+            decoded = fields
+        if decoded is not None:
+            return protocol.name, decoded[0], decoded[1]
+    return None
+
+def _to_parsed(signal: RawSignal, decoded: Decoded) -> ParsedSignal:
+    protocol, address, command = decoded
+    r = ParsedSignal(signal.get_source(), signal.get_name(), protocol,
+                     address.to_bytes(4, "little"), command.to_bytes(4, "little"))
+    r.set_last_comment(signal.get_last_comment())
+    return r
+
+def decode_signal(signal: Union[RawSignal, ParsedSignal]) -> Union[RawSignal, ParsedSignal]:
+    """
+    returns the parsed equivalent of a raw signal, or the signal itself if it cannot be decoded
+    """
+    if not signal.is_raw:
+        return signal
+    decoded = decode(signal)
+    return _to_parsed(signal, decoded) if decoded is not None else signal
+
+def decode_all(signals: Iterable[Union[RawSignal, ParsedSignal]]) -> List[Union[RawSignal, ParsedSignal]]:
+    """
+    decodes many signals at once. identical raw signals (e.g. the same capture in many files)
+    are only decoded once.
+    """
+    cache: Dict[bytes, Union[Decoded, None]] = {}
+    res = []
+    for signal in signals:
+        if not signal.is_raw:
+            res.append(signal)
+            continue
+        h = signal.digest()
+        if h not in cache:
+            cache[h] = decode(signal)
+        res.append(_to_parsed(signal, cache[h]) if cache[h] is not None else signal)
+    return res
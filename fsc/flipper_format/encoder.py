@@ -0,0 +1,88 @@
+"""
+expands parsed signals to the raw timings the flipper would transmit.
+the protocol specific parts (timings and bit layout) come from ir_protocols.
+"""
+
+from array import array
+from functools import lru_cache
+from typing import List, Tuple, Union
+
+from fsc.flipper_format.infrared import ParsedSignal, RawSignal
+from fsc.flipper_format.ir_protocols import PROTOCOLS, Manchester, PulseDistance
+
+def _pulse_distance(t: PulseDistance, bits: int) -> List[int]:
+    res = [t.header_mark, t.header_space] if t.header_mark else []
+    for bit in range(t.bits):
+        if bits >> bit & 1:
+            res += [t.one_mark, t.one_space]
+        else:
+            res += [t.zero_mark, t.zero_space]
+    if t.stop_mark:
+        res.append(t.stop_mark)
+    else:
+        # the space of the last bit is part of the pause after the frame
+        res.pop()
+    return res
+
+def _from_halves(halves: List[int], unit: int) -> List[int]:
+    # run length encodes half bit levels (1 = mark) to mark/space durations
+    res, prev = [], None
+    for level in halves:
+        if level == prev:
+            res[-1] += unit
+        else:
+            res.append(unit)
+            prev = level
+    # frames start with a mark and the trailing space is part of the pause
+    if halves and halves[0] == 0:
+        res.pop(0)
+    if halves and halves[-1] == 0:
+        res.pop()
+    return res
+
+def _manchester(t: Manchester, bits: int) -> List[int]:
+    data = []
+    for bit in range(t.bits - 1, -1, -1):
+        data += [1, 0] if bits >> bit & 1 else [0, 1]
+    if not t.header_mark:
+        # RC5: start bit, field bit and toggle bit are part of the bits, 1 = space -> mark
+        return _from_halves([1 - z for z in data], t.unit)
+    # RC6: leader, start bit (1), mode 0, toggle bit (0, double width), 1 = mark -> space
+    halves = [1, 0] + [0, 1] * 3 + [0, 0, 1, 1] + data
+    return [t.header_mark, t.header_space] + _from_halves(halves, t.unit)
+
+@lru_cache(maxsize=4096)
+def _encode(protocol: str, address: int, command: int, repeats: int) -> Tuple[int, ...]:
+    p = PROTOCOLS[protocol]
+    t = p.timing
+    bits = p.pack(address, command)
+    frame = _pulse_distance(t, bits) if isinstance(t, PulseDistance) else _manchester(t, bits)
+    res, last = list(frame), frame
+    for _ in range(repeats):
+        # pause until the next frame starts
+        res.append(max(t.repeat_period - sum(last), 0))
+        last = getattr(t, "repeat", ()) or frame
+        res += last
+    return tuple(res)
+
+def encode(protocol: str, address: int, command: int, repeats: int = 0) -> array:
+    """
+    returns the raw timings (mark, space, mark, ...) of the given parsed signal.
+    the timings are cached per (protocol, address, command).
+    """
+    if protocol not in PROTOCOLS:
+        raise Exception(f"unsupported protocol '{protocol}'")
+    return array("i", _encode(protocol, address, command, repeats))
+
+def encode_signal(signal: ParsedSignal, repeats: int = 0) -> Union[RawSignal, None]:
+    """
+    returns the raw equivalent of a parsed signal (or None if the protocol is not supported)
+    """
+    if signal.protocol not in PROTOCOLS:
+        return None
+    t = PROTOCOLS[signal.protocol].timing
+    data = encode(signal.protocol, int.from_bytes(signal.address, "little"),
+                  int.from_bytes(signal.command, "little"), repeats)
+    r = RawSignal(signal.get_source(), signal.get_name(), t.frequency, t.duty_cycle, data)
+    r.set_last_comment(signal.get_last_comment())
+    return r
@@ -0,0 +1,106 @@
+"""
+groups the files of the IRDB into device families.
+
+two files belong to the same family if they share at least min_overlap identical signals,
+families are the connected components of this relation. files are added one at a time,
+so the signals of the whole IRDB never have to be in memory at once.
+
+with min_overlap > 1 the shared signals of every pair of files have to be counted. this is done once
+all files are added: signals which are contained in more than max_holders files (e.g. the power code
+of a common NEC remote) are not counted, they say nothing about the family of a file and would make
+the counting quadratic.
+"""
+
+from typing import Iterable, List, NamedTuple, Tuple
+
+from fsc.flipper_format.index import DigestIndex, UnionFind
+
+class CoreSignal(NamedTuple):
+    digest: bytes
+    name: str # name of the first occurrence
+    files: int # number of members containing the signal
+
+class Family(NamedTuple):
+    files: List[str]
+    signals: int # distinct signals of all members
+    core: List[CoreSignal] # signals shared by at least core_share of the members
+    outliers: List[str] # members containing less than outlier_share of the core signals
+
+class FamilyClusterer:
+    """
+    clusterer = FamilyClusterer(min_overlap=2)
+    for path, signals in iter_all_ir("Flipper-IRDB/**/*.ir"):
+        clusterer.add_file(path, signals)
+    for family in clusterer.families():
+        ...
+    """
+
+    def __init__(self, min_overlap: int = 1, max_holders: int = 256) -> None:
+        self.min_overlap = max(1, min_overlap)
+        self.max_holders = max_holders
+        self.index = DigestIndex()
+        self.uf = UnionFind(0)
+        self.digests: List[Tuple[bytes, ...]] = []
+        self.names = {}
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def add_file(self, path: str, signals) -> int:
+        digests = []
+        for signal in signals:
+            h = signal.digest()
+            digests.append(h)
+            self.names.setdefault(h, signal.name)
+        return self.add_digests(path, digests)
+
+    def add_digests(self, path: str, digests: Iterable[bytes]) -> int:
+        unique = tuple(dict.fromkeys(digests))
+        file_id = self.index.add_file(path, unique)
+        self.uf.add()
+        self.digests.append(unique)
+        if self.min_overlap == 1:
+            # one union with the first holder of every signal is enough, this stays linear
+            for h in unique:
+                self.uf.union(file_id, self.index.lookup(h)[0])
+        return file_id
+
+    def _overlap_unions(self) -> UnionFind:
+        uf = UnionFind(len(self.digests))
+        for file_id, digests in enumerate(self.digests):
+            # common signals are skipped, so every signal costs at most max_holders steps
+            counts = self.index.count_common([h for h in digests if len(self.index.lookup(h)) <= self.max_holders])
+            for other, count in counts.items():
+                if other < file_id and count >= self.min_overlap:
+                    uf.union(file_id, other)
+        return uf
+
+    def families(self, core_share: float = 0.5, outlier_share: float = 0.5, min_size: int = 2) -> List[Family]:
+        """
+        returns all families with at least min_size members, largest first
+        """
+        uf = self.uf if self.min_overlap == 1 else self._overlap_unions()
+        groups = {}
+        for file_id in range(len(uf)):
+            groups.setdefault(uf.find(file_id), []).append(file_id)
+
+        res = []
+        for members in groups.values():
+            if len(members) < min_size:
+                continue
+            counts = {}
+            for file_id in members:
+                for h in self.digests[file_id]:
+                    counts[h] = counts.get(h, 0) + 1
+            core = [CoreSignal(h, self.names.get(h, ""), c) for h, c in counts.items()
+                    if c >= 2 and c >= core_share * len(members)]
+            core.sort(key=lambda x: -x.files)
+            core_digests = {z.digest for z in core}
+            outliers = []
+            for file_id in members:
+                covered = sum(1 for h in self.digests[file_id] if h in core_digests)
+                if covered < outlier_share * len(core_digests):
+                    outliers.append(self.index.paths[file_id])
+            res.append(Family([self.index.paths[z] for z in members], len(counts), core, outliers))
+        res.sort(key=lambda x: -len(x.files))
+        return res
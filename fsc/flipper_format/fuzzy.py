@@ -0,0 +1,199 @@
+"""
+tolerance based matching of raw signals.
+
+two captures of the same button almost never have exactly the same timings,
+so raw signals are compared pulse by pulse with a relative tolerance.
+to avoid comparing one signal against every raw signal in the database,
+signals are first looked up in a banded index of quantized pulse signatures.
+a query probes every bucket a pulse within the tolerance can fall into,
+so timings close to a bucket edge still find their match.
+"""
+
+import itertools
+import math
+
+from array import array
+from typing import Any, Callable, Dict, List, Tuple
+
+from fsc.flipper_format.infrared import RawSignal
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+DEFAULT_TOLERANCE = 0.2
+DEFAULT_LENGTH_TOLERANCE = 0.1
+
+# key of removed signals
+_REMOVED = object()
+
+def _length_ok(a: int, b: int, length_tolerance: float) -> bool:
+    return abs(a - b) <= length_tolerance * max(a, b)
+
+def similarity(a: array, b: array, tolerance: float = DEFAULT_TOLERANCE) -> float:
+    """
+    returns the fraction of pulses (of the longer signal) which are within the relative tolerance
+    """
+    n = min(len(a), len(b))
+    longest = max(len(a), len(b))
+    if longest == 0:
+        return 1.0
+    if np is not None:
+        x = np.abs(np.frombuffer(a, dtype=np.int32)[:n].astype(np.int64))
+        y = np.abs(np.frombuffer(b, dtype=np.int32)[:n].astype(np.int64))
+        ok = int(np.count_nonzero(np.abs(x - y) <= tolerance * np.maximum(x, y)))
+    else:
+        ok = 0
+        for i in range(n):
+            x, y = abs(a[i]), abs(b[i])
+            if abs(x - y) <= tolerance * max(x, y):
+                ok += 1
+    return ok / longest
+
+def is_similar(a: RawSignal, b: RawSignal, tolerance: float = DEFAULT_TOLERANCE,
+               length_tolerance: float = DEFAULT_LENGTH_TOLERANCE) -> bool:
+    """
+    two raw signals are similar if their lengths are within length_tolerance
+    and every pulse of the common prefix is within tolerance
+    """
+    if not _length_ok(len(a.data), len(b.data), length_tolerance):
+        return False
+    n = min(len(a.data), len(b.data))
+    return similarity(a.data[:n], b.data[:n], tolerance) >= 1.0
+
+class FuzzyIndex:
+    """
+    index = FuzzyIndex()
+    index.add(("TV.ir", "POWER"), signal)
+    for key, score in index.query(other_signal):
+        ...
+    """
+
+    def __init__(self, tolerance: float = DEFAULT_TOLERANCE, length_tolerance: float = DEFAULT_LENGTH_TOLERANCE,
+                 bands: int = 8, band_size: int = 4) -> None:
+        self.tolerance = tolerance
+        self.length_tolerance = length_tolerance
+        self.bands = bands
+        self.band_size = band_size
+        if not 0 <= tolerance < 1:
+            raise ValueError(f"tolerance has to be in [0, 1) (got {tolerance})")
+        # quantization step in log space, two pulses within the tolerance
+        # usually end up in the same bucket
+        self._step = math.log(1 + 2 * tolerance)
+        # pulses within the tolerance differ by at most this much in log space:
+        # |x - y| <= tolerance * max(x, y)  <=>  min(x, y) / max(x, y) >= 1 - tolerance
+        self._radius = -math.log(1 - tolerance) + 1e-9
+        self.keys: List[Any] = []
+        self.data: List[array] = []
+        self.buckets: Dict[Tuple, List[int]] = {}
+        self.removed = 0
+
+    def __len__(self) -> int:
+        return len(self.keys) - self.removed
+
+    def _quantize(self, pulse: int) -> int:
+        pulse = abs(pulse)
+        return int(math.log(pulse) / self._step) if pulse > 0 else -1
+
+    def _quantize_near(self, pulse: int) -> range:
+        # every bucket of a pulse within the tolerance, at most two as the step is wider than the radius
+        pulse = abs(pulse)
+        if pulse == 0:
+            return range(-1, 0)
+        log = math.log(pulse)
+        return range(max(0, math.floor((log - self._radius) / self._step)), int((log + self._radius) / self._step) + 1)
+
+    def _bands(self, q: list) -> List[Tuple[int, list]]:
+        if len(q) <= self.band_size:
+            return [(0, q)]
+        return [(i, q[i*self.band_size:(i+1)*self.band_size]) for i in range(len(q) // self.band_size)]
+
+    def signatures(self, data: array) -> List[Tuple]:
+        """
+        the first bands * band_size pulses are split into bands,
+        signals sharing at least one quantized band become candidates
+        """
+        q = [self._quantize(z) for z in data[:self.bands * self.band_size]]
+        return [(i, *band) for i, band in self._bands(q)]
+
+    def probe_signatures(self, data: array) -> List[Tuple]:
+        """
+        the signatures of every band an indexed signal can have if all of its pulses in that band
+        are within the tolerance of data (see signatures)
+        """
+        q = [self._quantize_near(z) for z in data[:self.bands * self.band_size]]
+        return [(i, *z) for i, band in self._bands(q) for z in itertools.product(*band)]
+
+    def add(self, key: Any, signal: RawSignal) -> None:
+        idx = len(self.keys)
+        self.keys.append(key)
+        self.data.append(signal.data)
+        for sig in self.signatures(signal.data):
+            if sig not in self.buckets:
+                self.buckets[sig] = []
+            self.buckets[sig].append(idx)
+
+    def remove(self, match: Callable[[Any], bool]) -> int:
+        """
+        removes every signal whose key matches and returns how many were removed.
+        the entries are only marked as removed, their slots are not reused.
+        """
+        count = 0
+        for idx, key in enumerate(self.keys):
+            if key is not _REMOVED and match(key):
+                self.keys[idx] = _REMOVED
+                self.data[idx] = array("i")
+                count += 1
+        self.removed += count
+        return count
+
+    def candidates(self, signal: RawSignal) -> List[int]:
+        found = set()
+        for sig in self.probe_signatures(signal.data):
+            found.update(self.buckets.get(sig, ()))
+        length = len(signal.data)
+        return sorted(z for z in found if self.keys[z] is not _REMOVED and
+                      _length_ok(length, len(self.data[z]), self.length_tolerance))
+
+    def query(self, signal: RawSignal) -> List[Tuple[Any, float]]:
+        """
+        returns (key, score) for every indexed signal similar to the given one, best matches first.
+        the score is the fraction of matching pulses of the longer signal.
+        """
+        cand = self.candidates(signal)
+        if not cand:
+            return []
+        if np is not None:
+            scores = self._score_numpy(signal.data, cand)
+        else:
+            scores = [self._score(signal.data, self.data[idx]) for idx in cand]
+        res = [(self.keys[idx], score) for idx, score in zip(cand, scores) if score >= 0]
+        res.sort(key=lambda z: -z[1])
+        return res
+
+    def _score(self, data: array, other: array) -> float:
+        # -1 if any pulse of the common prefix is out of tolerance
+        n = min(len(data), len(other))
+        if similarity(data[:n], other[:n], self.tolerance) < 1.0:
+            return -1
+        return n / max(len(data), len(other), 1)
+
+    def _score_numpy(self, data: array, cand: List[int]) -> list:
+        # compare the query against all candidates at once using a zero-padded matrix
+        q = np.abs(np.frombuffer(data, dtype=np.int32).astype(np.int64))
+        width = max(len(self.data[z]) for z in cand)
+        width = max(width, len(q))
+        mat = np.zeros((len(cand), width), dtype=np.int64)
+        lengths = np.zeros(len(cand), dtype=np.int64)
+        for row, idx in enumerate(cand):
+            other = np.frombuffer(self.data[idx], dtype=np.int32)
+            mat[row, :len(other)] = np.abs(other)
+            lengths[row] = len(other)
+        qq = np.zeros(width, dtype=np.int64)
+        qq[:len(q)] = q
+        common = np.arange(width)[None, :] < np.minimum(lengths, len(q))[:, None]
+        within = np.abs(mat - qq[None, :]) <= self.tolerance * np.maximum(mat, qq[None, :])
+        full = np.all(within | ~common, axis=1)
+        score = np.count_nonzero(within & common, axis=1) / np.maximum(np.maximum(lengths, len(q)), 1)
+        return [float(s) if f else -1 for s, f in zip(score, full)]
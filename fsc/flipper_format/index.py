@@ -0,0 +1,103 @@
+"""
+inverted index from signal digests to the files containing them.
+
+signals are matched by their 128 bit digest only, signals are never compared here.
+use the signals themselves as keys (see BaseSignal.__hash__) where an exact comparison is needed.
+"""
+
+from typing import Dict, Iterable, List
+
+class DigestIndex:
+    """
+    index = DigestIndex()
+    index.add_file("TV.ir", [signal.digest() for signal in signals])
+    index.lookup(signal.digest()) # -> [0]
+    """
+
+    def __init__(self) -> None:
+        self.paths: List[str] = []
+        self.ids: Dict[str, int] = {}
+        self.files: Dict[bytes, List[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    def add_file(self, path: str, digests: Iterable[bytes]) -> int:
+        """
+        adds a file and returns its id (ids are assigned in insertion order)
+        """
+        file_id = len(self.paths)
+        self.paths.append(path)
+        self.ids[path] = file_id
+        for h in set(digests):
+            if h not in self.files:
+                self.files[h] = []
+            self.files[h].append(file_id)
+        return file_id
+
+    def lookup(self, digest: bytes) -> List[int]:
+        return self.files.get(digest, [])
+
+    def count_common(self, digests: List[bytes], similar: Dict[int, Iterable[str]] = None) -> Dict[int, int]:
+        """
+        returns { file id -> number of the given signals found in that file } for every file
+        sharing at least one signal. similar optionally maps the position of a signal to the
+        paths of files which contain a similar (but not identical) signal.
+        """
+        counts = {}
+        for i, h in enumerate(digests):
+            found = self.lookup(h)
+            for file_id in found:
+                counts[file_id] = counts.get(file_id, 0) + 1
+            if similar and i in similar:
+                for path in similar[i]:
+                    file_id = self.ids.get(path)
+                    if file_id is not None and file_id not in found:
+                        counts[file_id] = counts.get(file_id, 0) + 1
+        return counts
+
+class UnionFind:
+    """
+    disjoint sets over the ids 0..n-1 (with path halving and union by size)
+    """
+
+    def __init__(self, n: int) -> None:
+        self.parent = list(range(n))
+        self.size = [1] * n
+
+    def __len__(self) -> int:
+        return len(self.parent)
+
+    def add(self) -> int:
+        """
+        adds a new set and returns its id
+        """
+        self.parent.append(len(self.parent))
+        self.size.append(1)
+        return len(self.parent) - 1
+
+    def find(self, x: int) -> int:
+        parent = self.parent
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    def union(self, a: int, b: int) -> int:
+        a, b = self.find(a), self.find(b)
+        if a == b:
+            return a
+        if self.size[a] < self.size[b]:
+            a, b = b, a
+        self.parent[b] = a
+        self.size[a] += self.size[b]
+        return a
+
+    def groups(self) -> List[List[int]]:
+        """
+        returns all sets with more than one member, ordered by their smallest id
+        """
+        res = {}
+        for x in range(len(self.parent)):
+            res.setdefault(self.find(x), []).append(x)
+        return [z for z in res.values() if len(z) > 1]
@@ -1,21 +1,48 @@
+import struct
+import sys
+
+from array import array
+from hashlib import blake2b
 from typing import List, Union
 
-from fsc.flipper_format.base import EOFException, FlipperFormat, marshal
+from fsc.flipper_format.base import EOFException, FlipperFormat, FlipperFormatWriter, marshal
 
 MAX_DATA_PER_LINE = 50
 
+IR_FILETYPE = "IR signals file"
+IR_VERSION = 1
+
+DIGEST_SIZE = 16
+
 def _to_hex_str(nums: list, sep: str = ' ') -> str:
     return sep.join([hex(z)[2:].zfill(2) for z in nums]).upper()
 
+def _to_bytes(values, what: str) -> bytes:
+    # bytes() only says "bytes must be in range(0, 256)"
+    if isinstance(values, (bytes, bytearray, memoryview)):
+        return bytes(values)
+    values = list(values)
+    for z in values:
+        if not 0 <= z <= 0xFF:
+            raise ValueError(f"{what} value {z} is not a byte")
+    return bytes(values)
+
 class BaseSignal:
+    __slots__ = ("src", "is_raw", "name", "last_comment", "_digest")
+
     def __init__(self, src: str, is_raw: bool, name: str) -> None:
         self.src = src
         self.is_raw = is_raw
         self.name = name
         self.last_comment = None
+        self._digest = None
     
     def set_last_comment(self, comment: str) -> None:
         self.last_comment = comment
+
+    def set_name(self, name: str) -> None:
+        # the name is not part of the digest
+        self.name = name
     
     def get_last_comment(self) -> None:
         return self.last_comment
@@ -26,6 +53,23 @@ class BaseSignal:
     def get_source(self):
         return self.src
 
+    def _pack(self) -> bytes:
+        raise NotImplementedError()
+
+    def digest(self) -> bytes:
+        """
+        stable content digest of the signal (the name is not part of it).
+        unlike hash(), the digest does not change between interpreter runs.
+        """
+        if self._digest is None:
+            self._digest = blake2b(self._pack(), digest_size=DIGEST_SIZE).digest()
+        return self._digest
+
+    def __hash__(self) -> int:
+        # subclasses compare the content in __eq__, so sets and dicts of signals
+        # never merge two different signals even if their digests collide
+        return int.from_bytes(self.digest()[:8], "little")
+
 class RawSignal(BaseSignal):
     """
     name: POWER
@@ -34,13 +78,31 @@ class RawSignal(BaseSignal):
     duty_cycle: 0.330000
     data: 8437 4188 538 1565 539 1565 539 513 544 508 538 513 544 1559 545
     """
+    __slots__ = ("frequency", "duty_cycle", "data")
 
-    def __init__(self, src: str, name: str, frequency: int, duty_cycle: float, data: list) -> None:
+    def __init__(self, src: str, name: str, frequency: int, duty_cycle: float, data: array) -> None:
         super().__init__(src, True, name)
         self.frequency = frequency
         self.duty_cycle = duty_cycle
-        self.data = data
+        # timings are stored as a compact int32 array instead of a list of python ints,
+        # int32 memoryviews (e.g. of a snapshot) are kept as they are
+        self.data = data if isinstance(data, array) or (isinstance(data, memoryview) and data.format == "i") \
+            else array("i", data)
    
+    # the setters invalidate the cached digest
+
+    def set_frequency(self, frequency: int) -> None:
+        self.frequency = frequency
+        self._digest = None
+
+    def set_duty_cycle(self, duty_cycle: float) -> None:
+        self.duty_cycle = duty_cycle
+        self._digest = None
+
+    def set_data(self, data) -> None:
+        self.data = data if isinstance(data, array) else array("i", data)
+        self._digest = None
+
     def to_obj(self):
         return {
             "name": self.name,
@@ -54,8 +116,19 @@ class RawSignal(BaseSignal):
         r = marshal(self.to_obj())
         return r
 
-    def __hash__(self) -> int:
-        return hash(f"{self.frequency}@{self.duty_cycle}::{'-'.join([str(u) for u in self.data])}".replace(" ", "#").lower())
+    def _pack(self) -> bytes:
+        data = self.data
+        if sys.byteorder != "little":
+            data = array("i", data)
+            data.byteswap()
+        return b"R" + struct.pack("<qd", self.frequency, self.duty_cycle) + data.tobytes()
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, RawSignal):
+            return NotImplemented
+        return self.frequency == other.frequency and self.duty_cycle == other.duty_cycle and self.data == other.data
+
+    __hash__ = BaseSignal.__hash__
     
 class ParsedSignal(BaseSignal):
     """
@@ -65,12 +138,27 @@ class ParsedSignal(BaseSignal):
     address: 00 00 00 00
     command: 15 00 00 00
     """
+    __slots__ = ("protocol", "address", "command")
 
-    def __init__(self, src: str, name: str, protocol: str, address: List[int], command: List[int]) -> None:
+    def __init__(self, src: str, name: str, protocol: str, address: bytes, command: bytes) -> None:
         super().__init__(src, False, name)
         self.protocol = protocol
-        self.address = address
-        self.command = command
+        self.address = _to_bytes(address, "address")
+        self.command = _to_bytes(command, "command")
+
+    # the setters invalidate the cached digest
+
+    def set_protocol(self, protocol: str) -> None:
+        self.protocol = protocol
+        self._digest = None
+
+    def set_address(self, address: bytes) -> None:
+        self.address = _to_bytes(address, "address")
+        self._digest = None
+
+    def set_command(self, command: bytes) -> None:
+        self.command = _to_bytes(command, "command")
+        self._digest = None
 
     def to_obj(self):
         return {
@@ -84,39 +172,48 @@ class ParsedSignal(BaseSignal):
     def __str__(self) -> str:
         return marshal(self.to_obj())
 
-    def __hash__(self) -> int:
-        return hash(f"{_to_hex_str(self.command)}@{_to_hex_str(self.address)}::{self.protocol}".replace(" ", "#").lower())
+    def _pack(self) -> bytes:
+        protocol = self.protocol.lower().encode("UTF-8")
+        return b"P" + struct.pack("<BBB", len(protocol), len(self.address), len(self.command)) \
+            + protocol + self.address + self.command
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, ParsedSignal):
+            return NotImplemented
+        return self.protocol.lower() == other.protocol.lower() and self.address == other.address and self.command == other.command
+
+    __hash__ = BaseSignal.__hash__
 
 def _parse_raw(fff: FlipperFormat, name: str) -> RawSignal:
     freq = fff.read_int("frequency")
     dc = fff.read_float("duty_cycle")
-    data = []
+    data = array("i")
 
-    while True:
-        pos = fff.fd.tell()
-        try:
-            k, v = fff.read_next_pair()
-            if k != "data":
-                fff.fd.seek(pos)
-                break
-            data.extend([int(z) for z in v.split()])
-        except EOFException:
-            break
+    # data may be split across multiple subsequent lines
+    while fff.peek_key() == "data":
+        _, v = fff.read_next_pair()
+        data.extend(map(int, v.split()))
 
     return RawSignal(fff.get_file_name(), name, frequency=freq, duty_cycle=dc, data=data)
 
 def _parse_parsed(fff: FlipperFormat, name: str) -> ParsedSignal:
     protocol = fff.read_str("protocol")
-    address = fff.read_hex_multi("address")
-    command = fff.read_hex_multi("command")
+    address = fff.read_bytes("address")
+    command = fff.read_bytes("command")
     return ParsedSignal(fff.get_file_name(), name, protocol=protocol, address=address, command=command)
 
-def read_ir(fff: FlipperFormat) -> List[Union[RawSignal, ParsedSignal]]:
+def read_ir(fff: FlipperFormat, decode_raw: bool = False) -> List[Union[RawSignal, ParsedSignal]]:
+    """
+    if decode_raw is set, raw signals of known protocols are returned as ParsedSignal
+    """
+    if decode_raw:
+        from fsc.flipper_format.decoder import decode_signal
     while True:
         try:
             name = fff.read_str("name")
         except EOFException:
             break
+        comment = fff.get_last_comment()
 
         typ = fff.read_str("type")
         if typ == "raw":
@@ -125,9 +222,39 @@ def read_ir(fff: FlipperFormat) -> List[Union[RawSignal, ParsedSignal]]:
             r = _parse_parsed(fff, name)
         else:
             raise Exception(f"unknown signal type '{typ}'")
-        r.set_last_comment(fff.get_last_comment())
+        r.set_last_comment(comment)
+        if decode_raw and r.is_raw:
+            r = decode_signal(r)
         yield r
 
+def signal_from_obj(obj: dict, src: str = "") -> Union[RawSignal, ParsedSignal]:
+    """
+    inverse of to_obj()
+    """
+    if obj["type"] == "raw":
+        r = RawSignal(src, obj["name"], frequency=int(obj["frequency"]), duty_cycle=float(obj["duty_cycle"]),
+                      data=array("i", map(int, obj["data"].split())))
+    elif obj["type"] == "parsed":
+        r = ParsedSignal(src, obj["name"], protocol=obj["protocol"],
+                         address=bytes.fromhex(obj["address"]), command=bytes.fromhex(obj["command"]))
+    else:
+        raise Exception(f"unknown signal type '{obj['type']}'")
+    return r
+
+def write_signal(ffw: FlipperFormatWriter, signal: Union[RawSignal, ParsedSignal], data_per_line: int = 0) -> None:
+    """
+    writes the signal like str(signal) does. with data_per_line (e.g. MAX_DATA_PER_LINE)
+    long raw signals are wrapped into multiple data: lines.
+    """
+    if not signal.is_raw:
+        ffw.write_dict(signal.to_obj())
+        return
+    ffw.write_pair("name", signal.name)
+    ffw.write_pair("type", "raw")
+    ffw.write_pair("frequency", signal.frequency)
+    ffw.write_pair("duty_cycle", signal.duty_cycle)
+    ffw.write_values("data", signal.data, per_line=data_per_line)
+
 if __name__ == "__main__":
     print("reading")
     fff = FlipperFormat("audio.ir")
@@ -135,7 +262,7 @@ if __name__ == "__main__":
     hashes = {}
     for resp in read_ir(fff):
         print(resp)
-        h = hash(resp)
+        h = resp.digest()
         if not h in hashes: hashes[h] = [resp] 
         else: 
             hashes[h].append(resp)
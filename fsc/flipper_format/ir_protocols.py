@@ -0,0 +1,163 @@
+"""
+timing templates of the infrared protocols supported by the flipper.
+
+address and command are stored the same way the flipper stores them in .ir files:
+as little endian 32 bit integers (e.g. NEC address 0x04 -> "04 00 00 00").
+"""
+
+from typing import Callable, Dict, NamedTuple, Tuple, Union
+
+class PulseDistance(NamedTuple):
+    """
+    frames which encode every bit as a mark followed by a space (LSB first).
+    NEC, Samsung32, SIRC and Kaseikyo use this encoding.
+    """
+    frequency: int
+    duty_cycle: float
+    header_mark: int
+    header_space: int
+    one_mark: int
+    one_space: int
+    zero_mark: int
+    zero_space: int
+    stop_mark: int # 0 if the protocol has no stop bit
+    bits: int
+    repeat: Tuple[int, ...] # repeat frame (if the protocol sends a special one)
+    repeat_period: int # time from the start of one frame to the start of the next frame
+
+class Manchester(NamedTuple):
+    """
+    bi-phase encoded frames (MSB first), RC5 and RC6 use this encoding.
+    """
+    frequency: int
+    duty_cycle: float
+    header_mark: int # 0 if the protocol has no leader
+    header_space: int
+    unit: int # duration of half a bit
+    bits: int
+    repeat_period: int
+
+class Protocol(NamedTuple):
+    name: str
+    timing: Union[PulseDistance, Manchester]
+    # bits -> (address, command), or None if the bits are not valid for this protocol
+    unpack: Callable[[int], Union[Tuple[int, int], None]]
+    # (address, command) -> bits
+    pack: Callable[[int, int], int]
+
+def _byte(value: int, n: int) -> int:
+    return (value >> (n * 8)) & 0xff
+
+# ------------------------------------------------------------
+
+def _unpack_nec(v: int):
+    a, ai, c, ci = _byte(v, 0), _byte(v, 1), _byte(v, 2), _byte(v, 3)
+    if ai != a ^ 0xff or ci != c ^ 0xff:
+        return None
+    return a, c
+
+def _pack_nec(a: int, c: int) -> int:
+    a, c = a & 0xff, c & 0xff
+    return a | (a ^ 0xff) << 8 | c << 16 | (c ^ 0xff) << 24
+
+def _unpack_necext(v: int):
+    return v & 0xffff, (v >> 16) & 0xffff
+
+def _pack_necext(a: int, c: int) -> int:
+    return (a & 0xffff) | (c & 0xffff) << 16
+
+def _unpack_samsung32(v: int):
+    a, a2, c, ci = _byte(v, 0), _byte(v, 1), _byte(v, 2), _byte(v, 3)
+    if a != a2 or ci != c ^ 0xff:
+        return None
+    return a, c
+
+def _pack_samsung32(a: int, c: int) -> int:
+    a, c = a & 0xff, c & 0xff
+    return a | a << 8 | c << 16 | (c ^ 0xff) << 24
+
+def _unpack_sirc(address_bits: int):
+    def unpack(v: int):
+        return (v >> 7) & ((1 << address_bits) - 1), v & 0x7f
+    return unpack
+
+def _pack_sirc(address_bits: int):
+    def pack(a: int, c: int) -> int:
+        return (c & 0x7f) | (a & ((1 << address_bits) - 1)) << 7
+    return pack
+
+def _kaseikyo_parity(data: list) -> Tuple[int, int]:
+    vendor_parity = data[0] ^ data[1]
+    return (vendor_parity & 0xf) ^ (vendor_parity >> 4), data[2] ^ data[3] ^ data[4]
+
+def _unpack_kaseikyo(v: int):
+    data = [_byte(v, i) for i in range(6)]
+    vendor_id = data[1] << 8 | data[0]
+    genre1, genre2 = data[2] >> 4, data[3] & 0xf
+    command = data[3] >> 4 | (data[4] & 0x3f) << 4
+    id = data[4] >> 6
+    if (data[2] & 0xf, data[5]) != _kaseikyo_parity(data):
+        return None
+    return id << 24 | vendor_id << 8 | genre1 << 4 | genre2, command
+
+def _pack_kaseikyo(a: int, c: int) -> int:
+    vendor_id, id = (a >> 8) & 0xffff, (a >> 24) & 0x3
+    genre1, genre2 = (a >> 4) & 0xf, a & 0xf
+    data = [vendor_id & 0xff, vendor_id >> 8, genre1 << 4, (c & 0xf) << 4 | genre2, id << 6 | (c >> 4) & 0x3f, 0]
+    data[2] |= _kaseikyo_parity(data)[0]
+    data[5] = _kaseikyo_parity(data)[1]
+    return sum(b << (i * 8) for i, b in enumerate(data))
+
+# RC5 frames are 14 bits: start bit, field bit, toggle bit, 5 address bits, 6 command bits.
+# RC5X uses the (inverted) field bit as the 7th command bit.
+def _unpack_rc5(v: int):
+    if not v >> 13 & 1 or not v >> 12 & 1:
+        return None
+    return (v >> 6) & 0x1f, v & 0x3f
+
+def _pack_rc5(a: int, c: int) -> int:
+    return 1 << 13 | 1 << 12 | (a & 0x1f) << 6 | c & 0x3f
+
+def _unpack_rc5x(v: int):
+    if not v >> 13 & 1 or v >> 12 & 1:
+        return None
+    return (v >> 6) & 0x1f, 0x40 | v & 0x3f
+
+def _pack_rc5x(a: int, c: int) -> int:
+    return 1 << 13 | (a & 0x1f) << 6 | c & 0x3f
+
+# RC6 (mode 0) frames are 16 bits after the start, mode and toggle bits
+def _unpack_rc6(v: int):
+    return (v >> 8) & 0xff, v & 0xff
+
+def _pack_rc6(a: int, c: int) -> int:
+    return (a & 0xff) << 8 | c & 0xff
+
+# ------------------------------------------------------------
+
+_NEC = PulseDistance(38000, 0.33, 9000, 4500, 560, 1690, 560, 560, 560, 32, (9000, 2250, 560), 108000)
+_SAMSUNG = PulseDistance(38000, 0.33, 4500, 4500, 550, 1650, 550, 550, 550, 32, (), 108000)
+_SIRC = lambda bits: PulseDistance(40000, 0.33, 2400, 600, 1200, 600, 600, 600, 0, bits, (), 45000)
+_KASEIKYO = PulseDistance(37000, 0.33, 3456, 1728, 432, 1296, 432, 432, 432, 48, (), 130000)
+_RC5 = Manchester(36000, 0.27, 0, 0, 889, 14, 114000)
+_RC6 = Manchester(36000, 0.33, 2666, 889, 444, 16, 107000)
+
+# the order matters when decoding, the first protocol which accepts the bits wins
+PROTOCOLS: Dict[str, Protocol] = {z.name: z for z in [
+    Protocol("NEC", _NEC, _unpack_nec, _pack_nec),
+    Protocol("NECext", _NEC, _unpack_necext, _pack_necext),
+    Protocol("Samsung32", _SAMSUNG, _unpack_samsung32, _pack_samsung32),
+    Protocol("SIRC", _SIRC(12), _unpack_sirc(5), _pack_sirc(5)),
+    Protocol("SIRC15", _SIRC(15), _unpack_sirc(8), _pack_sirc(8)),
+    Protocol("SIRC20", _SIRC(20), _unpack_sirc(13), _pack_sirc(13)),
+    Protocol("Kaseikyo", _KASEIKYO, _unpack_kaseikyo, _pack_kaseikyo),
+    Protocol("RC5", _RC5, _unpack_rc5, _pack_rc5),
+    Protocol("RC5X", _RC5, _unpack_rc5x, _pack_rc5x),
+    Protocol("RC6", _RC6, _unpack_rc6, _pack_rc6),
+]}
+
+# every protocol name the flipper firmware accepts in .ir files (infrared.h), including the ones without a template above
+FIRMWARE_PROTOCOLS = (
+    "NEC", "NECext", "NEC42", "NEC42ext", "Samsung32", "RC6", "RC5", "RC5X",
+    "SIRC", "SIRC15", "SIRC20", "Kaseikyo", "RCA", "Pioneer",
+)
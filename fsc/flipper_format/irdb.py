@@ -0,0 +1,177 @@
+"""
+the signal database of the finder scripts.
+
+every file of the database is kept as the digests and names of its signals, a DigestIndex maps the digests
+back to the files. the database is read from a compiled snapshot if there is one, otherwise the files are
+parsed in parallel (through the parse cache). unless the signals are needed (decode_raw or a fuzzy index),
+the files are only read with the LazyIRReader, which hashes raw data without building the timings:
+
+    db = IRDB("Flipper-IRDB/**/*.ir").load()
+    for file_id in db.index.lookup(signal.digest()):
+        print(db[file_id].path, db[file_id].hashes[signal.digest()])
+
+serve() keeps the database loaded for the --client mode of the scripts and only parses changed files again.
+"""
+
+import os
+
+from glob import glob
+
+from typing import Callable, Iterator, List, Tuple, Union
+
+from fsc.flipper_format.base import FlipperFormat
+from fsc.flipper_format.bulk import iter_all_ir, iter_ir_file_digests, iter_ir_files
+from fsc.flipper_format.daemon import DEFAULT_ADDRESS, TreeState, serve as serve_requests
+from fsc.flipper_format.decoder import decode_all
+from fsc.flipper_format.encoder import encode_signal
+from fsc.flipper_format.fuzzy import FuzzyIndex
+from fsc.flipper_format.index import DigestIndex
+from fsc.flipper_format.infrared import ParsedSignal, RawSignal, read_ir
+from fsc.flipper_format.snapshot import iter_snapshot
+
+class IRDBFile:
+    def __init__(self, path) -> None:
+        self.path = path
+        # digest -> names of the signals with that content
+        self.hashes = {}
+        self.count = 0
+
+    def add_signals(self, signals, fuzzy_index: FuzzyIndex = None):
+        for signal in signals:
+            self.count += 1
+            h = signal.digest()
+            if fuzzy_index is not None:
+                # parsed signals are indexed by their waveform, so raw captures can match them
+                raw = signal if signal.is_raw else encode_signal(signal)
+                if raw is not None:
+                    fuzzy_index.add((self.path, h), raw)
+            if h not in self.hashes:
+                self.hashes[h] = []
+            self.hashes[h].append(signal.name)
+
+    def add_digests(self, digests: List[Tuple[bytes, str]]):
+        for h, name in digests:
+            self.count += 1
+            if h not in self.hashes:
+                self.hashes[h] = []
+            self.hashes[h].append(name)
+
+class IRDB:
+    """
+    the files of the database, ordered by path. the file ids of the index are the positions in files.
+    """
+
+    def __init__(self, pattern: str, workers: int = 0, decode_raw: bool = False, snapshot_file: str = None,
+                 use_cache: bool = True, fuzzy_index: FuzzyIndex = None, verbose: bool = False) -> None:
+        """
+        decode_raw stores raw signals of known protocols as parsed signals (the input files are decoded
+        the same way by read_file). a snapshot is only used if the file exists.
+        """
+        self.pattern = pattern
+        self.workers = workers
+        self.decode_raw = decode_raw
+        self.snapshot_file = snapshot_file
+        self.use_cache = use_cache
+        self.fuzzy_index = fuzzy_index
+        self.verbose = verbose
+        self.files: List[IRDBFile] = []
+        self.index = DigestIndex()
+
+    def __len__(self) -> int:
+        return len(self.files)
+
+    def __getitem__(self, file_id: int) -> IRDBFile:
+        return self.files[file_id]
+
+    def __iter__(self) -> Iterator[IRDBFile]:
+        return iter(self.files)
+
+    # ------------------------------------------------------------
+
+    def iter_files(self) -> Iterator[Tuple[str, List[Union[RawSignal, ParsedSignal]]]]:
+        """
+        yields (path, signals) of every file of the database without keeping them (see bulk.iter_all_ir)
+        """
+        # a compiled snapshot loads much faster than parsing every .ir file
+        if self.snapshot_file is not None and os.path.exists(self.snapshot_file):
+            files = iter_snapshot(self.snapshot_file)
+            if self.decode_raw:
+                files = ((path, decode_all(signals)) for path, signals in files)
+            return files
+        return iter_all_ir(self.pattern, workers=self.workers, decode_raw=self.decode_raw, use_cache=self.use_cache)
+
+    def _uses_signals(self) -> bool:
+        # the lazy reader only yields digests of the stored content, nothing to decode or to index fuzzily
+        return self.decode_raw or self.fuzzy_index is not None or \
+            (self.snapshot_file is not None and os.path.exists(self.snapshot_file))
+
+    def _read_files(self, files: List[str] = None) -> Iterator[IRDBFile]:
+        if self._uses_signals():
+            if files is None:
+                parsed = self.iter_files()
+            else:
+                parsed = iter_ir_files(files, workers=self.workers, decode_raw=self.decode_raw, use_cache=self.use_cache)
+            for path, signals in parsed:
+                irdb = IRDBFile(path)
+                irdb.add_signals(signals, self.fuzzy_index)
+                yield irdb
+        else:
+            if files is None:
+                files = sorted(glob(self.pattern, recursive=True))
+            for path, digests in iter_ir_file_digests(files, workers=self.workers, use_cache=self.use_cache):
+                irdb = IRDBFile(path)
+                irdb.add_digests(digests)
+                yield irdb
+
+    def _build_index(self) -> None:
+        self.index = DigestIndex()
+        for data in self.files:
+            self.index.add_file(data.path, data.hashes.keys())
+
+    def load(self) -> "IRDB":
+        self.files = []
+        if self.fuzzy_index is not None:
+            self.fuzzy_index.remove(lambda key: True)
+        for irdb in self._read_files(None):
+            if self.verbose: print("[DB] Loading", irdb.path)
+            self.files.append(irdb)
+        self._build_index()
+        return self
+
+    def update(self, changed: List[str], removed: List[str]) -> None:
+        """
+        only the changed files are parsed again
+        """
+        drop = set(changed) | set(removed)
+        if self.fuzzy_index is not None:
+            self.fuzzy_index.remove(lambda key: key[0] in drop)
+        files = [z for z in self.files if z.path not in drop]
+        files.extend(self._read_files(changed))
+        files.sort(key=lambda z: z.path)
+        self.files = files
+        self._build_index()
+
+    def read_file(self, path: str) -> List[Union[RawSignal, ParsedSignal]]:
+        """
+        parses an input file like the files of the database
+        """
+        with FlipperFormat(path) as fff:
+            signals = list(read_ir(fff))
+        return decode_all(signals) if self.decode_raw else signals
+
+def serve(db: IRDB, handle: Callable[[dict], dict], address: Tuple[str, int] = DEFAULT_ADDRESS) -> None:
+    """
+    loads the database and answers the requests of the --client mode (see daemon.serve).
+    files of the database which changed since the last request are parsed again before it is handled.
+    """
+    state = TreeState(db.pattern)
+    state.scan(force=True)
+    db.load()
+
+    def handle_request(req: dict) -> dict:
+        changed, removed = state.scan()
+        if changed or removed:
+            db.update(changed, removed)
+        return handle(req)
+
+    serve_requests(handle_request, address)
@@ -0,0 +1,250 @@
+"""
+memory-mapped .ir reader which only indexes the signal blocks of a file.
+the fields of a signal (most importantly the long raw data: arrays) are decoded on first access.
+the digest of a raw signal is computed line by line from the text, its timings are never stored.
+"""
+
+import mmap
+import re
+import struct
+
+from array import array
+from hashlib import blake2b
+
+from typing import Iterator, List, NamedTuple, Union
+
+from fsc.flipper_format.base import Pair, ParseError, parse_hex_bytes, tokenize
+from fsc.flipper_format.infrared import DIGEST_SIZE, BaseSignal, ParsedSignal, RawSignal
+
+# matches either a name: / type: pair or a comment at the start of a line
+_INDEX_RE = re.compile(rb"^(?:(name|type)[ \t]*:[ \t]*([^\r\n]*)|#([^\r\n]*))", re.M)
+
+class SignalIndex(NamedTuple):
+    name: str
+    type: str
+    start: int # byte offset of the name: line
+    end: int # byte offset of the next name: line (or end of file)
+    comment: str
+    line_no: int # line of the name: line
+
+class LazyRawSignal(RawSignal):
+    __slots__ = ("_block", "_pairs", "_frequency", "_duty_cycle", "_data")
+
+    def __init__(self, src: str, name: str, block: bytes) -> None:
+        BaseSignal.__init__(self, src, True, name)
+        self._block = block
+        self._pairs = None
+        self._frequency = None
+        self._duty_cycle = None
+        self._data = None
+
+    def _get_pairs(self) -> list:
+        if self._pairs is None:
+            self._pairs = tokenize(self._block.decode("UTF-8"))
+        return self._pairs
+
+    def _read_str(self, key: str) -> str:
+        for pair in self._get_pairs():
+            if pair.key == key:
+                return pair.value
+        raise KeyError(f"{key} missing in signal '{self.name}' ({self.src})")
+
+    @property
+    def frequency(self) -> int:
+        if self._frequency is None:
+            self._frequency = int(self._read_str("frequency"))
+        return self._frequency
+
+    @frequency.setter
+    def frequency(self, value: int) -> None:
+        self._frequency = value
+
+    @property
+    def duty_cycle(self) -> float:
+        if self._duty_cycle is None:
+            self._duty_cycle = float(self._read_str("duty_cycle"))
+        return self._duty_cycle
+
+    @duty_cycle.setter
+    def duty_cycle(self, value: float) -> None:
+        self._duty_cycle = value
+
+    @property
+    def data(self) -> array:
+        if self._data is None:
+            data = array("i")
+            for pair in self._get_pairs():
+                if pair.key == "data":
+                    data.extend(map(int, pair.value.split()))
+            # every field is decoded now, the text of the block is not needed anymore
+            self._frequency = self.frequency
+            self._duty_cycle = self.duty_cycle
+            self._data = data
+            self._block = None
+            self._pairs = None
+        return self._data
+
+    def digest(self) -> bytes:
+        if self._digest is None and self._data is None:
+            # same bytes as RawSignal._pack, but packed one data: line at a time
+            h = blake2b(b"R" + struct.pack("<qd", self.frequency, self.duty_cycle), digest_size=DIGEST_SIZE)
+            for pair in self._get_pairs():
+                if pair.key == "data":
+                    values = pair.value.split()
+                    h.update(struct.pack(f"<{len(values)}i", *map(int, values)))
+            self._digest = h.digest()
+        return super().digest()
+
+    @data.setter
+    def data(self, value: array) -> None:
+        # the other fields have to be decoded before the block is dropped
+        self._frequency = self.frequency
+        self._duty_cycle = self.duty_cycle
+        self._data = value
+        self._block = None
+        self._pairs = None
+
+class LazyParsedSignal(ParsedSignal):
+    __slots__ = ("_block", "_line_no", "_fields", "_address", "_command")
+
+    def __init__(self, src: str, name: str, block: bytes, line_no: int = 1) -> None:
+        BaseSignal.__init__(self, src, False, name)
+        self._block = block
+        self._line_no = line_no
+        self._fields = None
+        self._address = None
+        self._command = None
+
+    def _read_pair(self, key: str) -> Pair:
+        if self._fields is None:
+            # the first occurrence of a key wins, just like FlipperFormat.read_str
+            self._fields = {}
+            for pair in tokenize(self._block.decode("UTF-8")):
+                self._fields.setdefault(pair.key, pair)
+        if key not in self._fields:
+            raise KeyError(f"{key} missing in signal '{self.name}' ({self.src})")
+        return self._fields[key]
+
+    def _read_str(self, key: str) -> str:
+        return self._read_pair(key).value
+
+    def _read_bytes(self, key: str) -> bytes:
+        pair = self._read_pair(key)
+        try:
+            return parse_hex_bytes(pair.value)
+        except ValueError:
+            # the lines of the pairs are counted from the start of the block
+            raise ParseError(self.src, self._line_no + pair.line_no - 1, f"{key} '{pair.value}' is not a list of hex bytes")
+
+    @property
+    def protocol(self) -> str:
+        return self._read_str("protocol")
+
+    @protocol.setter
+    def protocol(self, value: str) -> None:
+        self._fields["protocol"] = self._read_pair("protocol")._replace(value=value)
+
+    @property
+    def address(self) -> bytes:
+        if self._address is None:
+            self._address = self._read_bytes("address")
+        return self._address
+
+    @address.setter
+    def address(self, value: bytes) -> None:
+        self._address = value
+
+    @property
+    def command(self) -> bytes:
+        if self._command is None:
+            self._command = self._read_bytes("command")
+        return self._command
+
+    @command.setter
+    def command(self, value: bytes) -> None:
+        self._command = value
+
+class LazyIRReader:
+    """
+    with LazyIRReader("TV.ir") as reader:
+        for signal in reader:
+            print(signal.name, signal.digest().hex())
+    """
+
+    def __init__(self, file_name: str) -> None:
+        self.file_name = file_name
+        self.fd = open(self.file_name, "rb")
+        try:
+            self.mm = mmap.mmap(self.fd.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # empty files cannot be mapped
+            self.mm = b""
+        self.index = self._build_index()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        if isinstance(self.mm, mmap.mmap):
+            self.mm.close()
+        self.fd.close()
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __iter__(self) -> Iterator[Union[LazyRawSignal, LazyParsedSignal]]:
+        for i in range(len(self.index)):
+            yield self.get(i)
+
+    # ------------------------------------------------------------
+
+    def _build_index(self) -> List[SignalIndex]:
+        entries = []
+        comment = ""
+        current = None # [name, type, start, comment, line_no]
+        line_no, pos = 1, 0
+        for match in _INDEX_RE.finditer(self.mm):
+            key, value, comment_value = match.groups()
+            if comment_value is not None:
+                comment = comment_value.decode("UTF-8").strip()
+            elif key == b"name":
+                if current is not None:
+                    entries.append(SignalIndex(current[0], current[1], current[2], match.start(), current[3], current[4]))
+                # only needed for the error messages of the decoded fields
+                line_no += self.mm[pos:match.start()].count(b"\n")
+                pos = match.start()
+                current = [value.decode("UTF-8").strip(), None, match.start(), comment, line_no]
+            elif current is not None and current[1] is None:
+                current[1] = value.decode("UTF-8").strip()
+        if current is not None:
+            entries.append(SignalIndex(current[0], current[1], current[2], len(self.mm), current[3], current[4]))
+        return entries
+
+    def get_file_name(self) -> str:
+        return self.file_name
+
+    def get_names(self) -> List[str]:
+        return [z.name for z in self.index]
+
+    def get(self, i: int) -> Union[LazyRawSignal, LazyParsedSignal]:
+        """
+        returns the signal at position i. the block is copied out of the mapping,
+        so the signal stays usable after the reader was closed.
+        """
+        entry = self.index[i]
+        block = self.mm[entry.start:entry.end]
+        if entry.type == "raw":
+            r = LazyRawSignal(self.file_name, entry.name, block)
+        elif entry.type == "parsed":
+            r = LazyParsedSignal(self.file_name, entry.name, block, entry.line_no)
+        else:
+            raise Exception(f"unknown signal type '{entry.type}'")
+        r.set_last_comment(entry.comment)
+        return r
+
+def read_ir_lazy(file_name: str) -> List[Union[LazyRawSignal, LazyParsedSignal]]:
+    with LazyIRReader(file_name) as reader:
+        return [z for z in reader]
@@ -0,0 +1,281 @@
+"""
+lint for .ir files.
+
+the file is tokenized once by FlipperFormat, the lines which are not pairs are reported through its
+invalid callback. every signal is checked for its structure, the order of its keys, the ranges of its
+values and against the other signals of the file:
+
+    result = check_file("Flipper-IRDB/TVs/Samsung/Samsung_TV.ir")
+    for d in result.diagnostics:
+        print(format_diagnostic(result.path, d))
+    # Flipper-IRDB/TVs/Samsung/Samsung_TV.ir:42: error: frequency 60000 is out of range [frequency-range]
+
+with with_signals=True the result also holds the parsed signals, so a file does not have to be parsed again.
+lint_files checks many files in forked workers.
+"""
+
+import json
+
+from array import array
+from typing import Iterable, Iterator, List, NamedTuple, Union
+
+from fsc.flipper_format.base import FlipperFormat, Pair, parse_hex_bytes
+from fsc.flipper_format.infrared import IR_FILETYPE, IR_VERSION, ParsedSignal, RawSignal
+from fsc.flipper_format.ir_protocols import FIRMWARE_PROTOCOLS
+from fsc.flipper_format.parallel import fork_imap
+
+# limits of the flipper firmware (infrared_signal.c)
+FREQUENCY_MIN = 10_000
+FREQUENCY_MAX = 56_000
+MAX_TIMINGS = 1024
+ADDRESS_SIZE = 4
+COMMAND_SIZE = 4
+
+RAW_KEYS = ("name", "type", "frequency", "duty_cycle", "data")
+PARSED_KEYS = ("name", "type", "protocol", "address", "command")
+
+ERROR = "error"
+WARNING = "warning"
+
+# errors after which the signals of a file can't be read completely (or not at all),
+# the other errors are values out of range which can still be parsed and written
+STRUCTURAL = {
+    "read", "header", "structure", "unknown-type", "unknown-key", "duplicate-key", "missing-key",
+    "invalid-number", "empty-data",
+}
+
+class Diagnostic(NamedTuple):
+    line: int
+    level: str # ERROR or WARNING
+    code: str
+    message: str
+
+class Result(NamedTuple):
+    path: str
+    diagnostics: List[Diagnostic]
+    signals: list # only set with with_signals
+
+    @property
+    def errors(self) -> List[Diagnostic]:
+        return [z for z in self.diagnostics if z.level == ERROR]
+
+    @property
+    def structural_errors(self) -> List[Diagnostic]:
+        return [z for z in self.errors if z.code in STRUCTURAL]
+
+    @property
+    def warnings(self) -> List[Diagnostic]:
+        return [z for z in self.diagnostics if z.level == WARNING]
+
+class _Checker:
+    def __init__(self, file_name: str) -> None:
+        self.file_name = file_name
+        self.diagnostics: List[Diagnostic] = []
+        self.signals: List[Union[RawSignal, ParsedSignal]] = []
+        # signal -> line of the first signal with the same content
+        self.seen = {}
+
+    def report(self, line: int, level: str, code: str, message: str) -> None:
+        self.diagnostics.append(Diagnostic(line, level, code, message))
+
+    # ------------------------------------------------------------
+
+    def check_header(self, pairs: List[Pair]) -> None:
+        if len(pairs) < 1 or pairs[0].key != "Filetype":
+            self.report(pairs[0].line_no if pairs else 1, ERROR, "header", "file does not start with 'Filetype'")
+        elif pairs[0].value != IR_FILETYPE:
+            self.report(pairs[0].line_no, ERROR, "header", f"unexpected filetype '{pairs[0].value}'")
+        if len(pairs) < 2 or pairs[1].key != "Version":
+            self.report(pairs[1].line_no if len(pairs) > 1 else 1, ERROR, "header", "'Version' is missing")
+        elif pairs[1].value != str(IR_VERSION):
+            self.report(pairs[1].line_no, ERROR, "header", f"unsupported version '{pairs[1].value}'")
+        for pair in pairs[2:]:
+            self.report(pair.line_no, ERROR, "structure", f"'{pair.key}' outside of a signal")
+
+    def check_keys(self, block: List[Pair], expected: tuple) -> bool:
+        """
+        checks that every key appears once (data may span multiple subsequent lines) and in order
+        """
+        ok = True
+        keys = []
+        for i, pair in enumerate(block):
+            if pair.key not in expected:
+                self.report(pair.line_no, ERROR, "unknown-key", f"unknown key '{pair.key}'")
+                ok = False
+            elif pair.key in keys and not (pair.key == "data" and block[i-1].key == "data"):
+                self.report(pair.line_no, ERROR, "duplicate-key", f"'{pair.key}' appears more than once")
+                ok = False
+            elif pair.key not in keys:
+                keys.append(pair.key)
+        missing = [z for z in expected if z not in keys]
+        for key in missing:
+            self.report(block[0].line_no, ERROR, "missing-key", f"signal '{block[0].value}' has no '{key}'")
+        if not missing:
+            order = [z for z in expected if z in keys]
+            for pair in block:
+                if order and pair.key == order[0]:
+                    order.pop(0)
+                elif pair.key in order:
+                    # the values can still be checked
+                    self.report(pair.line_no, ERROR, "key-order", f"'{pair.key}' should come after '{order[0]}'")
+                    break
+        return ok and not missing
+
+    def check_raw(self, block: List[Pair], values: dict) -> Union[RawSignal, None]:
+        ok = True
+        try:
+            frequency = int(values["frequency"].value)
+            if not FREQUENCY_MIN <= frequency <= FREQUENCY_MAX:
+                self.report(values["frequency"].line_no, ERROR, "frequency-range",
+                            f"frequency {frequency} is out of range")
+        except ValueError:
+            self.report(values["frequency"].line_no, ERROR, "invalid-number",
+                        f"frequency '{values['frequency'].value}' is not an integer")
+            ok = False
+        try:
+            duty_cycle = float(values["duty_cycle"].value)
+            if not 0 < duty_cycle <= 1:
+                self.report(values["duty_cycle"].line_no, ERROR, "duty-cycle-range",
+                            f"duty cycle {duty_cycle} is out of range")
+        except ValueError:
+            self.report(values["duty_cycle"].line_no, ERROR, "invalid-number",
+                        f"duty cycle '{values['duty_cycle'].value}' is not a number")
+            ok = False
+
+        data = array("i")
+        data_ok = True
+        for pair in block:
+            if pair.key != "data":
+                continue
+            try:
+                timings = array("i", map(int, pair.value.split()))
+            except (ValueError, OverflowError):
+                self.report(pair.line_no, ERROR, "invalid-number", "data contains a value which is not a timing")
+                data_ok = False
+                continue
+            if timings and min(timings) <= 0:
+                self.report(pair.line_no, ERROR, "timing-range", "data contains negative or zero timings")
+            data.extend(timings)
+
+        line = values["data"].line_no
+        if data_ok and not data:
+            self.report(line, ERROR, "empty-data", "raw signal has no timings")
+            data_ok = False
+        elif data_ok and len(data) > MAX_TIMINGS:
+            self.report(line, ERROR, "data-length", f"raw signal has {len(data)} timings (at most {MAX_TIMINGS})")
+        elif data_ok and len(data) % 2 == 0:
+            # timings alternate between mark and space, a complete signal starts and ends with a mark
+            self.report(line, WARNING, "data-length", f"raw signal has an even number of timings ({len(data)})")
+        if not ok or not data_ok:
+            return None
+        return RawSignal(self.file_name, block[0].value, frequency=frequency, duty_cycle=duty_cycle, data=data)
+
+    def check_bytes(self, pair: Pair, size: int) -> Union[bytes, None]:
+        try:
+            value = parse_hex_bytes(pair.value)
+        except ValueError:
+            self.report(pair.line_no, ERROR, "invalid-number", f"{pair.key} '{pair.value}' is not a list of hex bytes")
+            return None
+        if len(value) != size:
+            self.report(pair.line_no, ERROR, f"{pair.key}-length", f"{pair.key} has {len(value)} bytes (expected {size})")
+        return value
+
+    def check_parsed(self, block: List[Pair], values: dict) -> Union[ParsedSignal, None]:
+        protocol = values["protocol"].value
+        if protocol not in FIRMWARE_PROTOCOLS:
+            self.report(values["protocol"].line_no, WARNING, "unknown-protocol", f"unknown protocol '{protocol}'")
+        address = self.check_bytes(values["address"], ADDRESS_SIZE)
+        command = self.check_bytes(values["command"], COMMAND_SIZE)
+        if address is None or command is None:
+            return None
+        return ParsedSignal(self.file_name, block[0].value, protocol=protocol, address=address, command=command)
+
+    def check_signal(self, block: List[Pair]) -> None:
+        name = block[0]
+        if not name.value:
+            self.report(name.line_no, ERROR, "empty-name", "signal has no name")
+        if len(block) < 2 or block[1].key != "type":
+            self.report(name.line_no, ERROR, "structure", f"signal '{name.value}' has no type after its name")
+            return
+        typ = block[1].value
+        if typ == "raw":
+            expected = RAW_KEYS
+        elif typ == "parsed":
+            expected = PARSED_KEYS
+        else:
+            self.report(block[1].line_no, ERROR, "unknown-type", f"unknown signal type '{typ}'")
+            return
+        if not self.check_keys(block, expected):
+            return
+
+        values = {}
+        for pair in block:
+            values.setdefault(pair.key, pair)
+        signal = self.check_raw(block, values) if typ == "raw" else self.check_parsed(block, values)
+        if signal is None:
+            return
+        signal.set_last_comment(name.comment)
+        self.signals.append(signal)
+
+        if signal in self.seen:
+            self.report(name.line_no, WARNING, "duplicate-signal",
+                        f"signal '{name.value}' is the same as the signal in line {self.seen[signal]}")
+        else:
+            self.seen[signal] = name.line_no
+
+    def invalid_line(self, line_no: int, line: str) -> None:
+        # called by tokenize while the file is read
+        self.report(line_no, ERROR, "structure", "line is neither a comment nor a key: value pair")
+
+    def check(self, pairs: List[Pair]) -> None:
+        # split the pairs into the header and one block per signal
+        starts = [i for i, z in enumerate(pairs) if z.key == "name"] + [len(pairs)]
+        self.check_header(pairs[:starts[0]])
+        for a, b in zip(starts, starts[1:]):
+            self.check_signal(pairs[a:b])
+        self.diagnostics.sort(key=lambda z: z.line)
+
+def _check(file_name: str, content: Union[str, None], with_signals: bool) -> Result:
+    checker = _Checker(file_name)
+    with FlipperFormat(file_name, content=content, invalid=checker.invalid_line) as fff:
+        checker.check(fff.pairs)
+    return Result(file_name, checker.diagnostics, checker.signals if with_signals else None)
+
+def check_content(content: str, file_name: str = "", with_signals: bool = False) -> Result:
+    return _check(file_name, content, with_signals)
+
+def check_file(file_name: str, with_signals: bool = False) -> Result:
+    """
+    lints the file, files which can't be read are reported as an error in line 0
+    """
+    try:
+        return _check(file_name, None, with_signals)
+    except (OSError, UnicodeDecodeError) as e:
+        return Result(file_name, [Diagnostic(0, ERROR, "read", str(e))], [] if with_signals else None)
+
+def lint_files(files: Iterable[str], jobs: int = 0) -> Iterator[Result]:
+    """
+    lints the files in forked workers (0 = all cores), yields the results in the order of the files
+    """
+    return fork_imap(check_file, list(files), jobs)
+
+# ------------------------------------------------------------
+
+def format_diagnostic(path: str, d: Diagnostic) -> str:
+    """
+    "path:line: level: message [code]" like compilers print it
+    """
+    return f"{path}:{d.line}: {d.level}: {d.message} [{d.code}]"
+
+def to_json(result: Result) -> dict:
+    return {
+        "path": result.path,
+        "diagnostics": [z._asdict() for z in result.diagnostics],
+    }
+
+def to_ndjson(result: Result) -> Iterator[str]:
+    """
+    one json line per diagnostic
+    """
+    for d in result.diagnostics:
+        yield json.dumps({"path": result.path, **d._asdict()})
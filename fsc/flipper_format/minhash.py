@@ -0,0 +1,109 @@
+"""
+near-duplicate detection between all files of the IRDB.
+
+every file is reduced to a MinHash sketch of its signal digests, LSH banding of the sketches
+yields candidate pairs and only those pairs are compared exactly.
+"""
+
+import random
+
+from typing import Dict, List, NamedTuple
+
+from fsc.flipper_format.index import UnionFind
+
+# mersenne prime for the universal hash functions
+_PRIME = (1 << 61) - 1
+
+# 42 bands of 3 rows: pairs with a jaccard similarity of 0.5 become candidates with > 99.9 %
+NUM_PERM = 126
+BANDS = 42
+
+class PairMatch(NamedTuple):
+    input: int # id of the file which is checked
+    checked: int # id of the file it is compared to
+    common: int # signals of the input file found in the checked file
+    common_confidence: float
+    balance_confidence: float
+    jaccard: float
+
+class MinHash:
+    def __init__(self, num_perm: int = NUM_PERM, seed: int = 1) -> None:
+        rng = random.Random(seed)
+        self.num_perm = num_perm
+        self.perms = [(rng.randrange(1, _PRIME), rng.randrange(0, _PRIME)) for _ in range(num_perm)]
+
+    def sketch(self, digests) -> tuple:
+        # digests are already uniformly distributed, so their first 8 bytes are used as the element
+        xs = [int.from_bytes(z[:8], "little") for z in digests]
+        if not xs:
+            return tuple([_PRIME] * self.num_perm)
+        return tuple(min((a * x + b) % _PRIME for x in xs) for a, b in self.perms)
+
+def candidate_pairs(sketches: List[tuple], bands: int = BANDS) -> set:
+    """
+    returns all pairs (a, b) with a < b which share at least one band of their sketch
+    """
+    pairs = set()
+    if not sketches:
+        return pairs
+    rows = len(sketches[0]) // bands
+    for band in range(bands):
+        buckets = {}
+        for file_id, sketch in enumerate(sketches):
+            key = sketch[band * rows:(band + 1) * rows]
+            buckets.setdefault(key, []).append(file_id)
+        for members in buckets.values():
+            for i in range(len(members)):
+                for j in range(i + 1, len(members)):
+                    pairs.add((members[i], members[j]))
+    return pairs
+
+def compare(files: List[Dict[bytes, int]], a: int, b: int) -> PairMatch:
+    """
+    scores file a (input) against file b (checked) the same way duplicate_finder.check does.
+    files map the digests of a file to the number of signals with this digest.
+    """
+    count_a, count_b = sum(files[a].values()), sum(files[b].values())
+    shared = files[a].keys() & files[b].keys()
+    common = sum(files[a][h] for h in shared)
+    union = len(files[a].keys() | files[b].keys())
+    return PairMatch(a, b, common, common / max(1, count_b),
+                     min(count_a, count_b) / max(1, count_a, count_b), len(shared) / max(1, union))
+
+def find_near_duplicates(files: List[Dict[bytes, int]], confidence: float = 0.8,
+                         num_perm: int = NUM_PERM, bands: int = BANDS) -> List[PairMatch]:
+    """
+    returns the matches of all file pairs above the confidence thresholds (in either direction).
+    files with the same digests are only sketched once and only compared to the first of them,
+    so a signal set copied many times doesn't give quadratic pairs. empty files never match.
+    """
+    groups = {}
+    for file_id, digests in enumerate(files):
+        if digests:
+            groups.setdefault(frozenset(digests), []).append(file_id)
+    groups = list(groups.values())
+
+    pairs = set()
+    for members in groups:
+        pairs.update((members[0], z) for z in members[1:])
+    minhash = MinHash(num_perm)
+    sketches = [minhash.sketch(files[z[0]].keys()) for z in groups]
+    for a, b in candidate_pairs(sketches, bands):
+        pairs.update((min(x, y), max(x, y)) for x in groups[a] for y in groups[b])
+
+    res = []
+    for a, b in sorted(pairs):
+        for match in (compare(files, a, b), compare(files, b, a)):
+            if match.common_confidence >= confidence and match.balance_confidence >= confidence:
+                res.append(match)
+                break
+    return res
+
+def clusters(count: int, matches: List[PairMatch]) -> List[List[int]]:
+    """
+    groups files which are connected by near-duplicate matches
+    """
+    uf = UnionFind(count)
+    for match in matches:
+        uf.union(match.input, match.checked)
+    return uf.groups()
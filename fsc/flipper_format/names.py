@@ -0,0 +1,95 @@
+"""
+compiled matcher for signal name rewrite rules.
+
+rules map a target name to a list of exact strings and regular expressions:
+
+    matcher = NameMatcher({"POWER": ["pwr", re.compile("^p(owe|w)r$")], "MUTE": ["mte"]})
+    matcher.match("pwr") # -> "POWER"
+
+the first rule (in the order of the targets, then of their values) which matches wins,
+exactly like checking every rule one after another.
+exact strings are looked up in a dict, all regular expressions are merged into one alternation
+with a named group per rule, so a name is resolved with a single dict lookup and a single match call.
+"""
+
+import re
+
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Union
+
+_SCOPED_FLAGS = [(re.ASCII, "a"), (re.IGNORECASE, "i"), (re.MULTILINE, "m"), (re.DOTALL, "s")]
+# global inline flags like (?i) are only allowed at the start of a pattern
+_GLOBAL_FLAGS = re.compile(r"^(\(\?[aiLmsux]+\))+")
+
+def _mergeable(pattern: re.Pattern) -> bool:
+    # back references and named groups would point to the wrong group after merging,
+    # comments of verbose patterns could swallow the closing parenthesis
+    return isinstance(pattern.pattern, str) and not pattern.groupindex and not pattern.flags & re.VERBOSE and \
+        re.search(r"\\[1-9]|\(\?P=", pattern.pattern) is None
+
+def _scoped(pattern: re.Pattern) -> str:
+    flags = "".join(c for flag, c in _SCOPED_FLAGS if pattern.flags & flag)
+    source = _GLOBAL_FLAGS.sub("", pattern.pattern)
+    return f"(?{flags}:{source})" if flags else source
+
+def normalize_name(name: str) -> str:
+    """
+    normalization used by cli_signal_name_rewrite ("Vol Up" -> "volup")
+    """
+    return name.strip().lower().replace(' ', '').replace('_', '')
+
+class NameMatcher:
+    def __init__(self, rules: Dict[str, List[Union[str, re.Pattern]]],
+                 normalize: Callable[[str], str] = None, memo_size: int = 4096) -> None:
+        """
+        normalize is applied to every name before matching (not to the rules)
+        """
+        self.normalize = normalize
+        self.targets: List[str] = []
+        self.exact: Dict[str, int] = {}
+        patterns = []
+        for target, values in rules.items():
+            for value in values:
+                priority = len(self.targets)
+                self.targets.append(target)
+                if isinstance(value, re.Pattern):
+                    patterns.append((priority, value))
+                else:
+                    # only the first occurrence of an exact string can ever match
+                    self.exact.setdefault(value, priority)
+
+        # (priority, pattern) of rules which can't be merged, checked one by one
+        self.extra = [z for z in patterns if not _mergeable(z[1])]
+        merged = [z for z in patterns if _mergeable(z[1])]
+        self.regex = None
+        if merged:
+            try:
+                self.regex = re.compile("|".join(f"(?P<r{p}>{_scoped(v)})" for p, v in merged))
+            except re.error:
+                self.extra = patterns
+        self._lookup = lru_cache(maxsize=memo_size)(self._find)
+
+    def _find(self, name: str) -> Optional[int]:
+        best = self.exact.get(name)
+        if self.regex is not None:
+            m = self.regex.match(name)
+            # the leftmost alternative which matches is the rule with the highest priority,
+            # its group is always the last one closed
+            if m is not None and (best is None or int(m.lastgroup[1:]) < best):
+                best = int(m.lastgroup[1:])
+        for priority, pattern in self.extra:
+            if best is not None and priority > best:
+                break
+            if pattern.match(name):
+                best = priority
+                break
+        return best
+
+    def match(self, name: str) -> Optional[str]:
+        """
+        returns the target of the first matching rule or None
+        """
+        if self.normalize is not None:
+            name = self.normalize(name)
+        priority = self._lookup(name)
+        return None if priority is None else self.targets[priority]
@@ -0,0 +1,61 @@
+"""
+runs a function over many inputs in forked worker processes.
+
+the function (and everything it references, e.g. a loaded database and its index) is inherited
+by the workers when they are forked, so it is shared copy-on-write and never pickled.
+only the inputs and the results are sent between the processes.
+"""
+
+import contextlib
+import gc
+import io
+import multiprocessing
+import os
+
+from typing import Any, Callable, Iterable, Iterator, Tuple
+
+# function of the current fork_imap call, inherited by the workers
+_func = None
+
+def _call(item: Any) -> Any:
+    return _func(item)
+
+def can_fork() -> bool:
+    return "fork" in multiprocessing.get_all_start_methods()
+
+def fork_imap(func: Callable[[Any], Any], items: Iterable[Any], jobs: int = 0, chunksize: int = None) -> Iterator[Any]:
+    """
+    yields func(item) for every item, in the order of the items.
+    jobs = 0 uses all cores, without fork support (windows) the items are processed one after another.
+    every worker gets slices of chunksize items (by default about four slices per worker).
+    """
+    global _func
+    items = list(items)
+    if jobs == 0:
+        jobs = os.cpu_count() or 1
+    if jobs <= 1 or len(items) <= 1 or not can_fork():
+        yield from map(func, items)
+        return
+
+    if chunksize is None:
+        chunksize = max(1, len(items) // (jobs * 4))
+    _func = func
+    # objects which exist before forking are never touched by the garbage collector of a worker,
+    # this keeps the shared pages from being copied
+    gc.freeze()
+    pool = multiprocessing.get_context("fork").Pool(min(jobs, len(items)))
+    try:
+        yield from pool.imap(_call, items, chunksize=chunksize)
+    finally:
+        pool.terminate()
+        gc.unfreeze()
+        _func = None
+
+def capture_output(func: Callable[..., Any], *args, **kwargs) -> Tuple[str, Any]:
+    """
+    returns (everything func printed, result of func), used to print the output of workers in order
+    """
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out):
+        res = func(*args, **kwargs)
+    return out.getvalue(), res
@@ -0,0 +1,262 @@
+"""
+single-pass transform pipeline for .ir maintenance jobs.
+
+a stage is a function from a stream of signals to a stream of signals. the stages are chosen by a
+declarative config and all of them run over a file with one read and (at most) one write:
+
+    pipeline = Pipeline.from_config([
+        {"stage": "clamp_frequency", "freq_min": 10_000, "freq_max": 56_000},
+        {"stage": "fix_negative_timings"},
+        {"stage": "rename", "rules": {"Power": ["pwr", "/^(turn[_\\s]*)?(on|off)$/"]}, "normalize": "lower"},
+        {"stage": "dedupe"},
+    ])
+    results = pipeline.run(glob("Flipper-IRDB/**/*.ir", recursive=True))
+
+a file is only written if a stage changed one of its signals. only the lines of changed values are written
+again (in the format of the file), all other lines and comments stay as they are. signals which are dropped
+are removed together with the comments before them.
+files which are already in the target state of a config are skipped on the next run (see rewrite.py).
+"""
+
+import re
+
+from array import array
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Union
+
+from fsc.flipper_format.base import FlipperFormat, tokenize
+from fsc.flipper_format.infrared import ParsedSignal, RawSignal, read_ir
+from fsc.flipper_format.names import NameMatcher, normalize_name
+from fsc.flipper_format.rewrite import RewriteResult, rewrite_files, rules_digest
+
+# bump this if a stage or the output changes, this invalidates the cache of files in their target state
+PIPELINE_VERSION = 2
+
+Signal = Union[RawSignal, ParsedSignal]
+Stage = Callable[[Iterable[Signal]], Iterator[Signal]]
+
+NORMALIZERS = {
+    "lower": str.lower,
+    "name": normalize_name,
+}
+
+def clamp_frequency(freq_min: int = 10_000, freq_max: int = 56_000) -> Stage:
+    """
+    clamps the frequency of raw signals into [freq_min, freq_max]
+    """
+    def stage(signals: Iterable[Signal]) -> Iterator[Signal]:
+        for signal in signals:
+            if signal.is_raw and not freq_min <= signal.frequency <= freq_max:
+                signal.set_frequency(min(freq_max, max(freq_min, signal.frequency)))
+            yield signal
+    return stage
+
+def fix_negative_timings() -> Stage:
+    """
+    replaces negative timings of raw signals with their absolute value
+    """
+    def stage(signals: Iterable[Signal]) -> Iterator[Signal]:
+        for signal in signals:
+            if signal.is_raw and any(z < 0 for z in signal.data):
+                signal.set_data(array("i", map(abs, signal.data)))
+            yield signal
+    return stage
+
+def _rule(value: Union[str, re.Pattern], normalize: Callable[[str], str]) -> Union[str, re.Pattern]:
+    # "/.../" is a regular expression, like in flipper_signal_rewrites.yaml
+    if isinstance(value, re.Pattern):
+        return value
+    if len(value) > 1 and value.startswith("/") and value.endswith("/"):
+        return re.compile(value[1:-1])
+    return normalize(value) if normalize is not None else value
+
+def rename(rules: Dict[str, List[Union[str, re.Pattern]]], normalize: str = None) -> Stage:
+    """
+    renames signals to the target of the first matching rule (see NameMatcher).
+    normalize ("lower" or "name") is applied to the names and to the exact strings of the rules.
+    """
+    if normalize is not None and normalize not in NORMALIZERS:
+        raise Exception(f"unknown normalization '{normalize}'")
+    func = NORMALIZERS.get(normalize)
+    matcher = NameMatcher({k: [_rule(z, func) for z in v] for k, v in rules.items()}, normalize=func)
+
+    def stage(signals: Iterable[Signal]) -> Iterator[Signal]:
+        for signal in signals:
+            target = matcher.match(signal.name)
+            if target is not None:
+                signal.set_name(target)
+            yield signal
+    return stage
+
+def dedupe() -> Stage:
+    """
+    drops every signal whose content (see __eq__) already appeared earlier in the file
+    """
+    def stage(signals: Iterable[Signal]) -> Iterator[Signal]:
+        seen = set()
+        for signal in signals:
+            if signal in seen:
+                continue
+            seen.add(signal)
+            yield signal
+    return stage
+
+STAGES: Dict[str, Callable[..., Stage]] = {
+    "clamp_frequency": clamp_frequency,
+    "fix_negative_timings": fix_negative_timings,
+    "rename": rename,
+    "dedupe": dedupe,
+}
+
+def _fields(signal: Signal) -> tuple:
+    # the values of all fields which can be written to the file (data is copied, stages may replace it)
+    if signal.is_raw:
+        return signal.name, signal.frequency, signal.duty_cycle, array("i", signal.data)
+    return signal.name, signal.protocol, signal.address, signal.command
+
+class _Source(NamedTuple):
+    start: int # first line of the signal, including the comments before it
+    end: int
+    lines: Dict[str, List[int]] # key -> line indices
+    texts: Dict[str, str] # key -> value as written in the file
+    fields: tuple # see _fields, before the stages ran
+
+def _is_filler(line: str) -> bool:
+    return line.startswith("#") or not line.strip()
+
+def _index_sources(content: str, lines: List[str], signals: List[Signal]) -> List[_Source]:
+    """
+    maps every signal to its lines, the signals are in the order of their name: lines
+    """
+    groups = [] # pairs of the header, then of every signal
+    header = []
+    for pair in tokenize(content):
+        if pair.key == "name":
+            groups.append([])
+        (groups[-1] if groups else header).append(pair)
+    if len(groups) != len(signals):
+        raise Exception(f"found {len(groups)} name: lines for {len(signals)} signals")
+
+    starts = []
+    prev_end = header[-1].line_no - 1 if header else -1
+    for group in groups:
+        # comments and blank lines directly before a signal belong to it
+        start = group[0].line_no - 1
+        while start - 1 > prev_end and _is_filler(lines[start - 1]):
+            start -= 1
+        starts.append(start)
+        prev_end = group[-1].line_no - 1
+
+    res = []
+    for i, (group, signal) in enumerate(zip(groups, signals)):
+        keys, texts = {}, {}
+        for pair in group:
+            keys.setdefault(pair.key, []).append(pair.line_no - 1)
+            texts.setdefault(pair.key, pair.value)
+        end = starts[i + 1] if i + 1 < len(starts) else len(lines)
+        res.append(_Source(starts[i], end, keys, texts, _fields(signal)))
+    return res
+
+def _eol(line: str) -> str:
+    return line[len(line.rstrip("\r\n")):]
+
+def _pair_line(line: str, value: str, eol: str = None) -> str:
+    # keeps the key and the line ending as they are written in the file
+    return f"{line[:line.index(':')]}: {value}{_eol(line) if eol is None else eol}"
+
+def _format_float(text: str, value: float) -> str:
+    # same number of decimals as the file (e.g. 0.330000)
+    if "." in text:
+        return f"{value:.{len(text.split('.')[1])}f}"
+    return str(value)
+
+def _render(signal: Signal, source: _Source, lines: List[str]) -> str:
+    """
+    returns the lines of the signal, only the lines of changed fields are written again
+    """
+    new = dict(zip(["name", "frequency", "duty_cycle", "data"] if signal.is_raw else
+                   ["name", "protocol", "address", "command"], _fields(signal)))
+    old = dict(zip(new.keys(), source.fields))
+    out = {}
+    for key, value in new.items():
+        if value == old[key]:
+            continue
+        idx = source.lines[key]
+        if key == "data":
+            # wrap the timings like the file does
+            per_line = [len(lines[z].split(":", 1)[1].split()) for z in idx]
+            if len(value) != sum(per_line):
+                per_line = [max(per_line[0], 1)] * (len(value) // max(per_line[0], 1) + 1)
+            chunks, pos = [], 0
+            for n in per_line:
+                if pos < len(value):
+                    chunks.append(value[pos:pos + n])
+                pos += n
+            eol = _eol(lines[idx[0]]) or "\n"
+            out[idx[0]] = "".join(_pair_line(lines[idx[0]], " ".join(str(z) for z in chunk),
+                                             eol if i < len(chunks) - 1 else _eol(lines[idx[-1]]))
+                                  for i, chunk in enumerate(chunks))
+            for z in idx[1:]:
+                out[z] = ""
+        elif key == "duty_cycle":
+            out[idx[0]] = _pair_line(lines[idx[0]], _format_float(source.texts[key], value))
+        elif key in ("address", "command"):
+            out[idx[0]] = _pair_line(lines[idx[0]], " ".join(f"{z:02X}" for z in value))
+        else:
+            out[idx[0]] = _pair_line(lines[idx[0]], str(value))
+    return "".join(out.get(i, lines[i]) for i in range(source.start, source.end))
+
+class Pipeline:
+    def __init__(self, stages: List[Stage], config: list = None) -> None:
+        """
+        config identifies the stages for the cache, without a config nothing is cached
+        """
+        self.stages = stages
+        self.config = config
+
+    @classmethod
+    def from_config(cls, config: List[dict]) -> "Pipeline":
+        """
+        config is a list of {"stage": name, **arguments of the stage}, the stages run in that order
+        """
+        stages = []
+        for entry in config:
+            args = dict(entry)
+            name = args.pop("stage", None)
+            if name not in STAGES:
+                raise Exception(f"unknown stage '{name}'")
+            stages.append(STAGES[name](**args))
+        return cls(stages, config)
+
+    def apply(self, signals: Iterable[Signal]) -> Iterator[Signal]:
+        for stage in self.stages:
+            signals = stage(signals)
+        return iter(signals)
+
+    def transform(self, content: str, file_name: str = "") -> str:
+        """
+        runs all stages over the signals of the content,
+        returns the content unchanged if no signal was changed
+        """
+        fff = FlipperFormat(file_name, content=content)
+        signals = list(read_ir(fff))
+        lines = content.splitlines(keepends=True)
+        sources = {id(signal): source for signal, source in zip(signals, _index_sources(content, lines, signals))}
+        after = list(self.apply(signals))
+        if [id(z) for z in after] == [id(z) for z in signals] and \
+                all(_fields(z) == sources[id(z)].fields for z in after):
+            return content
+
+        res = "".join(lines[:sources[id(signals[0])].start])
+        for signal in after:
+            if res and not res.endswith("\n"):
+                res += "\n"
+            res += _render(signal, sources[id(signal)], lines)
+        return res
+
+    def run(self, files: Iterable[str], workers: int = 0, dry_run: bool = False,
+            use_cache: bool = True) -> List[RewriteResult]:
+        """
+        rewrites every file in place (one read and at most one write per file), see rewrite_files
+        """
+        rules = rules_digest("pipeline", PIPELINE_VERSION, self.config) if self.config is not None else None
+        return rewrite_files(files, self.transform, rules=rules, workers=workers, dry_run=dry_run, use_cache=use_cache)
@@ -0,0 +1,146 @@
+"""
+parallel, atomic in-place rewriting of many files.
+
+a rewrite is a function from the content of a file to its new content. files are only written
+if the content changed, through a temporary file which replaces the original (a crash never leaves
+a half written file behind).
+
+files which are already in the target state of a rule set (the rewrite does not change them) are remembered
+by their content digest (and modification time), so the next run with the same rules skips them without
+running the rewrite. files which were changed are confirmed by the next run.
+"""
+
+import os
+import sqlite3
+import tempfile
+
+from hashlib import blake2b
+from typing import Callable, Iterable, List, NamedTuple, Union
+
+from fsc.flipper_format.cache import default_cache_file, file_key
+from fsc.flipper_format.parallel import fork_imap
+
+def rules_digest(*rules) -> str:
+    """
+    digest identifying a rule set, e.g. rules_digest("fix_frequency_range", 1, freq_min, freq_max).
+    include a version if the code of the rewrite changes.
+    """
+    return blake2b(repr(rules).encode("UTF-8"), digest_size=16).hexdigest()
+
+def content_digest(content: str) -> bytes:
+    return blake2b(content.encode("UTF-8", "surrogateescape"), digest_size=16).digest()
+
+def write_atomic(file_name: str, content: str) -> None:
+    directory = os.path.dirname(os.path.abspath(file_name))
+    fd, tmp = tempfile.mkstemp(prefix=".", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(content)
+        # keep the permissions of the original file
+        if os.path.exists(file_name):
+            os.chmod(tmp, os.stat(file_name).st_mode & 0o7777)
+        os.replace(tmp, file_name)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+class RewriteCache:
+    """
+    remembers files (and contents) which are in the target state of a rule set
+    """
+
+    def __init__(self, file_name: str = None) -> None:
+        self.file_name = file_name or default_cache_file("rewrite_cache.sqlite")
+        os.makedirs(os.path.dirname(os.path.abspath(self.file_name)), exist_ok=True)
+        self.db = sqlite3.connect(self.file_name, timeout=30)
+        self.db.execute("""CREATE TABLE IF NOT EXISTS clean (
+            path TEXT NOT NULL,
+            rules TEXT NOT NULL,
+            mtime INTEGER NOT NULL,
+            size INTEGER NOT NULL,
+            digest BLOB NOT NULL,
+            PRIMARY KEY (path, rules)
+        )""")
+        self.db.execute("CREATE INDEX IF NOT EXISTS clean_digest ON clean (rules, digest)")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self.db.commit()
+        self.db.close()
+
+    # ------------------------------------------------------------
+
+    def is_clean(self, file_name: str, rules: str) -> bool:
+        """
+        True if the file did not change since it was last seen in the target state
+        """
+        key = file_key(file_name)
+        if key is None:
+            return False
+        row = self.db.execute("SELECT mtime, size FROM clean WHERE path = ? AND rules = ?",
+                              (key[0], rules)).fetchone()
+        return row is not None and tuple(row) == key[1:]
+
+    def clean_digests(self, rules: str) -> set:
+        return {z[0] for z in self.db.execute("SELECT digest FROM clean WHERE rules = ?", (rules,))}
+
+    def put(self, file_name: str, rules: str, digest: bytes) -> None:
+        key = file_key(file_name)
+        if key is None:
+            return
+        self.db.execute("INSERT OR REPLACE INTO clean VALUES (?, ?, ?, ?, ?)", (key[0], rules, key[1], key[2], digest))
+
+class RewriteResult(NamedTuple):
+    path: str
+    changed: bool
+    skipped: bool # skipped because the file was already in the target state
+    digest: Union[bytes, None] # digest of the final content if it is in the target state
+
+def _rewrite_one(file_name: str, transform: Callable[[str], str], clean: set, dry_run: bool) -> RewriteResult:
+    with open(file_name, "r") as f:
+        content = f.read()
+    digest = content_digest(content)
+    if digest in clean:
+        return RewriteResult(file_name, False, True, digest)
+    new_content = transform(content)
+    if new_content == content:
+        return RewriteResult(file_name, False, False, digest)
+    if not dry_run:
+        write_atomic(file_name, new_content)
+    # a rewritten file is not cached yet: it is only known to be in the target state
+    # once the next run leaves it unchanged (the rewrite does not have to be idempotent)
+    return RewriteResult(file_name, True, False, None)
+
+def rewrite_files(files: Iterable[str], transform: Callable[[str], str], rules: str = None,
+                  workers: int = 0, dry_run: bool = False, use_cache: bool = True) -> List[RewriteResult]:
+    """
+    rewrites every file with transform (content -> new content) in forked workers.
+    rules identifies the rewrite for the cache (see rules_digest), without rules nothing is cached.
+    returns the results in the order of the files.
+    """
+    files = list(files)
+    cache = RewriteCache() if use_cache and rules is not None else None
+    try:
+        clean, todo, res = set(), [], {}
+        if cache is not None:
+            clean = cache.clean_digests(rules)
+            for file_name in files:
+                if cache.is_clean(file_name, rules):
+                    res[file_name] = RewriteResult(file_name, False, True, None)
+                else:
+                    todo.append(file_name)
+        else:
+            todo = files
+        for r in fork_imap(lambda z: _rewrite_one(z, transform, clean, dry_run), todo, workers):
+            res[r.path] = r
+            if cache is not None and r.digest is not None:
+                cache.put(r.path, rules, r.digest)
+        return [res[z] for z in files]
+    finally:
+        if cache is not None:
+            cache.close()
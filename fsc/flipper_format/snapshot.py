@@ -0,0 +1,243 @@
+"""
+binary, column oriented snapshot of a whole IRDB tree.
+
+a snapshot is compiled once from the .ir files and can then be memory-mapped,
+so tools don't have to parse thousands of text files on every start.
+
+layout (little endian):
+    magic (8 bytes), version (u32), file count (u32), signal count (u32), reserved (u32)
+    section table: (offset u64, size u64) for every section in SECTIONS
+    sections, each aligned to 8 bytes
+
+the snapshot does not track changes of the source files, re-compile it after updating the IRDB.
+"""
+
+import mmap
+import struct
+import sys
+
+from array import array
+from typing import Iterator, List, Tuple, Union
+
+from fsc.flipper_format.bulk import iter_all_ir
+from fsc.flipper_format.infrared import DIGEST_SIZE, ParsedSignal, RawSignal
+
+MAGIC = b"FSCSNAP\0"
+VERSION = 2
+
+_HEADER = struct.Struct("<8sIIII")
+_SECTION = struct.Struct("<QQ")
+
+SECTIONS = [
+    "string_offsets", # u32 [strings + 1]
+    "strings", # utf-8 blob
+    "file_path", # u32 string id [files]
+    "file_start", # u32 first signal [files + 1]
+    "signal_name", # u32 string id [signals]
+    "signal_comment", # u32 string id [signals]
+    "signal_raw", # u8 1 = raw, 0 = parsed [signals]
+    "signal_frequency", # u32 [signals]
+    "signal_duty_cycle", # f64 [signals]
+    "signal_data_start", # u32 offset into timings [signals + 1]
+    "signal_protocol", # u32 string id [signals]
+    "signal_address_start", # u32 offset into addresses [signals + 1]
+    "signal_command_start", # u32 offset into commands [signals + 1]
+    "addresses", # address bytes of all parsed signals
+    "commands", # command bytes of all parsed signals
+    "signal_digest", # DIGEST_SIZE bytes [signals]
+    "timings", # i32 [total raw timings]
+]
+
+def _to_le(a: array) -> bytes:
+    if sys.byteorder != "little":
+        a = array(a.typecode, a)
+        a.byteswap()
+    return a.tobytes()
+
+class _StringTable:
+    def __init__(self) -> None:
+        self.ids = {}
+        self.offsets = array("I", [0])
+        self.blob = bytearray()
+
+    def add(self, s: str) -> int:
+        if s not in self.ids:
+            self.ids[s] = len(self.ids)
+            self.blob += s.encode("UTF-8")
+            self.offsets.append(len(self.blob))
+        return self.ids[s]
+
+def compile_snapshot(pattern: str, file_name: str, workers: int = 1) -> Tuple[int, int]:
+    """
+    parses every file matching the pattern and writes the snapshot to file_name.
+    returns (file count, signal count)
+    """
+    strings = _StringTable()
+    file_path, file_start = array("I"), array("I", [0])
+    name, comment, raw = array("I"), array("I"), bytearray()
+    frequency, duty_cycle, data_start = array("I"), array("d"), array("I", [0])
+    protocol, digest = array("I"), bytearray()
+    # address and command are stored with their real length, the digest is computed over them
+    address_start, address, command_start, command = array("I", [0]), bytearray(), array("I", [0]), bytearray()
+    timings = array("i")
+
+    for path, signals in iter_all_ir(pattern, workers=workers):
+        file_path.append(strings.add(path))
+        for signal in signals:
+            name.append(strings.add(signal.name))
+            comment.append(strings.add(signal.get_last_comment() or ""))
+            raw.append(1 if signal.is_raw else 0)
+            digest += signal.digest()
+            if signal.is_raw:
+                frequency.append(signal.frequency)
+                duty_cycle.append(signal.duty_cycle)
+                timings.extend(signal.data)
+                protocol.append(strings.add(""))
+            else:
+                frequency.append(0)
+                duty_cycle.append(0)
+                protocol.append(strings.add(signal.protocol))
+                address += signal.address
+                command += signal.command
+            data_start.append(len(timings))
+            address_start.append(len(address))
+            command_start.append(len(command))
+        file_start.append(len(name))
+
+    sections = [
+        _to_le(strings.offsets), bytes(strings.blob), _to_le(file_path), _to_le(file_start),
+        _to_le(name), _to_le(comment), bytes(raw), _to_le(frequency), _to_le(duty_cycle),
+        _to_le(data_start), _to_le(protocol), _to_le(address_start), _to_le(command_start), bytes(address),
+        bytes(command), bytes(digest), _to_le(timings),
+    ]
+    with open(file_name, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, len(file_path), len(name), 0))
+        offset = _HEADER.size + _SECTION.size * len(sections)
+        table = []
+        for section in sections:
+            offset += -offset % 8
+            table.append((offset, len(section)))
+            offset += len(section)
+        for entry in table:
+            f.write(_SECTION.pack(*entry))
+        for (offset, _), section in zip(table, sections):
+            f.write(bytes(offset - f.tell()))
+            f.write(section)
+    return len(file_path), len(name)
+
+class Snapshot:
+    """
+    with Snapshot("irdb.snap") as snap:
+        for path, signals in snap.iter_files():
+            ...
+    """
+
+    def __init__(self, file_name: str) -> None:
+        self.file_name = file_name
+        self.fd = open(self.file_name, "rb")
+        self.mm = mmap.mmap(self.fd.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = memoryview(self.mm)
+        magic, version, self.file_count, self.signal_count, _ = _HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC or version != VERSION:
+            raise Exception(f"{file_name} is not a snapshot (version {VERSION})")
+        if sys.byteorder != "little":
+            raise Exception("snapshots can only be mapped on little endian machines")
+        table = [_SECTION.unpack_from(self.mm, _HEADER.size + i * _SECTION.size) for i in range(len(SECTIONS))]
+        self.sections = {k: self.view[o:o+s] for k, (o, s) in zip(SECTIONS, table)}
+        # zero-copy views of the typed columns
+        s = self.sections
+        self.string_offsets = s["string_offsets"].cast("I")
+        self.file_path = s["file_path"].cast("I")
+        self.file_start = s["file_start"].cast("I")
+        self.signal_name = s["signal_name"].cast("I")
+        self.signal_comment = s["signal_comment"].cast("I")
+        self.signal_raw = s["signal_raw"]
+        self.signal_frequency = s["signal_frequency"].cast("I")
+        self.signal_duty_cycle = s["signal_duty_cycle"].cast("d")
+        self.signal_data_start = s["signal_data_start"].cast("I")
+        self.signal_protocol = s["signal_protocol"].cast("I")
+        self.signal_address_start = s["signal_address_start"].cast("I")
+        self.signal_command_start = s["signal_command_start"].cast("I")
+        self.timings = s["timings"].cast("i")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        # the views have to be released before the mapping can be closed
+        for v in [self.string_offsets, self.file_path, self.file_start, self.signal_name, self.signal_comment,
+                  self.signal_frequency, self.signal_duty_cycle, self.signal_data_start, self.signal_protocol,
+                  self.signal_address_start, self.signal_command_start, self.timings,
+                  *self.sections.values(), self.view]:
+            v.release()
+        try:
+            self.mm.close()
+        except BufferError:
+            # the timings of loaded raw signals still point into the mapping,
+            # it is unmapped once the last of them is gone
+            pass
+        self.fd.close()
+
+    # ------------------------------------------------------------
+
+    def string(self, i: int) -> str:
+        return str(self.sections["strings"][self.string_offsets[i]:self.string_offsets[i + 1]], "UTF-8")
+
+    def get_paths(self) -> List[str]:
+        return [self.string(z) for z in self.file_path]
+
+    def file_signals(self, file_id: int) -> range:
+        return range(self.file_start[file_id], self.file_start[file_id + 1])
+
+    def digest(self, i: int) -> bytes:
+        return bytes(self.sections["signal_digest"][i * DIGEST_SIZE:(i + 1) * DIGEST_SIZE])
+
+    def name(self, i: int) -> str:
+        return self.string(self.signal_name[i])
+
+    def data(self, i: int) -> memoryview:
+        """
+        zero-copy view of the raw timings of signal i
+        """
+        return self.timings[self.signal_data_start[i]:self.signal_data_start[i + 1]]
+
+    def address(self, i: int) -> memoryview:
+        return self.sections["addresses"][self.signal_address_start[i]:self.signal_address_start[i + 1]]
+
+    def command(self, i: int) -> memoryview:
+        return self.sections["commands"][self.signal_command_start[i]:self.signal_command_start[i + 1]]
+
+    def signal(self, i: int, src: str = "") -> Union[RawSignal, ParsedSignal]:
+        """
+        the timings of raw signals are not copied, they stay a view into the mapping.
+        the stored digest is used, so the signal is never packed and hashed again.
+        """
+        if self.signal_raw[i]:
+            r = RawSignal(src, self.name(i), frequency=self.signal_frequency[i],
+                          duty_cycle=self.signal_duty_cycle[i], data=self.data(i))
+        else:
+            r = ParsedSignal(src, self.name(i), protocol=self.string(self.signal_protocol[i]),
+                             address=self.address(i), command=self.command(i))
+        r.set_last_comment(self.string(self.signal_comment[i]))
+        r._digest = self.digest(i)
+        return r
+
+    def iter_files(self) -> Iterator[Tuple[str, List[Union[RawSignal, ParsedSignal]]]]:
+        """
+        same as bulk.iter_all_ir, but read from the snapshot
+        """
+        for file_id in range(self.file_count):
+            path = self.string(self.file_path[file_id])
+            yield path, [self.signal(z, path) for z in self.file_signals(file_id)]
+
+def iter_snapshot(file_name: str) -> Iterator[Tuple[str, List[Union[RawSignal, ParsedSignal]]]]:
+    with Snapshot(file_name) as snap:
+        yield from snap.iter_files()
+
+if __name__ == "__main__":
+    # python -m fsc.flipper_format.snapshot "Flipper-IRDB/**/*.ir" irdb.snap
+    files, signals = compile_snapshot(sys.argv[1], sys.argv[2], workers=0)
+    print(f"wrote {files} files with {signals} signals to {sys.argv[2]}")
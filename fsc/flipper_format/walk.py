@@ -0,0 +1,145 @@
+"""
+single-pass directory walk with compiled glob patterns.
+
+instead of calling glob.glob for every pattern, the tree below all patterns is walked once
+with os.scandir and every file is matched against the compiled patterns:
+
+    patterns = ["Flipper-IRDB/TVs/**/*.ir", "Flipper-IRDB/ACs/**/*.ir"]
+    include = compile_globs(patterns)
+    for path in walk_patterns(patterns):
+        if include.match(to_posix(path)):
+            ...
+
+the patterns behave like glob.glob(pattern, recursive=True): "**" matches any number of directories,
+wildcards don't match "/" and names starting with "." are only matched by patterns starting with ".".
+"""
+
+import os
+import re
+
+from typing import Iterable, Iterator, List, Optional
+
+_MAGIC = re.compile(r"[*?[]")
+
+def to_posix(path: str) -> str:
+    return path.replace(os.sep, "/") if os.sep != "/" else path
+
+def _translate_part(part: str) -> str:
+    res = "" if part.startswith(".") else r"(?!\.)"
+    i = 0
+    while i < len(part):
+        c = part[i]
+        i += 1
+        if c == "*":
+            res += "[^/]*"
+        elif c == "?":
+            res += "[^/]"
+        elif c == "[":
+            j = i
+            if j < len(part) and part[j] == "!":
+                j += 1
+            if j < len(part) and part[j] == "]":
+                j += 1
+            while j < len(part) and part[j] != "]":
+                j += 1
+            if j >= len(part):
+                res += r"\["
+                continue
+            chars = part[i:j].replace("\\", "\\\\").replace("[", "\\[")
+            i = j + 1
+            if chars.startswith("!"):
+                chars = "^/" + chars[1:]
+            elif chars.startswith("^"):
+                chars = "\\" + chars
+            res += f"[{chars}]"
+        else:
+            res += re.escape(c)
+    return res
+
+def glob_to_regex(pattern: str) -> str:
+    parts = to_posix(pattern).split("/")
+    res = ""
+    for i, part in enumerate(parts):
+        last = i == len(parts) - 1
+        if part == "**":
+            # any number of (not hidden) directories, or any file below them if it is the last part
+            res += r"(?:(?!\.)[^/]*(?:/(?!\.)[^/]*)*)?" if last else r"(?:(?!\.)[^/]*/)*"
+        else:
+            res += _translate_part(part) + ("" if last else "/")
+    return res
+
+def compile_globs(patterns: Iterable[str]) -> Optional[re.Pattern]:
+    """
+    merges all patterns into one regular expression, returns None if there are no patterns
+    """
+    patterns = list(patterns)
+    if not patterns:
+        return None
+    return re.compile("|".join(f"(?:{glob_to_regex(z)})" for z in patterns) + r"\Z")
+
+def glob_root(pattern: str) -> str:
+    """
+    returns the directory below which all matches of the pattern are
+    """
+    parts = to_posix(pattern).split("/")
+    literal = []
+    for part in parts[:-1]:
+        if _MAGIC.search(part):
+            break
+        literal.append(part)
+    return "/".join(literal) or "."
+
+def glob_roots(patterns: Iterable[str]) -> List[str]:
+    """
+    returns the roots of all patterns, without roots which are below another root
+    """
+    roots = sorted(set(glob_root(z) for z in patterns))
+    if "." in roots:
+        return ["."]
+    res = []
+    for root in roots:
+        if not any(root.startswith(z + "/") for z in res):
+            res.append(root)
+    return res
+
+def walk_files(roots: Iterable[str], hidden: bool = False) -> Iterator[str]:
+    """
+    yields every file below the roots (sorted per directory), paths are joined like glob does.
+    hidden directories are skipped unless hidden is set.
+    """
+    # (directory, real paths of the directory and its parents)
+    stack = [(z, ()) for z in reversed(list(roots))]
+    while stack:
+        directory, parents = stack.pop()
+        try:
+            # symlinked directories are followed like glob does, but never into a loop
+            real = os.path.realpath(directory)
+            if real in parents:
+                continue
+            parents = parents + (real,)
+            with os.scandir(directory) as it:
+                entries = sorted(it, key=lambda z: z.name)
+        except OSError:
+            continue
+        subdirs = []
+        for entry in entries:
+            path = entry.name if directory == "." else os.path.join(directory, entry.name)
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                continue
+            if is_dir:
+                if hidden or not entry.name.startswith("."):
+                    subdirs.append((path, parents))
+            else:
+                yield path
+        stack.extend(reversed(subdirs))
+
+def walk_patterns(patterns: Iterable[str]) -> Iterator[str]:
+    """
+    walks the roots of all patterns once, hidden directories only if a pattern names one
+    """
+    patterns = list(patterns)
+    hidden = any(part.startswith(".") and part not in (".", "..")
+                 for z in patterns for part in to_posix(z).split("/"))
+    return walk_files(glob_roots(patterns), hidden)
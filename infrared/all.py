@@ -1,24 +1,28 @@
 import sys
 sys.path.insert(0, '..') # ugly ass hack :/
 
-from fsc.flipper_format.base import FlipperFormat
-from fsc.flipper_format.infrared import read_ir
 from fsc.flipper_format.bulk import write_all_ir_ir
-
-from fff_ir_lint.lint import Result, check_file
+from fsc.flipper_format.lint import Result, check_file, format_diagnostic
 
 from glob import glob
 
 if __name__ == "__main__":
     for file in glob("input_files/**/*.ir", recursive=True):
-        hashes = []
+        # the file is parsed while it is linted
+        result: Result = check_file(file, with_signals=True)
+        for d in result.diagnostics:
+            print(format_diagnostic(file, d))
+        # values out of range are written as they are, only files which can't be parsed completely are skipped
+        if result.structural_errors:
+            print("skipped", file, "(" + ", ".join(sorted({z.code for z in result.structural_errors})) + ")")
+            continue
+
+        seen = set()
         uniq = []
-        with FlipperFormat(file) as fff:
-            for signal in read_ir(fff):
-                h = hash(signal)
-                if h in hashes:
-                    continue
-                hashes.append(h)
-                uniq.append(signal)
+        for signal in result.signals:
+            if signal in seen:
+                continue
+            seen.add(signal)
+            uniq.append(signal)
         write_all_ir_ir(file, uniq)
         print("wrote", file)
@@ -4,35 +4,27 @@ sys.path.insert(0, '..') # ugly ass hack :/
 import math
 
 from glob import glob
-from typing import List
 
-from fsc.flipper_format.base import FlipperFormat
-from fsc.flipper_format.infrared import read_ir
+from fsc.flipper_format.daemon import request, resolve_path
+from fsc.flipper_format.fuzzy import FuzzyIndex
+from fsc.flipper_format.irdb import IRDB, serve
+from fsc.flipper_format.minhash import clusters, find_near_duplicates
+from fsc.flipper_format.parallel import capture_output, fork_imap
 
 ####################################################################################################
 
 DB_FILES = "**/*.ir"
 SILENT_MODE = True
+WORKERS = 0 # parse the database using all cores
+DECODE_RAW = False # store raw signals of known protocols as parsed signals (--decode)
+# compile with: python -m fsc.flipper_format.snapshot "<DB_FILES>" irdb.snap
+SNAPSHOT_FILE = None # e.g. "irdb.snap"
+# address of the --serve daemon
+DAEMON_ADDRESS = ("127.0.0.1", 8461)
+CONFIDENCE = 0.8
 
 ####################################################################################################
 
-class IRDBFile:
-    def __init__(self, path) -> None:
-        self.path = path
-        self.hashes = {}
-        self.count = 0
-
-    def load(self):
-        # load signal hashes
-        with FlipperFormat(self.path) as fff:
-            signals = read_ir(fff)
-            for signal in signals:
-                self.count += 1
-                h = hash(signal)
-                if h not in self.hashes:
-                    self.hashes[h] = []
-                self.hashes[h].append(signal.name)
-
 def create_progress_bar(percentage: float, width: int = 30, symbol: str = "#") -> str:
     count = min(width, math.ceil(percentage * width))
     return f"[{symbol*count}{' '*(width-count)}] ({round(percentage*100)} %)"
@@ -41,18 +33,35 @@ def create_distribution(percentage: float, width: int = 30, symbol: str = "#") -
     count = min(width, math.ceil(percentage * width))
     return symbol*count
 
-def check(db: List[IRDBFile], path: str) -> bool:
+def check(db: IRDB, path: str) -> bool:
     # parse signals in current file
-    with FlipperFormat(path) as fff:
-        signals = [z for z in read_ir(fff)]
+    signals = db.read_file(path)
     signals_len = len(signals)
+
+    # similar raw signals: { input signal index -> { db path -> db signal hash } }
+    similar = {}
+    if db.fuzzy_index is not None:
+        for i, input_signal in enumerate(signals):
+            if not input_signal.is_raw:
+                continue
+            for (similar_path, similar_hash), _ in db.fuzzy_index.query(input_signal):
+                similar.setdefault(i, {}).setdefault(similar_path, similar_hash)
+
+    # count the common signals of every database file which shares at least one signal
+    common_counts = db.index.count_common([z.digest() for z in signals], similar)
     
     found_any = False
-    for data in db:
+    for file_id in sorted(common_counts):
+        data = db[file_id]
         # ignore self
         if data.path == path:
             continue
 
+        # skip files which can't reach the thresholds before collecting the details
+        if common_counts[file_id] / data.count < CONFIDENCE or \
+                min(data.count, signals_len) / max(data.count, signals_len) < CONFIDENCE:
+            continue
+
         # find similar signals in file
         
         # iterate over signals in current file
@@ -69,8 +78,11 @@ def check(db: List[IRDBFile], path: str) -> bool:
         left [checking]: { hash -> FANS ON }
         right [checked]: { hash -> FANS OFF }
         """
-        for input_signal in signals:
-            input_signal_hash = hash(input_signal)
+        for i, input_signal in enumerate(signals):
+            input_signal_hash = input_signal.digest()
+            if input_signal_hash not in data.hashes and data.path in similar.get(i, ()):
+                # the checked file has a similar raw signal
+                input_signal_hash = similar[i][data.path]
             if input_signal_hash in data.hashes:
                 # both files have the same signal
                 common[input_signal_hash] = [input_signal.name, data.hashes[input_signal_hash]]
@@ -114,7 +126,7 @@ def check(db: List[IRDBFile], path: str) -> bool:
         └─ ... and 14 more ... ──────┴─ ... and 9 more ... ─┴─ ... and 1 more ... ─┘
         """
 
-        if common_confidence >= .8 and balance_confidence >= .8:
+        if common_confidence >= CONFIDENCE and balance_confidence >= CONFIDENCE:
             # print file name
             if not found_any:
                 print()
@@ -159,25 +171,73 @@ def check(db: List[IRDBFile], path: str) -> bool:
         print("```")
     return found_any
 
-def create_database() -> List[IRDBFile]:
-    res = []
-    for ir in glob(DB_FILES, recursive=True):
-        if not SILENT_MODE: print("[DB] Loading", ir)
-        irdb = IRDBFile(ir)
-        irdb.load()
-        res.append(irdb)
-    return res
-
-if __name__ == "__main__":
-    if not SILENT_MODE: print("[db] Reading database ...")
-    db = create_database()
-    if not SILENT_MODE: 
-        print("  [db] done!")
+def audit(db: IRDB) -> bool:
+    # all-pairs check of the database, only pairs found by MinHash/LSH are compared exactly
+    files = [{h: len(names) for h, names in data.hashes.items()} for data in db]
+    matches = find_near_duplicates(files, CONFIDENCE)
+    if not matches:
+        return False
+    for i, cluster in enumerate(clusters(len(db), matches)):
+        print()
+        print(f"## Cluster {i + 1} ({len(cluster)} files)")
         print()
+        print("```")
+        for file_id in cluster:
+            print(f"{db[file_id].path} ({db[file_id].count} signals)")
+        print("```")
+    print()
+    print("| Input | Checked | Common | Balance | Jaccard |")
+    print("| --- | --- | --- | --- | --- |")
+    for match in matches:
+        print(f"| `{db[match.input].path}` | `{db[match.checked].path}` | {round(match.common_confidence * 100)} % | " + \
+            f"{round(match.balance_confidence * 100)} % | {round(match.jaccard * 100)} % |")
+    return True
+
+def run_daemon(db: IRDB) -> None:
+    # keep the database loaded and answer the requests of --client
+    def handle(req: dict) -> dict:
+        found_any = False
+        for file in req["files"]:
+            if check(db, resolve_path(req["cwd"], file)):
+                found_any = True
+        return {"found": found_any}
 
+    serve(db, handle, DAEMON_ADDRESS)
+
+if __name__ == "__main__":
     input_files = []
-    for arg in sys.argv[1:]:
-        if arg.startswith("glob:"):
+    fuzzy = False
+    use_cache = True
+    serve_mode = False
+    client_mode = False
+    audit_mode = False
+    jobs = 1
+    args = iter(sys.argv[1:])
+    for arg in args:
+        if arg == "--audit":
+            # find near-duplicates between all files of the database
+            audit_mode = True
+        elif arg == "--fuzzy":
+            # also match raw signals with slightly different timings
+            fuzzy = True
+        elif arg == "--serve":
+            # keep the database loaded, see --client
+            serve_mode = True
+        elif arg == "--client":
+            # send the input files to a running --serve instance
+            client_mode = True
+        elif arg == "--jobs":
+            # check the input files in N forked processes (0 = all cores)
+            jobs = int(next(args))
+        elif arg.startswith("--jobs="):
+            jobs = int(arg[7:])
+        elif arg == "--decode":
+            # compare raw signals of known protocols as parsed signals
+            DECODE_RAW = True
+        elif arg == "--no-cache":
+            # parse every database file again
+            use_cache = False
+        elif arg.startswith("glob:"):
             input_files.extend(glob(arg[5:], recursive=True))
         elif arg.startswith("file:"):
             with open(arg[5:], "r") as fd:
@@ -185,9 +245,34 @@ if __name__ == "__main__":
         else:
             input_files.append(arg)
 
+    if client_mode:
+        res = request({"files": input_files}, DAEMON_ADDRESS)
+        sys.stdout.write(res["output"])
+        if res["found"]:
+            sys.exit("found duplicates")
+        sys.exit(0)
+
+    if not SILENT_MODE: print("[db] Reading database ...")
+    db = IRDB(DB_FILES, workers=WORKERS, decode_raw=DECODE_RAW, snapshot_file=SNAPSHOT_FILE, use_cache=use_cache,
+              fuzzy_index=FuzzyIndex() if fuzzy else None, verbose=not SILENT_MODE)
+    if serve_mode:
+        run_daemon(db)
+        sys.exit(0)
+    db.load()
+    if audit_mode:
+        if audit(db):
+            sys.exit("found duplicates")
+        sys.exit(0)
+    if not SILENT_MODE: 
+        print("  [db] done!")
+        print()
+
     found_any = False
-    for file in input_files:
-        if check(db, file):
+    # with --jobs the files are checked in forked workers sharing the database, the output stays in order
+    results = fork_imap(lambda file: capture_output(check, db, file), input_files, jobs)
+    for output, found in results:
+        sys.stdout.write(output)
+        if found:
             found_any = True
     if found_any:
         sys.exit("found duplicates")
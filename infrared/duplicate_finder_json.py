@@ -1,51 +1,60 @@
 import sys
 sys.path.insert(0, '..') # ugly ass hack :/
 
+import heapq
 import json
 
 from glob import glob
-from typing import List
 
-from fsc.flipper_format.base import FlipperFormat
-from fsc.flipper_format.infrared import read_ir
+from fsc.flipper_format.daemon import request, resolve_path
+from fsc.flipper_format.fuzzy import FuzzyIndex
+from fsc.flipper_format.irdb import IRDB, serve
+from fsc.flipper_format.minhash import clusters, find_near_duplicates
+from fsc.flipper_format.parallel import fork_imap
 
 ####################################################################################################
 
 DB_FILES = "Flipper-IRDB-official/**/*.ir"
 SILENT_MODE = True
+WORKERS = 0 # parse the database using all cores
+DECODE_RAW = False # store raw signals of known protocols as parsed signals (--decode)
+# compile with: python -m fsc.flipper_format.snapshot "<DB_FILES>" irdb.snap
+SNAPSHOT_FILE = None # e.g. "irdb.snap"
+# address of the --serve daemon
+DAEMON_ADDRESS = ("127.0.0.1", 8462)
 CONFIDENCE = 0.8
 
 ####################################################################################################
 
-class IRDBFile:
-    def __init__(self, path) -> None:
-        self.path = path
-        self.hashes = {}
-        self.count = 0
-
-    def load(self):
-        # load signal hashes
-        with FlipperFormat(self.path) as fff:
-            signals = read_ir(fff)
-            for signal in signals:
-                self.count += 1
-                h = hash(signal)
-                if h not in self.hashes:
-                    self.hashes[h] = []
-                self.hashes[h].append(signal.name)
-
-def check(db: List[IRDBFile], path: str) -> list:
+def check(db: IRDB, path: str, top: int = None) -> list:
     # parse signals in current file
-    with FlipperFormat(path) as fff:
-        signals = [z for z in read_ir(fff)]
+    signals = db.read_file(path)
     signals_len = len(signals)
+
+    # similar raw signals: { input signal index -> { db path -> db signal hash } }
+    similar = {}
+    if db.fuzzy_index is not None:
+        for i, input_signal in enumerate(signals):
+            if not input_signal.is_raw:
+                continue
+            for (similar_path, similar_hash), _ in db.fuzzy_index.query(input_signal):
+                similar.setdefault(i, {}).setdefault(similar_path, similar_hash)
+
+    # count the common signals of every database file which shares at least one signal
+    common_counts = db.index.count_common([z.digest() for z in signals], similar)
     
     result = []
-    for data in db:
+    for file_id in sorted(common_counts):
+        data = db[file_id]
         # ignore self
         if data.path == path:
             continue
 
+        # skip files which can't reach the thresholds before collecting the details
+        if common_counts[file_id] / max(1, data.count) < CONFIDENCE or \
+                min(data.count, signals_len) / max(data.count, signals_len) < CONFIDENCE:
+            continue
+
         common, input_only, checked_only = {}, {}, {}
         common_count, input_count, checked_count = 0, 0, 0
 
@@ -54,8 +63,11 @@ def check(db: List[IRDBFile], path: str) -> list:
         left [checking]: { hash -> FANS ON }
         right [checked]: { hash -> FANS OFF }
         """
-        for input_signal in signals:
-            input_signal_hash = hash(input_signal)
+        for i, input_signal in enumerate(signals):
+            input_signal_hash = input_signal.digest()
+            if input_signal_hash not in data.hashes and data.path in similar.get(i, ()):
+                # the checked file has a similar raw signal
+                input_signal_hash = similar[i][data.path]
             if input_signal_hash in data.hashes:
                 # both files have the same signal
                 common[input_signal_hash] = [input_signal.name, data.hashes[input_signal_hash]]
@@ -88,7 +100,7 @@ def check(db: List[IRDBFile], path: str) -> list:
         balance_confidence = min(data.count, signals_len) / max(data.count, signals_len)
 
         if common_confidence >= CONFIDENCE and balance_confidence >= CONFIDENCE:
-            result.append({
+            match = {
                 "path": data.path,
                 "confidence": common_confidence,
                 "balance": {
@@ -99,28 +111,91 @@ def check(db: List[IRDBFile], path: str) -> list:
                     "missesp": round(input_balance * 100),
                 },
                 "common": {cn[0]: cn[1] for _, cn in common.items()}
-            })
+            }
+            if top is None:
+                result.append(match)
+            else:
+                # keep the best top matches in a min-heap, earlier files win ties
+                entry = (common_confidence, balance_confidence, -file_id, match)
+                if len(result) < top:
+                    heapq.heappush(result, entry)
+                elif entry[:3] > result[0][:3]:
+                    heapq.heapreplace(result, entry)
+    if top is not None:
+        # best match first
+        result = [z[3] for z in sorted(result, key=lambda z: z[:3], reverse=True)]
     return result
 
-def create_database() -> List[IRDBFile]:
-    res = []
-    for ir in glob(DB_FILES, recursive=True):
-        if not SILENT_MODE: print("[DB] Loading", ir)
-        irdb = IRDBFile(ir)
-        irdb.load()
-        res.append(irdb)
-    return res
+def audit(db: IRDB) -> list:
+    # all-pairs check of the database, only pairs found by MinHash/LSH are compared exactly
+    files = [{h: len(names) for h, names in data.hashes.items()} for data in db]
+    matches = find_near_duplicates(files, CONFIDENCE)
+    result = []
+    for cluster in clusters(len(db), matches):
+        members = set(cluster)
+        result.append({
+            "files": [db[z].path for z in cluster],
+            "matches": [{
+                "input": db[match.input].path,
+                "path": db[match.checked].path,
+                "confidence": match.common_confidence,
+                "balance": {"confidence": match.balance_confidence},
+                "jaccard": match.jaccard,
+            } for match in matches if match.input in members],
+        })
+    return result
 
-if __name__ == "__main__":
-    if not SILENT_MODE: print("[db] Reading database ...")
-    db = create_database()
-    if not SILENT_MODE: 
-        print("  [db] done!")
-        print()
+def run_daemon(db: IRDB) -> None:
+    # keep the database loaded and answer the requests of --client
+    def handle(req: dict) -> dict:
+        return {"result": [check(db, resolve_path(req["cwd"], file), req.get("top")) for file in req["files"]]}
 
+    serve(db, handle, DAEMON_ADDRESS)
+
+if __name__ == "__main__":
     input_files = []
-    for arg in sys.argv[1:]:
-        if arg.startswith("glob:"):
+    fuzzy = False
+    use_cache = True
+    serve_mode = False
+    client_mode = False
+    audit_mode = False
+    jobs = 1
+    top = None
+    ndjson = False
+    args = iter(sys.argv[1:])
+    for arg in args:
+        if arg == "--audit":
+            # find near-duplicates between all files of the database
+            audit_mode = True
+        elif arg == "--fuzzy":
+            # also match raw signals with slightly different timings
+            fuzzy = True
+        elif arg == "--serve":
+            # keep the database loaded, see --client
+            serve_mode = True
+        elif arg == "--client":
+            # send the input files to a running --serve instance
+            client_mode = True
+        elif arg == "--jobs":
+            # check the input files in N forked processes (0 = all cores)
+            jobs = int(next(args))
+        elif arg.startswith("--jobs="):
+            jobs = int(arg[7:])
+        elif arg == "--top":
+            # only keep the K best matches of every input file
+            top = int(next(args))
+        elif arg.startswith("--top="):
+            top = int(arg[6:])
+        elif arg == "--ndjson":
+            # print one line per input file as soon as it is checked
+            ndjson = True
+        elif arg == "--decode":
+            # compare raw signals of known protocols as parsed signals
+            DECODE_RAW = True
+        elif arg == "--no-cache":
+            # parse every database file again
+            use_cache = False
+        elif arg.startswith("glob:"):
             input_files.extend(glob(arg[5:], recursive=True))
         elif arg.startswith("file:"):
             with open(arg[5:], "r") as fd:
@@ -128,7 +203,39 @@ if __name__ == "__main__":
         else:
             input_files.append(arg)
 
+    if top is not None and top < 1:
+        raise Exception(f"--top has to be at least 1 (got {top})")
+
+    if client_mode:
+        res = request({"files": input_files, "top": top}, DAEMON_ADDRESS)
+        if ndjson:
+            for file, result in zip(input_files, res["result"]):
+                print(json.dumps({"path": file, "matches": result}))
+        else:
+            print(json.dumps(dict(zip(input_files, res["result"])), indent=4))
+        sys.exit(0)
+
+    if not SILENT_MODE: print("[db] Reading database ...")
+    db = IRDB(DB_FILES, workers=WORKERS, decode_raw=DECODE_RAW, snapshot_file=SNAPSHOT_FILE, use_cache=use_cache,
+              fuzzy_index=FuzzyIndex() if fuzzy else None, verbose=not SILENT_MODE)
+    if serve_mode:
+        run_daemon(db)
+        sys.exit(0)
+    db.load()
+    if audit_mode:
+        print(json.dumps(audit(db), indent=4))
+        sys.exit(0)
+    if not SILENT_MODE: 
+        print("  [db] done!")
+        print()
+
     fat = {}
-    for file in input_files:
-        fat[file] = check(db, file)
-    print(json.dumps(fat, indent=4))
+    # with --jobs the files are checked in forked workers sharing the database
+    results = fork_imap(lambda file: check(db, file, top), input_files, jobs)
+    for file, result in zip(input_files, results):
+        if ndjson:
+            print(json.dumps({"path": file, "matches": result}), flush=True)
+        else:
+            fat[file] = result
+    if not ndjson:
+        print(json.dumps(fat, indent=4))
@@ -0,0 +1,70 @@
+import sys
+sys.path.insert(0, '..') # ugly ass hack :/
+
+import json
+
+from fsc.flipper_format.family import FamilyClusterer
+from fsc.flipper_format.irdb import IRDB
+
+####################################################################################################
+
+DB_FILES = "Flipper-IRDB-official/**/*.ir"
+WORKERS = 0 # parse the database using all cores
+USE_CACHE = True # only parse files which changed since the last run (--no-cache)
+DECODE_RAW = False # store raw signals of known protocols as parsed signals (--decode)
+# compile with: python -m fsc.flipper_format.snapshot "<DB_FILES>" irdb.snap
+SNAPSHOT_FILE = None # e.g. "irdb.snap"
+MIN_OVERLAP = 1 # identical signals two files need to share to be in the same family
+MAX_HOLDERS = 256 # with MIN_OVERLAP > 1, signals contained in more files are not counted
+CORE_SHARE = 0.5 # a core signal is contained in at least 50 % of the members
+OUTLIER_SHARE = 0.5 # an outlier contains less than 50 % of the core signals
+MAX_PRINT_COUNT = 10
+
+####################################################################################################
+
+if __name__ == "__main__":
+    as_json = False
+    min_overlap = MIN_OVERLAP
+    for arg in sys.argv[1:]:
+        if arg == "--json":
+            as_json = True
+        elif arg == "--decode":
+            DECODE_RAW = True
+        elif arg == "--no-cache":
+            # parse every database file again
+            USE_CACHE = False
+        elif arg.startswith("--min-overlap="):
+            min_overlap = int(arg[14:])
+        else:
+            DB_FILES = arg
+
+    db = IRDB(DB_FILES, workers=WORKERS, decode_raw=DECODE_RAW, snapshot_file=SNAPSHOT_FILE, use_cache=USE_CACHE)
+    clusterer = FamilyClusterer(min_overlap, MAX_HOLDERS)
+    # the files are streamed into the clusterer, the database itself is never loaded
+    for path, signals in db.iter_files():
+        clusterer.add_file(path, signals)
+    families = clusterer.families(CORE_SHARE, OUTLIER_SHARE)
+
+    if as_json:
+        print(json.dumps([{
+            "files": family.files,
+            "signals": family.signals,
+            "core": [{"name": z.name, "files": z.files} for z in family.core],
+            "outliers": family.outliers,
+        } for family in families], indent=4))
+        sys.exit(0)
+
+    print(f"# {len(families)} families in {len(clusterer)} files (min. overlap: {min_overlap})")
+    for i, family in enumerate(families):
+        print()
+        print(f"## Family {i + 1} ({len(family.files)} files, {family.signals} signals)")
+        print()
+        print("```")
+        for path in family.files[:MAX_PRINT_COUNT]:
+            print(f"{'!' if path in family.outliers else '○'} {path}")
+        if len(family.files) > MAX_PRINT_COUNT:
+            print("└─ ... and", len(family.files) - MAX_PRINT_COUNT, "more files ...")
+        print()
+        print(f"core: {', '.join(f'{z.name} ({z.files})' for z in family.core[:MAX_PRINT_COUNT]) or '-'}")
+        print(f"outliers: {len(family.outliers)}")
+        print("```")
@@ -1,38 +1,50 @@
+import sys
+sys.path.insert(0, '..') # ugly ass hack :/
+
 from glob import glob
 import re
 
+from fsc.flipper_format.rewrite import rewrite_files, rules_digest
+
 space = re.compile("\\s+")
 freq_min = 10_000
 freq_max = 56_000
+workers = 0 # rewrite the files using all cores
 
-for file_name in glob("Flipper-IRDB/**/*.ir", recursive=True):
+def fix_content(content: str) -> str:
     output = []
-    with open(file_name, "r") as fd:
-        for line in fd.readlines():
-            line = line.rstrip('\r\n')
-
-            # some weird ass line or comment
-            if line.startswith("#") or ':' not in line:
-                output.append(line)
-                continue
-
-            # extract key and value from line
-            col = line.index(":")
-            key = line[:col]
-            value = line[col+1:].strip()
-
-            if line.startswith("frequency:"):
-                freq = int(value)
-                output.append(f"{key}: {min(freq_max, max(freq_min, freq))}")
-            elif line.startswith("data:"):
-                packs = []
-                for pack in space.split(value):
-                    packs.append(abs(int(pack)))
-                value = ' '.join(str(z) for z in packs)
-                output.append(f"{key}: {value}")
-            else:
-                output.append(line)
-
-    # write output
-    with open(file_name, "w") as fd:
-        fd.write('\n'.join(output) + '\n')
\ No newline at end of file
+    lines = content.split('\n')
+    if lines[-1] == '':
+        lines.pop()
+    for line in lines:
+        line = line.rstrip('\r\n')
+
+        # some weird ass line or comment
+        if line.startswith("#") or ':' not in line:
+            output.append(line)
+            continue
+
+        # extract key and value from line
+        col = line.index(":")
+        key = line[:col]
+        value = line[col+1:].strip()
+
+        if line.startswith("frequency:"):
+            freq = int(value)
+            output.append(f"{key}: {min(freq_max, max(freq_min, freq))}")
+        elif line.startswith("data:"):
+            packs = []
+            for pack in space.split(value):
+                packs.append(abs(int(pack)))
+            value = ' '.join(str(z) for z in packs)
+            output.append(f"{key}: {value}")
+        else:
+            output.append(line)
+    return '\n'.join(output) + '\n'
+
+if __name__ == "__main__":
+    # files are only written if something changed,
+    # files which are already fixed are skipped until they change (or the range changes)
+    results = rewrite_files(glob("Flipper-IRDB/**/*.ir", recursive=True), fix_content,
+                            rules=rules_digest("fix_frequency_range", 1, freq_min, freq_max), workers=workers)
+    print(f"fixed {sum(1 for z in results if z.changed)} of {len(results)} files")
\ No newline at end of file
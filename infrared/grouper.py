@@ -3,8 +3,8 @@
 import sys
 sys.path.insert(0, '..') # ugly ass hack :/
 
-from fsc.flipper_format.base import FlipperFormat
-from fsc.flipper_format.infrared import read_ir
+from fsc.flipper_format.base import FlipperFormat, FlipperFormatWriter
+from fsc.flipper_format.infrared import read_ir, write_signal
 
 if __name__ == "__main__":
     groups = {}
@@ -33,16 +33,17 @@ if __name__ == "__main__":
                 groups[group_name] = []
             groups[group_name].append(signal)
 
-    with open(f"{file}-grouped.ir", "w+") as fd:
+    with FlipperFormatWriter(f"{file}-grouped.ir") as ffw:
         for group in sorted(groups.keys()):
             print("writing group", group)
-            fd.write(f"# section {group} start\n")
+            ffw.write_comment(f"section {group} start")
             for signal in groups[group]:
-                fd.write('#\n')
+                ffw.write_comment()
                 if signal.get_last_comment() is not None and signal.get_last_comment().strip() != "":
-                    fd.write(f'# {signal.get_last_comment()}\n')
-                fd.write(str(signal))
-                fd.write('\n')
-            fd.write(f"#\n# / section {group} end\n#\n")
+                    ffw.write_comment(signal.get_last_comment())
+                write_signal(ffw, signal)
+            ffw.write_comment()
+            ffw.write_comment(f"/ section {group} end")
+            ffw.write_comment()
 
     print(groups.keys())
\ No newline at end of file
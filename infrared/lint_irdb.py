@@ -0,0 +1,71 @@
+import sys
+sys.path.insert(0, '..') # ugly ass hack :/
+
+import json
+import os
+
+from glob import glob
+
+from fsc.flipper_format.lint import format_diagnostic, lint_files, to_json, to_ndjson
+
+####################################################################################################
+
+INPUT_FILES = "Flipper-IRDB/**/*.ir"
+JOBS = 0 # lint the files using all cores
+
+####################################################################################################
+
+if __name__ == "__main__":
+    input_files = []
+    output = "text" # or json, ndjson
+    warnings = True
+    args = iter(sys.argv[1:])
+    for arg in args:
+        if arg == "--json":
+            # one json object with the diagnostics of every file
+            output = "json"
+        elif arg == "--ndjson":
+            # one json line per diagnostic, printed as soon as the file is checked
+            output = "ndjson"
+        elif arg == "--no-warnings":
+            warnings = False
+        elif arg == "--jobs":
+            # lint the files in N forked processes (0 = all cores)
+            JOBS = int(next(args))
+        elif arg.startswith("--jobs="):
+            JOBS = int(arg[7:])
+        elif arg.startswith("glob:"):
+            input_files.extend(glob(arg[5:], recursive=True))
+        elif arg.startswith("file:"):
+            with open(arg[5:], "r") as fd:
+                input_files.extend([z.strip() for z in fd.readlines()])
+        else:
+            input_files.append(arg)
+    if not input_files:
+        input_files = glob(INPUT_FILES, recursive=True)
+
+    errors = 0
+    res = []
+    try:
+        for result in lint_files(sorted(input_files), JOBS):
+            errors += len(result.errors)
+            if not warnings:
+                result = result._replace(diagnostics=result.errors)
+            if output == "json":
+                if result.diagnostics:
+                    res.append(to_json(result))
+            elif output == "ndjson":
+                for line in to_ndjson(result):
+                    print(line, flush=True)
+            else:
+                for d in result.diagnostics:
+                    print(format_diagnostic(result.path, d))
+        if output == "json":
+            print(json.dumps(res, indent=4))
+    except BrokenPipeError:
+        # the reader went away (e.g. | head), stdout goes to devnull so the last flush at exit doesn't fail
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        sys.exit(1)
+
+    # fail the ci run if a file has errors
+    sys.exit(1 if errors else 0)
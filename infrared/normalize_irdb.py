@@ -0,0 +1,56 @@
+import sys
+sys.path.insert(0, '..') # ugly ass hack :/
+
+import json
+
+from glob import glob
+
+from fsc.flipper_format.pipeline import Pipeline
+
+####################################################################################################
+
+INPUT_FILES = "Flipper-IRDB/**/*.ir"
+WORKERS = 0 # rewrite the files using all cores
+DRY_RUN = False # only print what would be changed
+
+# stages run in this order over every file, see fsc/flipper_format/pipeline.py.
+# a json file with the same structure can be passed with config:pipeline.json
+PIPELINE = [
+    # fix_frequency_range.py
+    {"stage": "clamp_frequency", "freq_min": 10_000, "freq_max": 56_000},
+    {"stage": "fix_negative_timings"},
+    # rewrite_signal_names_to_ofw.py
+    {"stage": "rename", "normalize": "lower", "rules": {
+        "Power": ["power", "pwr", "/^((power|pwr)[_\\s]*)?(toggle|on|off)$/", "/^(turn[_\\s]*)?(on|off)$/"],
+        "Vol_dn": ["/^vol(ume)?[_\\s]*(d(o?w)?n|[v\\-])$/"],
+        "Vol_up": ["/^vol(ume)?[_\\s]*(up|[\\^+])$/"],
+        "Ch_next": ["/^ch(an(nel)?)?[_\\s]*(up|[\\^+])$/"],
+        "Ch_prev": ["/^ch(an(nel)?)?[_\\s]*(d(o?w)?n|[\\v-])$/"],
+        "Mute": ["mte", "/^mute.*$/"],
+    }},
+    # all.py
+    {"stage": "dedupe"},
+]
+
+####################################################################################################
+
+if __name__ == "__main__":
+    config = PIPELINE
+    for arg in sys.argv[1:]:
+        if arg.startswith("config:"):
+            with open(arg[len("config:"):], "r") as fd:
+                config = json.load(fd)
+        elif arg.startswith("glob:"):
+            INPUT_FILES = arg[len("glob:"):]
+        elif arg == "--dry-run":
+            DRY_RUN = True
+        else:
+            raise Exception(f"unknown argument '{arg}'")
+
+    pipeline = Pipeline.from_config(config)
+    results = pipeline.run(glob(INPUT_FILES, recursive=True), workers=WORKERS, dry_run=DRY_RUN)
+    for result in results:
+        if result.changed:
+            print("would rewrite" if DRY_RUN else "rewrote", result.path)
+    print(f"{sum(1 for z in results if z.changed)} of {len(results)} files changed, "
+          f"{sum(1 for z in results if z.skipped)} already up to date")
@@ -1,11 +1,20 @@
+import sys
+sys.path.insert(0, '..') # ugly ass hack :/
+
+import io
+
 from glob import glob
-from re import compile, Pattern
+from re import compile
+
+from fsc.flipper_format.names import NameMatcher
+from fsc.flipper_format.rewrite import rewrite_files, rules_digest
 
 # glob pattern - rewrite which files
 INPUT_FILES: str = "Flipper-IRDB/Audio_Receivers/**/*.ir"
+WORKERS: int = 0 # rewrite the files using all cores
 
 # manually overwrite some names
-rewrite_internal = {v: k for k, u in {
+rewrite_internal = {
     "Power": [
         "power",
         "pwr",
@@ -28,46 +37,37 @@ rewrite_internal = {v: k for k, u in {
         "mte",
         compile("^mute.*$")
     ]
-}.items() for v in u}
+}
 
-for file_name in glob(INPUT_FILES, recursive=True):
-    output = ""
-    count = 0
-    with open(file_name, "r") as fd:
-        for line in fd.readlines():
-            # only target {name: value} key pairs
-            if not line.startswith("name:"):
-                output += line
-                continue
-
-            # extract key and value from line
-            col = line.index(":")
-            key = line[:col+1]
-            value = line[col+1:].strip()
+# names are compared in lower case
+matcher = NameMatcher({k: [z.lower() if isinstance(z, str) else z for z in u] for k, u in rewrite_internal.items()},
+                      normalize=str.lower)
 
-            new_value = None
-            for k in rewrite_internal:
-                if type(k) == str:
-                    if value.lower() == k.lower():
-                        new_value = rewrite_internal[k]
-                        break
-                if type(k) == Pattern:
-                    if k.match(value.lower()):
-                        new_value = rewrite_internal[k]
-                        break
+def rewrite_content(content: str) -> str:
+    output = ""
+    for line in io.StringIO(content).readlines():
+        # only target {name: value} key pairs
+        if not line.startswith("name:"):
+            output += line
+            continue
 
-            if new_value is None:
-                new_value = value
-                # transform value
-                # new_value = value[:1].upper() + value[1:].lower()
-                # new_value = new_value.replace(' ', "_")
+        # extract key and value from line
+        col = line.index(":")
+        key = line[:col+1]
+        value = line[col+1:].strip()
 
-            output += f"name: {new_value}\n"
-            if new_value != value:
-                count += 1
+        new_value = matcher.match(value)
+        if new_value is None:
+            new_value = value
+            # transform value
+            # new_value = value[:1].upper() + value[1:].lower()
+            # new_value = new_value.replace(' ', "_")
 
-    # write output
-    with open(file_name, "w") as fd:
-        fd.write(output)
+        output += f"name: {new_value}\n"
+    return output
 
-    # print("Wrote", file_name, "with", count, "transformed values")
\ No newline at end of file
+if __name__ == "__main__":
+    # files are only written if a name changed
+    results = rewrite_files(glob(INPUT_FILES, recursive=True), rewrite_content,
+                            rules=rules_digest("rewrite_signal_names_to_ofw", 1, rewrite_internal), workers=WORKERS)
+    print("Rewrote", sum(1 for z in results if z.changed), "of", len(results), "files")
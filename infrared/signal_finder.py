@@ -15,97 +15,170 @@ command: 00 02 00 00
 import sys
 sys.path.insert(0, '..') # ugly ass hack :/
 
-import math
+import json
 
 from glob import glob
-from typing import List, Union
+from typing import Dict, List, Union
 
-from fsc.flipper_format.base import FlipperFormat
 from fsc.flipper_format.infrared import RawSignal, ParsedSignal
 
-from fsc.flipper_format.infrared import read_ir
+from fsc.flipper_format.daemon import request, resolve_path
+from fsc.flipper_format.decoder import decode_all
+from fsc.flipper_format.fuzzy import FuzzyIndex
+from fsc.flipper_format.irdb import IRDB, IRDBFile, serve
+from fsc.flipper_format.lazy import LazyIRReader
 
 ####################################################################################################
 
 DB_FILES = "Flipper-IRDB*/**/*.ir"
 SILENT_MODE = False
+WORKERS = 0 # parse the database using all cores
+DECODE_RAW = False # store raw signals of known protocols as parsed signals (--decode)
+# compile with: python -m fsc.flipper_format.snapshot "<DB_FILES>" irdb.snap
+SNAPSHOT_FILE = None # e.g. "irdb.snap"
+# address of the --serve daemon
+DAEMON_ADDRESS = ("127.0.0.1", 8463)
 
 ####################################################################################################
 
-class IRDBFile:
-    def __init__(self, path) -> None:
-        self.path = path
-        self.hashes = {}
-        self.count = 0
-
-    def load(self):
-        # load signal hashes
-        with FlipperFormat(self.path) as fff:
-            signals = read_ir(fff)
-            for signal in signals:
-                self.count += 1
-                h = hash(signal)
-                if h not in self.hashes:
-                    self.hashes[h] = []
-                self.hashes[h].append(signal)
-
 class SignalMatch:
     def __init__(self, file: IRDBFile, h: int) -> None:
         self.file = file
         self.hash = h
 
-    def get_signals(self) -> List[Union[RawSignal, ParsedSignal]]:
+    def get_names(self) -> List[str]:
         return self.file.hashes[self.hash]
 
     def __str__(self) -> str:
-        return f"# Found in {self.file.path}: {', '.join([s.name for s in self.get_signals()])}"
+        return f"# Found in {self.file.path}: {', '.join(self.get_names())}"
         
 
-def create_database() -> List[IRDBFile]:
-    res = []
-    for ir in glob(DB_FILES, recursive=True):
-        if not SILENT_MODE: print("[DB] Loading", ir)
-        irdb = IRDBFile(ir)
-        irdb.load()
-        res.append(irdb)
-    return res
-
 ####################################################################################################
 
-def check_signal_hash(db: List[IRDBFile], h) -> List[SignalMatch]:
-    return [SignalMatch(d, h) for d in db if h in d.hashes]
-
+def check_signal_hash(db: IRDB, h) -> List[SignalMatch]:
+    return [SignalMatch(db[z], h) for z in db.index.lookup(h)]
 
-def check(db: List[IRDBFile], path: str) -> None:
-    source = IRDBFile(path)
-    source.load()
+class SignalResult:
+    def __init__(self, signal: Union[RawSignal, ParsedSignal], matches: List[SignalMatch], similar: list) -> None:
+        self.signal = signal
+        self.matches = matches
+        # [((db path, db signal hash), score)]
+        self.similar = similar
 
-    for h, sig in source.hashes.items():
-        if len(sig) <= 0:
+def query_signals(db: IRDB, signals) -> List[SignalResult]:
+    """
+    looks up every distinct signal (in the order of their first occurrence)
+    """
+    res = []
+    seen = set()
+    for signal in signals:
+        h = signal.digest()
+        if h in seen:
             continue
+        seen.add(h)
         matches = check_signal_hash(db, h)
-        
-        print("\n# ---")
+
+        # look for raw signals with slightly different timings
+        similar = []
+        if len(matches) == 0 and db.fuzzy_index is not None and signal.is_raw:
+            similar = db.fuzzy_index.query(signal)
+        res.append(SignalResult(signal, matches, similar))
+    return res
+
+def query_files(db: IRDB, paths: List[str]) -> Dict[str, List[SignalResult]]:
+    """
+    looks up the signals of all given files, grouped by input file:
+    { input path -> [SignalResult] }
+    """
+    res = {}
+    for path in paths:
+        with LazyIRReader(path) as reader:
+            signals = decode_all(reader) if db.decode_raw else reader
+            res[path] = query_signals(db, signals)
+    return res
+
+def similar_names(db: IRDB, similar_path: str, similar_hash: bytes) -> List[str]:
+    return db[db.index.ids[similar_path]].hashes[similar_hash]
+
+def format_text(db: IRDB, results: List[SignalResult]) -> str:
+    lines = []
+    for result in results:
+        lines.append("\n# ---")
 
         # print matches
-        if len(matches) == 0:
-            print("# [x] Not in IRDB")
+        if len(result.matches) == 0 and len(result.similar) == 0:
+            lines.append("# [x] Not in IRDB")
         else:
-            for match in matches:
-                print(str(match))
+            for match in result.matches:
+                lines.append(str(match))
+            for (similar_path, similar_hash), score in result.similar:
+                names = similar_names(db, similar_path, similar_hash)
+                lines.append(f"# Similar in {similar_path} ({round(score * 100)} %): {', '.join(names)}")
 
         # print signal
-        print(str(sig[0]))
-        print('# ---\n')
+        lines.append(str(result.signal))
+        lines.append('# ---\n')
+    return "\n".join(lines)
+
+def to_json(db: IRDB, results: Dict[str, List[SignalResult]]) -> dict:
+    return {path: [{
+        "signal": result.signal.to_obj(),
+        "found": [{
+            "path": match.file.path,
+            "names": match.get_names(),
+        } for match in result.matches],
+        "similar": [{
+            "path": similar_path,
+            "score": score,
+            "names": similar_names(db, similar_path, similar_hash),
+        } for (similar_path, similar_hash), score in result.similar],
+    } for result in file_results] for path, file_results in results.items()}
+
+def check(db: IRDB, path: str) -> None:
+    text = format_text(db, query_files(db, [path])[path])
+    if text:
+        print(text)
+
+def run_daemon(db: IRDB) -> None:
+    # keep the database loaded and answer the requests of --client
+    def handle(req: dict) -> dict:
+        files = [resolve_path(req["cwd"], z) for z in req["files"]]
+        if req.get("json"):
+            print(json.dumps(to_json(db, query_files(db, files)), indent=4))
+        else:
+            for file in files:
+                check(db, file)
 
-if __name__ == "__main__":
-    if not SILENT_MODE: print("[db] Reading database ...")
-    db = create_database()
-    if not SILENT_MODE: print("  [db] done!\n")
+    serve(db, handle, DAEMON_ADDRESS)
 
+if __name__ == "__main__":
     input_files = []
+    fuzzy = False
+    use_cache = True
+    serve_mode = False
+    client_mode = False
+    as_json = False
     for arg in sys.argv[1:]:
-        if arg.startswith("glob:"):
+        if arg == "--json":
+            # print all results as one json document
+            as_json = True
+            SILENT_MODE = True
+        elif arg == "--fuzzy":
+            # also match raw signals with slightly different timings
+            fuzzy = True
+        elif arg == "--serve":
+            # keep the database loaded, see --client
+            serve_mode = True
+        elif arg == "--client":
+            # send the input files to a running --serve instance
+            client_mode = True
+        elif arg == "--decode":
+            # compare raw signals of known protocols as parsed signals
+            DECODE_RAW = True
+        elif arg == "--no-cache":
+            # parse every database file again
+            use_cache = False
+        elif arg.startswith("glob:"):
             input_files.extend(glob(arg[5:], recursive=True))
         elif arg.startswith("file:"):
             with open(arg[5:], "r") as fd:
@@ -113,5 +186,22 @@ if __name__ == "__main__":
         else:
             input_files.append(arg)
 
-    for file in input_files:
-        check(db, file)
+    if client_mode:
+        res = request({"files": input_files, "json": as_json}, DAEMON_ADDRESS)
+        sys.stdout.write(res["output"])
+        sys.exit(0)
+
+    if not SILENT_MODE: print("[db] Reading database ...")
+    db = IRDB(DB_FILES, workers=WORKERS, decode_raw=DECODE_RAW, snapshot_file=SNAPSHOT_FILE, use_cache=use_cache,
+              fuzzy_index=FuzzyIndex() if fuzzy else None, verbose=not SILENT_MODE)
+    if serve_mode:
+        run_daemon(db)
+        sys.exit(0)
+    db.load()
+    if not SILENT_MODE: print("  [db] done!\n")
+
+    if as_json:
+        print(json.dumps(to_json(db, query_files(db, input_files)), indent=4))
+    else:
+        for file in input_files:
+            check(db, file)
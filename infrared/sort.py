@@ -8,12 +8,25 @@ from fsc.flipper_format.bulk import parse_all_ir_unique, write_all_ir_ir, write_
 INPUT_FILES = "_Converted_/**/*.ir"
 OUTPUT_FILE = "sorted_ir"
 ORDER = "ASC" # or DESC
+WORKERS = 0 # parse the input files using all cores
+USE_CACHE = True # only parse files which changed since the last run (--no-cache)
+DECODE_RAW = False # merge raw signals of known protocols with their parsed equivalent (--decode)
 
 ####################################################################################################
 
 if __name__ == "__main__":
+    for arg in sys.argv[1:]:
+        if arg == "--decode":
+            DECODE_RAW = True
+        elif arg == "--no-cache":
+            # parse every input file again
+            USE_CACHE = False
+        else:
+            raise Exception(f"unknown argument '{arg}'")
+
     # parse .ir files, convert to list and order by name
-    all = [v for _, v in parse_all_ir_unique(INPUT_FILES).items()]
+    all = [v for _, v in parse_all_ir_unique(INPUT_FILES, workers=WORKERS, decode_raw=DECODE_RAW,
+                                             use_cache=USE_CACHE).items()]
     all.sort(key=lambda x: x.get_name(), reverse=ORDER == "DESC")
 
     # write to file
@@ -4,10 +4,10 @@ sys.path.insert(0, '..') # ugly ass hack :/
 import json
 import os
 
-from glob import glob
-
-from fsc.flipper_format.base import FlipperFormat
-from fsc.flipper_format.infrared import read_ir
+from fsc.flipper_format.base import FlipperFormatWriter
+from fsc.flipper_format.bulk import iter_all_ir
+from fsc.flipper_format.infrared import IR_FILETYPE, IR_VERSION, write_signal
+from fsc.flipper_format.names import NameMatcher
 
 ####################################################################################################
 
@@ -30,54 +30,74 @@ else:
 INPUT_FILES = "Flipper-IRDB/TVs/**/*.ir"
 OUTPUT_FILE = "output_universal_tv.ir"
 WRITE_SOURCE = True
+WRITE_HEADER = False # start the file with "Filetype: IR signals file" / "Version: 1"
+DATA_PER_LINE = 0 # wrap raw data: into lines of this many timings (e.g. MAX_DATA_PER_LINE), 0 = no wrapping
+WORKERS = 0 # parse the input files using all cores
+USE_CACHE = True # only parse files which changed since the last run (--no-cache)
+DECODE_RAW = False # merge raw signals of known protocols with their parsed equivalent (--decode)
 
 ####################################################################################################
 
-# transform accepted signal names to a dict
-# with the original name as key and the accepted name as value
-accepted = {iv.strip().lower(): ok for ok, ov in ACCEPTED_SIGNAL_NAMES.items() for iv in ov}
-
-# keep track of how many signals were written
-count = 0
-
-# keep track of how many duplicates were skipped
-added = {}
-
-with open(OUTPUT_FILE, "w") as fd:
-    for file_name in glob(INPUT_FILES, recursive=True):
-        file_count = 0
-        file_skip_count = 0
-
-        # skip output file
-        if file_name == OUTPUT_FILE:
-            print("oh oh!")
-            continue
+# compile the accepted signal names,
+# the original name is matched case-insensitive and resolves to the accepted name
+accepted = NameMatcher({ok: [iv.strip().lower() for iv in ov] for ok, ov in ACCEPTED_SIGNAL_NAMES.items()},
+                       normalize=lambda z: z.strip().lower())
+
+if __name__ == "__main__":
+    for arg in sys.argv[1:]:
+        if arg == "--decode":
+            DECODE_RAW = True
+        elif arg == "--no-cache":
+            # parse every input file again
+            USE_CACHE = False
+        else:
+            raise Exception(f"unknown argument '{arg}'")
+
+    # keep track of how many signals were written
+    count = 0
+
+    # keep track of how many duplicates were skipped
+    added = {}
+
+    with FlipperFormatWriter(OUTPUT_FILE) as ffw:
+        if WRITE_HEADER:
+            ffw.write_header(IR_FILETYPE, IR_VERSION)
+            ffw.write_comment()
+
+        for file_name, signals in iter_all_ir(INPUT_FILES, workers=WORKERS, decode_raw=DECODE_RAW, use_cache=USE_CACHE):
+            file_count = 0
+            file_skip_count = 0
+
+            # skip output file
+            if file_name == OUTPUT_FILE:
+                print("oh oh!")
+                continue
         
-        # read signals from file
-        with FlipperFormat(file_name) as fff:
-            for signal in read_ir(fff):
+            # read signals from file
+            for signal in signals:
                 # check if signal name is accepted
-                original_name = signal.name.strip().lower()
-                if original_name not in accepted:
+                accepted_name = accepted.match(signal.name)
+                if accepted_name is None:
                     continue
-                
+            
                 # rewrite signal name to accepted name
-                signal.name = accepted[original_name]
+                signal.name = accepted_name
 
-                h = hash(signal)
+                h = signal.digest()
                 if h in added:
                     added[h] += 1
                     file_skip_count += 1
                     continue
                 added[h] = 0
-                
+            
                 # write source header above signal (if WRITE_SOURCE was enabled)
                 if WRITE_SOURCE:
-                    fd.write(f"# from: {file_name}\n#\n")
-                
+                    ffw.write_comment(f"from: {file_name}")
+                    ffw.write_comment()
+            
                 # write signal to file
-                fd.write(str(signal))
-                fd.write("\n#\n")
+                write_signal(ffw, signal, DATA_PER_LINE)
+                ffw.write_comment()
 
                 # update counters
                 count += 1; file_count += 1
@@ -85,5 +105,5 @@ with open(OUTPUT_FILE, "w") as fd:
             # print summary for current file
             print(f"[local] Wrote {file_count} [skipped: {file_skip_count}] signals from {file_name} to {OUTPUT_FILE}")
 
-print(f"[global] Wrote a total of {count} signals to {OUTPUT_FILE}")
-print(f"[global] Skipped a total of {sum([z for z in added.values() if z > 1])} duplicates")
+    print(f"[global] Wrote a total of {count} signals to {OUTPUT_FILE}")
+    print(f"[global] Skipped a total of {sum([z for z in added.values() if z > 1])} duplicates")
@@ -0,0 +1,63 @@
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..")) # same hack as the scripts
+
+import pytest
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    # never touch the parse cache of the user
+    path = tmp_path / "cache"
+    monkeypatch.setenv("FSC_CACHE_DIR", str(path))
+    return path
+
+TV = """Filetype: IR signals file
+Version: 1
+#
+# captured from the remote
+name: Power
+type: parsed
+protocol: NEC
+address: 04 00 00 00
+command: 08 00 00 00
+#
+name: Vol_up
+type: raw
+frequency: 38000
+duty_cycle: 0.330000
+data: 9000 4500 560 560 560 1690
+data: 560 1690 560
+#
+name: Mute
+type: parsed
+protocol: Samsung32
+address: 07 07
+command: 0F 00 00 00
+"""
+
+AC = """Filetype: IR signals file
+Version: 1
+#
+name: Off
+type: raw
+frequency: 36000
+duty_cycle: 0.5
+data: 3000 1500 400 1100 400 400 400
+#
+name: Power
+type: parsed
+protocol: NEC
+address: 04 00 00 00
+command: 08 00 00 00
+"""
+
+@pytest.fixture
+def ir_tree(tmp_path):
+    """
+    a small IRDB with raw and parsed signals, returns the glob pattern of its files
+    """
+    root = tmp_path / "irdb"
+    for path, content in [("TVs/Brand/TV.ir", TV), ("ACs/Brand/AC.ir", AC)]:
+        (root / path).parent.mkdir(parents=True, exist_ok=True)
+        (root / path).write_text(content)
+    return str(root / "**" / "*.ir")
@@ -0,0 +1,78 @@
+import os
+
+from glob import glob
+
+from fsc.flipper_format import bulk, cache
+from fsc.flipper_format.bulk import iter_all_ir, iter_all_ir_digests
+from fsc.flipper_format.cache import ParseCache
+
+def parsed_files(monkeypatch) -> list:
+    # records every file which is parsed instead of loaded from the cache
+    parsed = []
+    parse = bulk._parse_file
+    monkeypatch.setattr(bulk, "_parse_file", lambda args: parsed.append(os.path.basename(args[0])) or parse(args))
+    return parsed
+
+def names(pattern: str) -> dict:
+    return {os.path.basename(path): [z.name for z in signals] for path, signals in iter_all_ir(pattern)}
+
+def test_unchanged_files_are_cached(ir_tree, monkeypatch):
+    parsed = parsed_files(monkeypatch)
+    first = names(ir_tree)
+    assert sorted(parsed) == ["AC.ir", "TV.ir"]
+    parsed.clear()
+    assert names(ir_tree) == first
+    assert parsed == []
+
+def test_changed_file_is_parsed_again(ir_tree, monkeypatch):
+    parsed = parsed_files(monkeypatch)
+    names(ir_tree)
+    parsed.clear()
+    ac = [z for z in glob(ir_tree, recursive=True) if z.endswith("AC.ir")][0]
+    with open(ac, "r") as f:
+        content = f.read()
+    with open(ac, "w") as f:
+        f.write(content.replace("name: Off", "name: Aus"))
+    assert names(ir_tree)["AC.ir"] == ["Aus", "Power"]
+    assert parsed == ["AC.ir"]
+
+def test_touched_file_is_parsed_again(ir_tree, monkeypatch):
+    # same size, only the modification time changed
+    parsed = parsed_files(monkeypatch)
+    names(ir_tree)
+    parsed.clear()
+    tv = [z for z in glob(ir_tree, recursive=True) if z.endswith("TV.ir")][0]
+    st = os.stat(tv)
+    os.utime(tv, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    names(ir_tree)
+    assert parsed == ["TV.ir"]
+
+def test_parser_version(ir_tree, monkeypatch):
+    file_name = glob(ir_tree, recursive=True)[0]
+    with ParseCache() as c:
+        c.put(file_name, "", [("x",)])
+        assert c.is_fresh(file_name)
+    # entries of another parser (e.g. after an update of infrared.py) are stale
+    monkeypatch.setattr(cache, "parser_version", lambda: 1)
+    with ParseCache() as c:
+        assert not c.is_fresh(file_name)
+        assert c.get(file_name) is None
+
+def test_broken_entry(ir_tree):
+    file_name = glob(ir_tree, recursive=True)[0]
+    with ParseCache() as c:
+        c.put(file_name, "", [])
+        c.db.execute("UPDATE files SET signals = ?", ("not json",))
+    with ParseCache() as c:
+        assert c.get(file_name) is None
+    # the file is simply parsed again
+    assert len(dict(iter_all_ir(ir_tree))) == 2
+
+def test_variants(ir_tree):
+    # digests and decoded signals are cached separately from the signals
+    signals = dict(iter_all_ir(ir_tree))
+    digests = dict(iter_all_ir_digests(ir_tree))
+    assert {path: [(z.digest(), z.name) for z in s] for path, s in signals.items()} == digests
+    assert dict(iter_all_ir_digests(ir_tree)) == digests
+    decoded = [[z.to_obj() for z in s] for _, s in iter_all_ir(ir_tree, decode_raw=True)]
+    assert [[z.to_obj() for z in s] for _, s in iter_all_ir(ir_tree, decode_raw=True)] == decoded
@@ -0,0 +1,53 @@
+from array import array
+
+import pytest
+
+from fsc.flipper_format.decoder import decode_all, decode_signal
+from fsc.flipper_format.encoder import encode_signal
+from fsc.flipper_format.infrared import ParsedSignal, RawSignal
+
+# (protocol, address, command) which only the given protocol accepts
+CASES = [
+    ("NEC", 0x04, 0x08),
+    ("NECext", 0x1234, 0x5678),
+    ("Samsung32", 0x07, 0x02),
+    ("SIRC", 0x01, 0x15),
+    ("SIRC15", 0x1A, 0x15),
+    ("SIRC20", 0x1001, 0x15),
+    ("Kaseikyo", 0x022002, 0x20),
+    ("RC5", 0x01, 0x0C),
+    ("RC5X", 0x01, 0x4C),
+    ("RC6", 0x00, 0x0C),
+]
+
+def parsed(protocol: str, address: int, command: int) -> ParsedSignal:
+    return ParsedSignal("test.ir", "test", protocol, address.to_bytes(4, "little"), command.to_bytes(4, "little"))
+
+@pytest.mark.parametrize("protocol, address, command", CASES)
+@pytest.mark.parametrize("repeats", [0, 2])
+def test_round_trip(protocol, address, command, repeats):
+    signal = parsed(protocol, address, command)
+    decoded = decode_signal(encode_signal(signal, repeats))
+    assert not decoded.is_raw
+    assert decoded == signal
+    assert decoded.digest() == signal.digest()
+
+@pytest.mark.parametrize("protocol, address, command", CASES)
+def test_round_trip_with_jitter(protocol, address, command):
+    # captures are never exact, every timing is off by 10 %
+    raw = encode_signal(parsed(protocol, address, command))
+    raw.set_data([int(z * (1.1 if i % 3 else 0.9)) for i, z in enumerate(raw.data)])
+    assert decode_signal(raw) == parsed(protocol, address, command)
+
+def test_unknown_stays_raw():
+    raw = RawSignal("test.ir", "test", 38000, 0.33, array("i", [100, 200, 300]))
+    assert decode_signal(raw) is raw
+
+def test_decode_all_keeps_names_and_order():
+    a = encode_signal(parsed("NEC", 0x04, 0x08))
+    b = encode_signal(parsed("NEC", 0x04, 0x08))
+    b.set_name("other")
+    unknown = RawSignal("test.ir", "unknown", 38000, 0.33, array("i", [100, 200, 300]))
+    res = decode_all([a, unknown, b])
+    assert [z.name for z in res] == ["test", "unknown", "other"]
+    assert [z.is_raw for z in res] == [False, True, False]
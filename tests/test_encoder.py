@@ -0,0 +1,29 @@
+from fsc.flipper_format.encoder import encode, encode_signal
+from fsc.flipper_format.infrared import ParsedSignal
+
+def test_nec():
+    data = encode("NEC", 0x04, 0x08)
+    # leader, 32 bits (mark + space), stop mark
+    assert len(data) == 2 + 32 * 2 + 1
+    assert list(data[:2]) == [9000, 4500]
+    # address 0x04 is sent LSB first: 0, 0, 1, ...
+    assert list(data[2:8]) == [560, 560, 560, 560, 560, 1690]
+
+def test_nec_repeat():
+    data = encode("NEC", 0x04, 0x08, repeats=1)
+    frame = encode("NEC", 0x04, 0x08)
+    # the pause fills the frame period, then the NEC repeat code follows
+    assert list(data[len(frame):]) == [108000 - sum(frame), 9000, 2250, 560]
+
+def test_encode_signal():
+    signal = ParsedSignal("test.ir", "POWER", "Samsung32", bytes([7, 0, 0, 0]), bytes([2, 0, 0, 0]))
+    signal.set_last_comment("comment")
+    raw = encode_signal(signal)
+    assert raw.is_raw
+    assert (raw.name, raw.get_source(), raw.get_last_comment()) == ("POWER", "test.ir", "comment")
+    assert (raw.frequency, raw.duty_cycle) == (38000, 0.33)
+    assert list(raw.data) == list(encode("Samsung32", 7, 2))
+
+def test_unsupported_protocol():
+    signal = ParsedSignal("test.ir", "POWER", "Pioneer", bytes(4), bytes(4))
+    assert encode_signal(signal) is None
@@ -0,0 +1,62 @@
+import math
+import random
+
+from array import array
+
+import pytest
+
+from fsc.flipper_format import fuzzy
+from fsc.flipper_format.fuzzy import FuzzyIndex
+from fsc.flipper_format.infrared import RawSignal
+
+def raw(data) -> RawSignal:
+    return RawSignal("test.ir", "test", frequency=38000, duty_cycle=0.33, data=array("i", data))
+
+def test_bucket_edge():
+    index = FuzzyIndex()
+    # both pulses are within the tolerance, but on different sides of a bucket edge
+    edge = math.exp(10 * index._step)
+    a, b = int(edge * 0.95), int(edge * 1.05)
+    assert index._quantize(a) != index._quantize(b)
+    index.add("a", raw([a, 500] * 20))
+    assert [key for key, _ in index.query(raw([b, 500] * 20))] == ["a"]
+
+def test_no_match_out_of_tolerance():
+    index = FuzzyIndex()
+    index.add("a", raw([1000, 500] * 20))
+    assert index.query(raw([1500, 500] * 20)) == []
+
+def random_index(seed: int):
+    rnd = random.Random(seed)
+    index = FuzzyIndex()
+    signals = []
+    for i in range(200):
+        data = [rnd.randint(200, 9000) for _ in range(rnd.randint(20, 80))]
+        index.add(i, raw(data))
+        signals.append(data)
+    # queries close to indexed signals (some out of the tolerance) and unrelated ones
+    queries = []
+    for data in signals[::4]:
+        scale = rnd.uniform(0.75, 1.3)
+        queries.append([int(z * scale) for z in data[:len(data) - rnd.randint(0, 3)]])
+    queries.extend([rnd.randint(200, 9000) for _ in range(40)] for _ in range(10))
+    return index, queries
+
+def test_finds_all_similar():
+    index, queries = random_index(1)
+    for query in queries:
+        found = {key for key, _ in index.query(raw(query))}
+        expected = {i for i, data in enumerate(index.data) if fuzzy.is_similar(raw(query), raw(data))}
+        assert found == expected
+
+def test_numpy_matches_pure_python(monkeypatch):
+    pytest.importorskip("numpy")
+    index, queries = random_index(2)
+    with_numpy = [index.query(raw(z)) for z in queries]
+    monkeypatch.setattr(fuzzy, "np", None)
+    pure = [index.query(raw(z)) for z in queries]
+    assert any(with_numpy)
+    assert len(with_numpy) == len(pure)
+    for a, b in zip(with_numpy, pure):
+        assert [key for key, _ in a] == [key for key, _ in b]
+        assert [score for _, score in a] == pytest.approx([score for _, score in b])
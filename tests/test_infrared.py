@@ -0,0 +1,53 @@
+from array import array
+
+import pytest
+
+from fsc.flipper_format.base import FlipperFormat, ParseError
+from fsc.flipper_format.infrared import ParsedSignal, RawSignal, read_ir
+from fsc.flipper_format.lazy import LazyIRReader
+
+CONTENT = """Filetype: IR signals file
+Version: 1
+#
+name: A
+type: parsed
+protocol: NEC
+address: 1FF 00 00 00
+command: 02 00 00 00
+"""
+
+def test_invalid_bytes():
+    with pytest.raises(ParseError) as e:
+        list(read_ir(FlipperFormat("test.ir", content=CONTENT)))
+    assert e.value.line_no == 7
+    assert str(e.value) == "test.ir:7: address '1FF 00 00 00' is not a list of hex bytes"
+
+def test_invalid_bytes_lazy(tmp_path):
+    path = tmp_path / "test.ir"
+    path.write_text(CONTENT)
+    with LazyIRReader(str(path)) as reader:
+        with pytest.raises(ParseError) as e:
+            reader.get(0).address
+    assert e.value.line_no == 7
+
+def test_byte_range():
+    with pytest.raises(ValueError):
+        ParsedSignal("test.ir", "A", "NEC", [0x1FF, 0, 0, 0], bytes(4))
+    signal = ParsedSignal("test.ir", "A", "NEC", [4, 0, 0, 0], bytes(4))
+    with pytest.raises(ValueError):
+        signal.set_command([256])
+    assert signal.address == bytes([4, 0, 0, 0])
+
+def test_digest():
+    a = ParsedSignal("a.ir", "A", "NEC", bytes([4, 0, 0, 0]), bytes([8, 0, 0, 0]))
+    b = ParsedSignal("b.ir", "B", "nec", bytes([4, 0, 0, 0]), bytes([8, 0, 0, 0]))
+    # the name and the case of the protocol don't matter
+    assert a == b and a.digest() == b.digest() and hash(a) == hash(b)
+    b.set_command(bytes([9, 0, 0, 0]))
+    assert a != b and a.digest() != b.digest()
+
+    r = RawSignal("a.ir", "A", 38000, 0.33, array("i", [1, 2, 3]))
+    s = RawSignal("a.ir", "B", 38000, 0.33, [1, 2, 3])
+    assert r == s and r.digest() == s.digest()
+    s.set_frequency(36000)
+    assert r != s and r.digest() != s.digest()
@@ -0,0 +1,34 @@
+import os
+
+from glob import glob
+
+from fsc.flipper_format.fuzzy import FuzzyIndex
+from fsc.flipper_format.irdb import IRDB
+
+def dump(db: IRDB) -> list:
+    return [(os.path.basename(z.path), z.count, sorted(z.hashes.values())) for z in db]
+
+def test_load(ir_tree):
+    db = IRDB(ir_tree, workers=1).load()
+    assert dump(db) == [("AC.ir", 2, [["Off"], ["Power"]]), ("TV.ir", 3, [["Mute"], ["Power"], ["Vol_up"]])]
+    # the power signal is in both files
+    power = db.read_file(db[0].path)[1]
+    assert sorted(db.index.lookup(power.digest())) == [0, 1]
+
+def test_lazy_and_parsed_load(ir_tree):
+    # without a fuzzy index only the digests are read, with one the signals are parsed
+    lazy = IRDB(ir_tree, workers=1).load()
+    parsed = IRDB(ir_tree, workers=1, fuzzy_index=FuzzyIndex()).load()
+    assert [(z.path, z.count, z.hashes) for z in lazy] == [(z.path, z.count, z.hashes) for z in parsed]
+    # raw signals and the parsed ones encoded to raw
+    assert len(parsed.fuzzy_index) == 5
+
+def test_update(ir_tree):
+    db = IRDB(ir_tree, workers=1).load()
+    ac, tv = sorted(glob(ir_tree, recursive=True))
+    with open(ac, "a") as f:
+        f.write("#\nname: On\ntype: parsed\nprotocol: NEC\naddress: 04 00 00 00\ncommand: 09 00 00 00\n")
+    os.unlink(tv)
+    db.update([ac], [tv])
+    assert dump(db) == [("AC.ir", 3, [["Off"], ["On"], ["Power"]])]
+    assert db.index.ids == {ac: 0}
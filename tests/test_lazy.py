@@ -0,0 +1,32 @@
+from glob import glob
+
+from fsc.flipper_format.base import FlipperFormat
+from fsc.flipper_format.infrared import read_ir
+from fsc.flipper_format.lazy import LazyIRReader
+
+def test_same_signals(ir_tree):
+    for file_name in glob(ir_tree, recursive=True):
+        with FlipperFormat(file_name) as fff:
+            expected = list(read_ir(fff))
+        with LazyIRReader(file_name) as reader:
+            signals = list(reader)
+            assert [z.to_obj() for z in signals] == [z.to_obj() for z in expected]
+            assert [z.get_last_comment() for z in signals] == [z.get_last_comment() for z in expected]
+
+def test_raw_digest_without_timings(ir_tree):
+    # the digest of a raw signal is hashed from the text, the timings are not decoded for it
+    for file_name in glob(ir_tree, recursive=True):
+        with FlipperFormat(file_name) as fff:
+            expected = [z.digest() for z in read_ir(fff)]
+        with LazyIRReader(file_name) as reader:
+            signals = list(reader)
+            assert [z.digest() for z in signals] == expected
+            assert all(z._data is None for z in signals if z.is_raw)
+
+def test_digest_after_change(ir_tree):
+    file_name = [z for z in glob(ir_tree, recursive=True) if z.endswith("AC.ir")][0]
+    with LazyIRReader(file_name) as reader:
+        raw = reader.get(0)
+        before = raw.digest()
+        raw.set_data([1, 2, 3])
+        assert raw.digest() != before
@@ -0,0 +1,70 @@
+from glob import glob
+
+import pytest
+
+from fsc.flipper_format.lint import check_content, check_file, format_diagnostic, lint_files
+
+from conftest import AC, TV
+
+HEADER = "Filetype: IR signals file\nVersion: 1\n"
+
+def findings(content: str) -> list:
+    return [(z.line, z.level, z.code) for z in check_content(content, "test.ir").diagnostics]
+
+def test_clean():
+    assert findings(AC) == []
+
+def test_signals():
+    result = check_content(TV, "test.ir", with_signals=True)
+    assert [z.name for z in result.signals] == ["Power", "Vol_up", "Mute"]
+    assert result.signals[0].get_last_comment() == "captured from the remote"
+    assert check_content(TV, "test.ir").signals is None
+
+@pytest.mark.parametrize("content, expected", [
+    ("Filetype: Something\nVersion: 1\n", [(1, "error", "header")]),
+    ("Filetype: IR signals file\nVersion: 2\n", [(2, "error", "header")]),
+    (HEADER + "garbage\n", [(3, "error", "structure")]),
+    (HEADER + "name: A\ntype: parsed\nprotocol: NEC42\naddress: 01 00 00 00\ncommand: 02 00 00 00\n", []),
+    (HEADER + "name: A\ntype: parsed\nprotocol: Foo\naddress: 01 00 00 00\ncommand: 02 00 00 00\n",
+     [(5, "warning", "unknown-protocol")]),
+    (HEADER + "name: A\ntype: parsed\nprotocol: NEC\naddress: 1FF 00 00 00\ncommand: 02 00 00 00\n",
+     [(6, "error", "invalid-number")]),
+    (HEADER + "name: A\ntype: parsed\nprotocol: NEC\naddress: 01 00\ncommand: 02 00 00 00\n",
+     [(6, "error", "address-length")]),
+    (HEADER + "name: A\ntype: parsed\nprotocol: NEC\naddress: 01 00 00 00\n", [(3, "error", "missing-key")]),
+    (HEADER + "name: A\ntype: foo\n", [(4, "error", "unknown-type")]),
+    (HEADER + "name: A\ntype: raw\nfrequency: 60000\nduty_cycle: 0.33\ndata: 100 200 300\n",
+     [(5, "error", "frequency-range")]),
+    (HEADER + "name: A\ntype: raw\nduty_cycle: 0.33\nfrequency: 38000\ndata: 100 200 300\n",
+     [(5, "error", "key-order")]),
+    (HEADER + "name: A\ntype: raw\nfrequency: 38000\nduty_cycle: 0.33\ndata: 100 -200 300\n",
+     [(7, "error", "timing-range")]),
+    (HEADER + "name: A\ntype: raw\nfrequency: 38000\nduty_cycle: 0.33\ndata: 100 200\n",
+     [(7, "warning", "data-length")]),
+    (HEADER + "name: A\ntype: raw\nfrequency: 38000\nduty_cycle: 0.33\ndata: 100 x 300\n",
+     [(7, "error", "invalid-number")]),
+    (HEADER + "name: A\ntype: raw\nfrequency: 38000\nduty_cycle: 0.33\ndata: 100 200 300\n"
+              "name: B\ntype: raw\nfrequency: 38000\ndata: 100 200 300\nduty_cycle: 0.33\n",
+     [(8, "warning", "duplicate-signal"), (11, "error", "key-order")]),
+])
+def test_findings(content, expected):
+    assert findings(content) == expected
+
+def test_structural_errors():
+    result = check_content(HEADER + "name: A\ntype: raw\nfrequency: 60000\nduty_cycle: 0.33\ndata: 100 200\nbad\n")
+    assert [z.code for z in result.errors] == ["frequency-range", "structure"]
+    assert [z.code for z in result.structural_errors] == ["structure"]
+    assert [z.code for z in result.warnings] == ["data-length"]
+
+def test_files(ir_tree, tmp_path):
+    missing = str(tmp_path / "missing.ir")
+    files = sorted(glob(ir_tree, recursive=True)) + [missing]
+    results = list(lint_files(files, jobs=1))
+    assert [z.path for z in results] == files
+    # the Mute signal of the TV has a short address
+    assert [[z.code for z in r.diagnostics] for r in results] == [[], ["address-length"], ["read"]]
+    assert check_file(missing).diagnostics == results[2].diagnostics
+
+def test_format():
+    d = check_content(HEADER + "garbage\n").diagnostics[0]
+    assert format_diagnostic("test.ir", d) == "test.ir:3: error: line is neither a comment nor a key: value pair [structure]"
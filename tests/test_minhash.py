@@ -0,0 +1,29 @@
+from hashlib import blake2b
+
+from fsc.flipper_format import minhash
+from fsc.flipper_format.minhash import clusters, find_near_duplicates
+
+def digests(*names) -> dict:
+    return {blake2b(z.encode(), digest_size=16).digest(): 1 for z in names}
+
+def test_near_duplicates():
+    files = [
+        digests(*[f"a{i}" for i in range(10)]),
+        digests(*[f"a{i}" for i in range(9)]),
+        digests(*[f"b{i}" for i in range(10)]),
+    ]
+    matches = find_near_duplicates(files, 0.8)
+    assert [(z.input, z.checked) for z in matches] == [(0, 1)]
+    assert clusters(len(files), matches) == [[0, 1]]
+
+def test_copies_are_compared_linearly(monkeypatch):
+    calls = []
+    compare = minhash.compare
+    monkeypatch.setattr(minhash, "compare", lambda files, a, b: calls.append((a, b)) or compare(files, a, b))
+
+    files = [digests("power", "vol+", "vol-")] * 300 + [{}] * 300
+    matches = find_near_duplicates(files, 0.8)
+    # every copy is only compared to the first one, the empty files not at all
+    assert len(matches) == 299
+    assert len({tuple(sorted(z)) for z in calls}) == 299
+    assert sorted(len(z) for z in clusters(len(files), matches))[-1] == 300
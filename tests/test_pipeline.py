@@ -0,0 +1,87 @@
+from glob import glob
+
+from fsc.flipper_format.pipeline import Pipeline
+
+CONFIG = [
+    {"stage": "clamp_frequency", "freq_min": 10_000, "freq_max": 56_000},
+    {"stage": "fix_negative_timings"},
+    {"stage": "rename", "rules": {"Power": ["pwr", "/^(turn[_\\s]*)?(on|off)$/"]}, "normalize": "lower"},
+    {"stage": "dedupe"},
+]
+
+CONTENT = """Filetype: IR signals file
+Version: 1
+# kept as it is
+#
+name: PWR
+type: parsed
+protocol: NEC
+address: 04 00 00 00
+command: 08 00 00 00
+#
+name: Vol_up
+type: raw
+frequency: 60000
+duty_cycle: 0.330000
+data: 9000 -4500 560
+data: 560 1690 560
+# the same as PWR
+name: on
+type: parsed
+protocol: nec
+address: 04 00 00 00
+command: 08 00 00 00
+#
+name: Mute
+type: raw
+frequency: 38000
+duty_cycle: 0.330000
+data: 100 200 300
+"""
+
+def test_transform():
+    res = Pipeline.from_config(CONFIG).transform(CONTENT)
+    assert res == """Filetype: IR signals file
+Version: 1
+# kept as it is
+#
+name: Power
+type: parsed
+protocol: NEC
+address: 04 00 00 00
+command: 08 00 00 00
+#
+name: Vol_up
+type: raw
+frequency: 56000
+duty_cycle: 0.330000
+data: 9000 4500 560
+data: 560 1690 560
+#
+name: Mute
+type: raw
+frequency: 38000
+duty_cycle: 0.330000
+data: 100 200 300
+"""
+
+def test_idempotent():
+    pipeline = Pipeline.from_config(CONFIG)
+    once = pipeline.transform(CONTENT)
+    assert once != CONTENT
+    assert pipeline.transform(once) == once
+
+def test_unchanged_content_is_returned_as_it_is():
+    content = CONTENT.replace("PWR", "Power").replace("60000", "38000").replace("-4500", "4500") \
+        .replace("name: on", "name: Power2").replace("protocol: nec", "protocol: RC5")
+    assert Pipeline.from_config(CONFIG).transform(content) is content
+
+def test_run(ir_tree):
+    files = sorted(glob(ir_tree, recursive=True))
+    pipeline = Pipeline.from_config([{"stage": "rename", "rules": {"Shutdown": ["off"]}, "normalize": "lower"}])
+    assert [(z.changed, z.skipped) for z in pipeline.run(files, workers=1)] == [(True, False), (False, False)]
+    with open(files[0], "r") as f:
+        assert "name: Shutdown\n" in f.read()
+    # the rewritten file is checked once more, then both files are known to be in the target state
+    assert [(z.changed, z.skipped) for z in pipeline.run(files, workers=1)] == [(False, False), (False, True)]
+    assert [(z.changed, z.skipped) for z in pipeline.run(files, workers=1)] == [(False, True), (False, True)]
@@ -0,0 +1,32 @@
+from fsc.flipper_format.base import FlipperFormat
+from fsc.flipper_format.bulk import iter_all_ir, write_all_ir_ir
+from fsc.flipper_format.infrared import read_ir
+
+def signals(ir_tree) -> list:
+    return [z for _, s in iter_all_ir(ir_tree, use_cache=False) for z in s]
+
+def test_default_format(ir_tree, tmp_path):
+    # the signals are separated by "#" lines, without header, wrapping or final newline
+    all = signals(ir_tree)
+    file_name = str(tmp_path / "out.ir")
+    write_all_ir_ir(file_name, all)
+    with open(file_name, "r") as f:
+        assert f.read() == "\n#\n".join(str(z) for z in all)
+
+def test_with_source(ir_tree, tmp_path):
+    all = signals(ir_tree)
+    file_name = str(tmp_path / "out.ir")
+    write_all_ir_ir(file_name, all, with_source=True)
+    with open(file_name, "r") as f:
+        assert f.read() == "".join(f"# {z.get_source()}\n{z}\n" for z in all)
+
+def test_header_and_wrapping(ir_tree, tmp_path):
+    all = signals(ir_tree)
+    file_name = str(tmp_path / "out.ir")
+    write_all_ir_ir(file_name, all, with_header=True, data_per_line=4)
+    with open(file_name, "r") as f:
+        content = f.read()
+    assert content.startswith("Filetype: IR signals file\nVersion: 1\n#\n")
+    assert "data: 9000 4500 560 560\ndata: 560 1690 560 1690\ndata: 560\n" in content
+    # the file reads back as the same signals
+    assert [z.to_obj() for z in read_ir(FlipperFormat(file_name))] == [z.to_obj() for z in all]